@@ -0,0 +1,187 @@
+"""End-to-end benchmarks of the Curve Number Generator algorithms against local stand-in servers.
+
+    python benchmarks/run_benchmarks.py --sizes 1000 10000 100000 --output results.json
+    python benchmarks/run_benchmarks.py --baseline results.json
+
+Every case runs in its own QGIS process with an empty temporary folder, download cache and SSURGO
+store, unless --warm is given. Wall time, peak memory, peak temporary disk use and per-stage
+timings are reported. With --baseline, cases slower than the baseline by more than --tolerance are
+reported as regressions and the exit code is 1.
+"""
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import synthetic
+from run_case import RESULT_PREFIX
+from stand_in_servers import StandInHandler, startServers
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+REPO = os.path.dirname(HERE)
+CONUS_LOOKUP = os.path.join(
+    REPO, "curve_number_generator", "processing", "algorithms", "conus_nlcd_ssurgo", "default_lookup.csv"
+)
+ALGORITHMS = ["conusnlcdssurgo", "conusnlcdssurgo-raster", "globalesaornl", "custom"]
+# AOIs are centered on a point in Kansas, inside CONUS and on land for ESA WorldCover
+CENTER = (-98.5, 38.5)
+
+
+def caseParameters(algorithm, workdir, aoi, aoi_extent):
+    if algorithm.startswith("conusnlcdssurgo"):
+        return {
+            "aoi": aoi,
+            "Tiled": True,
+            "RasterEngine": algorithm.endswith("raster"),
+            "CurveNumber": os.path.join(workdir, "curve_number.gpkg"),
+        }
+    if algorithm == "globalesaornl":
+        return {"aoi": aoi, "CurveNumber": os.path.join(workdir, "curve_number.tif")}
+
+    land_cover = os.path.join(workdir, "land_cover.tif")
+    soils = os.path.join(workdir, "soils.gpkg")
+    synthetic.writeLandCover(land_cover, aoi_extent)
+    synthetic.writeSoils(soils, aoi_extent)
+    return {
+        "aoi": aoi,
+        "LandCover": land_cover,
+        "Soils": soils,
+        "SoilLookupField": "hsg",
+        "CnLookup": CONUS_LOOKUP,
+        "CurveNumber": os.path.join(workdir, "curve_number.gpkg"),
+    }
+
+
+def runCase(algorithm, size, server, root, warm):
+    workdir = tempfile.mkdtemp(prefix=f"{algorithm}_{size}_", dir=root)
+    aoi = os.path.join(workdir, "aoi.gpkg")
+    aoi_extent = synthetic.writeAoi(aoi, CENTER[0], CENTER[1], size)
+    state = root if warm else workdir
+
+    case = {
+        "algorithm": algorithm.replace("-raster", ""),
+        "server": server,
+        "parameters": caseParameters(algorithm, workdir, aoi, aoi_extent),
+    }
+    if algorithm == "globalesaornl":
+        # generous extent in degrees around the center, tiles are only created once
+        half = (size * 4046.8564224) ** 0.5 / 80000 + 1
+        case["esa_tiles"] = synthetic.writeWorldCoverTiles(
+            os.path.join(root, "esa_tiles"), (CENTER[0] - half, CENTER[1] - half, CENTER[0] + half, CENTER[1] + half)
+        )
+
+    temp = os.path.join(workdir, "tmp")
+    os.makedirs(temp)
+    env = dict(
+        os.environ,
+        TMPDIR=temp,
+        CNG_CACHE_FOLDER=os.path.join(state, "cache"),
+        CNG_CACHE_SIZE_MB=os.environ.get("CNG_CACHE_SIZE_MB", "2048" if warm else "0"),
+        CNG_SSURGO_STORE=os.path.join(state, "ssurgo.sqlite"),
+        CNG_DATA_FOLDER="",
+        CNG_ESA_WORLDCOVER_FOLDER="",
+        PYTHONPATH=os.pathsep.join([REPO, HERE, os.environ.get("PYTHONPATH", "")]),
+    )
+
+    requests_before = StandInHandler.requests
+    start = time.perf_counter()
+    process = subprocess.run(
+        [sys.executable, os.path.join(HERE, "run_case.py"), json.dumps(case)],
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    process_seconds = time.perf_counter() - start
+
+    result = {"error": f"exit code {process.returncode}\n{process.stderr[-2000:]}"}
+    for line in process.stdout.splitlines():
+        if line.startswith(RESULT_PREFIX):
+            result = json.loads(line[len(RESULT_PREFIX) :])
+    result.update(
+        {
+            "algorithm": algorithm,
+            "acres": size,
+            "process_seconds": round(process_seconds, 3),
+            "server_requests": StandInHandler.requests - requests_before,
+        }
+    )
+    return result
+
+
+def compare(results, baseline, tolerance):
+    """Cases slower than their baseline by more than tolerance, as messages"""
+    previous = {(r["algorithm"], r["acres"]): r for r in baseline}
+    regressions = []
+    for result in results:
+        before = previous.get((result["algorithm"], result["acres"]))
+        if not before or result.get("error") or before.get("error"):
+            continue
+        for key in ("seconds", "peak_rss_mb", "peak_temp_mb"):
+            if before.get(key) and result[key] > before[key] * (1 + tolerance):
+                regressions.append(
+                    f"{result['algorithm']} {result['acres']:,} acres: {key} {before[key]} -> {result[key]}"
+                )
+    return regressions
+
+
+def printTable(results):
+    print(f"{'algorithm':<24}{'acres':>10}{'seconds':>10}{'rss MB':>10}{'temp MB':>10}{'requests':>10}  error")
+    for r in results:
+        print(
+            f"{r['algorithm']:<24}{r['acres']:>10,}{r.get('seconds', 0):>10}{r.get('peak_rss_mb', 0):>10}"
+            f"{r.get('peak_temp_mb', 0):>10}{r['server_requests']:>10}  {r.get('error', '').splitlines()[0] if r.get('error') else ''}"
+        )
+        for name, stage in sorted(r.get("stages", {}).items(), key=lambda item: -item[1]["seconds"]):
+            print(f"{'':<8}{name:<50}{stage['seconds']:>10} s {stage['calls']:>6} calls")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--algorithms", nargs="+", default=ALGORITHMS, choices=ALGORITHMS)
+    parser.add_argument("--sizes", nargs="+", type=int, default=[1000, 10000, 50000, 100000], help="AOI sizes in acres")
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds added to every stand-in response")
+    parser.add_argument("--warm", action="store_true", help="share the download cache and SSURGO store across cases")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="JSON results of a previous run to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown over the baseline")
+    parser.add_argument("--keep", action="store_true", help="keep the working folder")
+    args = parser.parse_args()
+
+    server = startServers(latency=args.latency)
+    url = f"http://127.0.0.1:{server.server_port}"
+    root = tempfile.mkdtemp(prefix="cng_benchmarks_")
+
+    results = []
+    for algorithm in args.algorithms:
+        for size in sorted(args.sizes):
+            print(f"Running {algorithm} for {size:,} acres...", flush=True)
+            results.append(runCase(algorithm, size, url, root, args.warm))
+
+    server.shutdown()
+    printTable(results)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    if not args.keep:
+        shutil.rmtree(root, ignore_errors=True)
+    else:
+        print(f"Working folder: {root}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+    if any(r.get("error") for r in results):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
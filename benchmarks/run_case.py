@@ -0,0 +1,186 @@
+"""Run one benchmark case in a fresh QGIS process and print its measurements as JSON.
+
+Started by run_benchmarks.py with the case as a JSON argument, see there for the fields.
+"""
+
+import json
+import os
+import resource
+import sys
+import threading
+import time
+from collections import defaultdict
+from functools import wraps
+from urllib.parse import urlparse
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULT_PREFIX = "BENCHMARK_RESULT "
+
+
+class StageTimer:
+    """Inclusive wall time and call count of wrapped functions, nested stages are counted in both"""
+
+    def __init__(self):
+        self.stages = defaultdict(lambda: {"seconds": 0.0, "calls": 0})
+        self.lock = threading.Lock()
+
+    def add(self, stage, seconds):
+        with self.lock:
+            self.stages[stage]["seconds"] += seconds
+            self.stages[stage]["calls"] += 1
+
+    def wrap(self, func, stage=None):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            name = stage or f"processing.run:{args[0]}"
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.add(name, time.perf_counter() - start)
+
+        return wrapper
+
+
+class DiskSampler(threading.Thread):
+    """Peak size of a folder sampled every interval seconds"""
+
+    def __init__(self, folder, interval=0.5):
+        super().__init__(daemon=True)
+        self.folder = folder
+        self.interval = interval
+        self.peak = 0
+        self.running = True
+
+    def size(self):
+        total = 0
+        for root, _, files in os.walk(self.folder):
+            for name in files:
+                try:
+                    total += os.path.getsize(os.path.join(root, name))
+                except OSError:
+                    pass
+        return total
+
+    def run(self):
+        while self.running:
+            self.peak = max(self.peak, self.size())
+            time.sleep(self.interval)
+
+    def stop(self):
+        self.running = False
+        self.peak = max(self.peak, self.size())
+
+
+def startQgis():
+    from qgis.core import QgsApplication
+
+    QgsApplication.setPrefixPath(os.environ.get("QGIS_PREFIX_PATH", "/usr"), True)
+    app = QgsApplication([], False)
+    app.initQgis()
+    sys.path.append(os.path.join(QgsApplication.prefixPath(), "share", "qgis", "python", "plugins"))
+    sys.path.insert(0, REPO)
+
+    from processing.core.Processing import Processing
+
+    Processing.initialize()
+    return app
+
+
+def redirect(url, server, path):
+    """url with its scheme, host and path replaced by the stand-in server"""
+    return f"{server}{path}?{urlparse(url).query}" if urlparse(url).query else f"{server}{path}"
+
+
+def patchPlugin(case, timer):
+    from curve_number_generator.processing import config
+    from curve_number_generator.processing.curve_number_generator_algorithm import (
+        CurveNumberGeneratorAlgorithm,
+    )
+
+    server = case["server"]
+    for name, url in config.CONUS_NLCD_SSURGO.items():
+        path = {"SSURGO_SDA": "/sda", "SSURGO_Soil": "/wfs"}.get(name, "/wcs")
+        config.CONUS_NLCD_SSURGO[name] = redirect(url, server, path)
+    config.GLOBAL_ESA_ORNL["ORNL_HYSOG"] = redirect(config.GLOBAL_ESA_ORNL["ORNL_HYSOG"], server, "/wcs")
+    config.GLOBAL_ESA_ORNL["ORNL_HYSOG_PING"] = f"{server}/wcs"
+    if case.get("esa_tiles"):
+        config.GLOBAL_ESA_ORNL["ESA_WORLDCOVER_2021"] = case["esa_tiles"]
+
+    # usage counters, version checks and AOI reporting are not part of the benchmark
+    CurveNumberGeneratorAlgorithm.postProcessAlgorithm = lambda self, context, feedback: {}
+
+    import processing
+
+    processing.run = timer.wrap(processing.run)
+
+    from curve_number_generator.processing.algorithms.conus_nlcd_ssurgo.ssurgo_soil import SsurgoSoil
+    from curve_number_generator.processing.tools import cn_lookup, curve_number, downloader, utils
+
+    stages = {
+        (utils, "fetchFile"): "download",
+        (utils, "fetchCoverage"): "download coverage",
+        (downloader, "download"): "http",
+        (SsurgoSoil, "fetch"): "soils",
+        (SsurgoSoil, "loadPostResponse"): "soils ingestion",
+        (cn_lookup, "applyCnLookup"): "cn lookup",
+        (curve_number.CurveNumber, "generateCurveNumber"): "cn overlay",
+    }
+    wrapped = {}
+    for (owner, attr), stage in stages.items():
+        original = getattr(owner, attr)
+        wrapped[original] = timer.wrap(original, stage)
+        setattr(owner, attr, wrapped[original])
+    # functions imported by name into other modules of the plugin
+    for module in list(sys.modules.values()):
+        if module and module.__name__.startswith("curve_number_generator"):
+            for attr, value in list(vars(module).items()):
+                if callable(value) and value in wrapped:
+                    setattr(module, attr, wrapped[value])
+
+
+def runCase(case):
+    timer = StageTimer()
+    app = startQgis()
+
+    from qgis.core import QgsApplication
+
+    from curve_number_generator.processing.curve_number_generator_provider import (
+        CurveNumberGeneratorProvider,
+    )
+
+    patchPlugin(case, timer)
+    QgsApplication.processingRegistry().addProvider(CurveNumberGeneratorProvider())
+
+    import processing
+
+    sampler = DiskSampler(os.environ["TMPDIR"])
+    sampler.start()
+    start = time.perf_counter()
+    error = ""
+    stage_report = {}
+    try:
+        outputs = processing.run(f"curvenumbergenerator:{case['algorithm']}", case["parameters"])
+        stage_report = json.loads(outputs.get("StageReport") or "{}")
+    except Exception as e:  # reported with the measurements
+        error = f"{type(e).__name__}: {e}"
+    seconds = time.perf_counter() - start
+    sampler.stop()
+
+    # the outer processing.run is the whole algorithm
+    timer.stages.pop(f"processing.run:curvenumbergenerator:{case['algorithm']}", None)
+    result = {
+        "seconds": round(seconds, 3),
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "peak_child_rss_mb": round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024, 1),
+        "peak_temp_mb": round(sampler.peak / 1024 / 1024, 1),
+        "stages": {name: {"seconds": round(v["seconds"], 3), "calls": v["calls"]} for name, v in timer.stages.items()},
+        "stage_report": stage_report.get("totals", {}),
+        "error": error,
+    }
+    print(RESULT_PREFIX + json.dumps(result), flush=True)
+    app.exitQgis()
+
+
+if __name__ == "__main__":
+    runCase(json.loads(sys.argv[1]))
@@ -0,0 +1,123 @@
+"""Local stand-ins for the MRLC and ORNL WCS servers and the Soil Data Access post service.
+
+    python benchmarks/stand_in_servers.py --port 8765
+
+WCS GetCoverage requests on /wcs return synthetic GeoTIFFs chosen by the COVERAGE parameter, SDA
+queries posted to /sda return synthetic map units, and the SSURGO WFS on /wfs is always down.
+"""
+
+import argparse
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlparse
+
+import synthetic
+
+NUMBER = re.compile(r"-?\d+(?:\.\d+)?(?:[eE][-+]?\d+)?")
+
+
+def keysIn(query: str) -> list:
+    """Keys of an 'in (1,2,3)' SQL list"""
+    match = re.search(r"\bin \(([\d,\s]*)\)\s*$", query)
+    return [int(key) for key in match.group(1).split(",") if key.strip()] if match else []
+
+
+def fullRow(i, j) -> list:
+    """muaggatt columns followed by mupolygonkey, areasymbol, nationalmusym and mupolygongeo"""
+    polygon = synthetic.mupolygonRow(synthetic.mupolygonKey(i, j))
+    return synthetic.muaggattRow(synthetic.mukey(i, j)) + polygon[:1] + polygon[2:]
+
+
+def sdaRows(query: str) -> list:
+    match = re.search(r"WktWgs84\('([^']*)'\)", query)
+    if match:
+        numbers = [float(n) for n in NUMBER.findall(match.group(1))]
+        xs, ys = numbers[0::2], numbers[1::2]
+        cells = list(synthetic.soilCells((min(xs), min(ys), max(xs), max(ys))))
+        if query.startswith("select Ma.*, M.mupolygonkey"):
+            return [fullRow(i, j) for i, j in cells]
+        return [[str(synthetic.mupolygonKey(i, j)), str(synthetic.mukey(i, j))] for i, j in cells]
+    if "from muaggatt" in query:
+        return [synthetic.muaggattRow(key) for key in keysIn(query)]
+    if "from mupolygon" in query:
+        return [synthetic.mupolygonRow(key) for key in keysIn(query)]
+    raise ValueError(f"Unsupported query: {query}")
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # seconds added to every response to emulate a remote server
+    latency = 0.0
+    requests = 0
+    lock = threading.Lock()
+
+    def log_message(self, format, *args):
+        pass
+
+    def respond(self, status: int, body: bytes = b"", content_type: str = "text/plain"):
+        with self.lock:
+            StandInHandler.requests += 1
+        time.sleep(self.latency)
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+    def do_HEAD(self):
+        self.respond(200)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path != "/wcs":
+            self.respond(503, b"Service unavailable")
+            return
+        query = {k.upper(): v for k, v in parse_qsl(url.query)}
+        try:
+            body = synthetic.coverageGeoTiff(
+                query["COVERAGE"],
+                query.get("CRS", "EPSG:4326"),
+                [float(item) for item in query["BBOX"].split(",")],
+                int(query["WIDTH"]),
+                int(query["HEIGHT"]),
+            )
+        except (KeyError, ValueError) as e:
+            self.respond(400, f'<?xml version="1.0"?><ServiceException>{e}</ServiceException>'.encode(), "text/xml")
+            return
+        self.respond(200, body, "image/tiff")
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        try:
+            rows = sdaRows(body["query"])
+        except (KeyError, ValueError) as e:
+            self.respond(400, str(e).encode())
+            return
+        self.respond(200, json.dumps({"Table": rows} if rows else {}).encode(), "application/json")
+
+
+def startServers(port: int = 0, latency: float = 0.0) -> ThreadingHTTPServer:
+    """Serve the stand-ins from a daemon thread, the URL is http://127.0.0.1:{server.server_port}"""
+    StandInHandler.latency = latency
+    server = ThreadingHTTPServer(("127.0.0.1", port), StandInHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every response")
+    args = parser.parse_args()
+    server = startServers(args.port, args.latency)
+    print(f"Serving on http://127.0.0.1:{server.server_port}, press Ctrl+C to stop")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,105 @@
+"""Startup cost of the plugin: importing it and registering its Processing provider.
+
+    python benchmarks/startup.py --runs 10 --max-seconds 0.5
+
+Every run starts a fresh QGIS process, so the numbers match what each short lived qgis_process
+invocation pays. The median import and provider load times are reported together with the modules
+that the plugin pulls in. Modules only needed while an algorithm runs, like requests and numpy,
+must not be among them, see DEFERRED. The exit code is 1 if one of them is imported at startup or
+if the median total time is over --max-seconds.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+REPO = os.path.dirname(HERE)
+RESULT_PREFIX = "STARTUP_RESULT "
+# imported on first use by the network, telemetry and raster code, never at startup
+DEFERRED = ["requests", "urllib3", "numpy", "pickle", "xml.etree.ElementTree", "curve_number_generator.processing.tools.countries"]
+
+
+def measure():
+    """Time the plugin startup in this process, QGIS and Processing being initialized first"""
+    from run_case import startQgis
+
+    app = startQgis()
+    before = set(sys.modules)
+
+    start = time.perf_counter()
+    from qgis.core import QgsApplication
+
+    from curve_number_generator.processing import CurveNumberGeneratorProvider
+
+    import_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    provider = CurveNumberGeneratorProvider()
+    QgsApplication.processingRegistry().addProvider(provider)
+    load_seconds = time.perf_counter() - start
+
+    result = {
+        "import_seconds": round(import_seconds, 4),
+        "load_seconds": round(load_seconds, 4),
+        "algorithms": len(provider.algorithms()),
+        "modules": sorted(set(sys.modules) - before),
+    }
+    print(RESULT_PREFIX + json.dumps(result), flush=True)
+    app.exitQgis()
+
+
+def run():
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([REPO, HERE, os.environ.get("PYTHONPATH", "")]))
+    process = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--child"], env=env, capture_output=True, text=True
+    )
+    for line in process.stdout.splitlines():
+        if line.startswith(RESULT_PREFIX):
+            return json.loads(line[len(RESULT_PREFIX) :])
+    raise RuntimeError(f"exit code {process.returncode}\n{process.stderr[-2000:]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--max-seconds", type=float, help="fail if the median import and load time is over this")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        measure()
+        return
+
+    results = [run() for _ in range(args.runs)]
+    import_seconds = statistics.median(r["import_seconds"] for r in results)
+    load_seconds = statistics.median(r["load_seconds"] for r in results)
+    modules = results[-1]["modules"]
+    plugin_modules = [m for m in modules if m.startswith("curve_number_generator")]
+    deferred = [m for m in DEFERRED if m in modules]
+
+    print(f"import {import_seconds:.3f} s, provider load {load_seconds:.3f} s (median of {args.runs} runs)")
+    print(f"{len(results[-1]['modules'])} modules imported, {len(plugin_modules)} of the plugin")
+    print(f"{results[-1]['algorithms']} algorithms registered")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"import_seconds": import_seconds, "load_seconds": load_seconds, "runs": results}, f, indent=2)
+
+    failed = False
+    for module in deferred:
+        print(f"REGRESSION {module} is imported at startup")
+        failed = True
+    if args.max_seconds and import_seconds + load_seconds > args.max_seconds:
+        print(f"REGRESSION startup takes {import_seconds + load_seconds:.3f} s, over {args.max_seconds} s")
+        failed = True
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
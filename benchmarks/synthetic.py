@@ -0,0 +1,205 @@
+"""Deterministic synthetic datasets served by the stand-in servers and used as local inputs.
+
+Values are a function of the global pixel or cell index, so overlapping and neighbouring
+requests return consistent data, just like the real services."""
+
+import math
+import os
+import tempfile
+
+import numpy
+from osgeo import gdal, ogr, osr
+
+NLCD_CLASSES = [11, 21, 22, 23, 24, 31, 41, 42, 43, 52, 71, 81, 82, 90, 95]
+ORNL_HSG_CLASSES = [1, 2, 3, 4, 11, 12, 13, 14]
+ESA_CLASSES = [10, 20, 30, 40, 50, 60, 70, 80, 90, 95, 100]
+HSG_VALUES = ["A", "B", "C", "D", "A/D", "B/D", "C/D"]
+
+# pixels of the same value form patches of this many pixels per side
+PATCH_SIZE = 8
+# SSURGO stand-in map unit polygons are squares of this many degrees per side
+SOIL_CELL_SIZE = 0.02
+MAP_UNITS = 40
+# the SDA muaggatt table has 40 columns, mukey being the last one
+MUAGGATT_COLUMNS = 40
+HYDGRPDCD_INDEX = 17
+DRCLASSDCD_INDEX = 15
+
+
+def patchValues(classes, col0, row0, width, height):
+    """Array of class values for the pixel window starting at the global column and row index"""
+    cols = (numpy.arange(width) + col0) // PATCH_SIZE
+    rows = (numpy.arange(height) + row0) // PATCH_SIZE
+    index = (cols[numpy.newaxis, :] * 7 + rows[:, numpy.newaxis] * 13) % len(classes)
+    return numpy.asarray(classes, dtype=numpy.uint8)[index]
+
+
+def coverageArray(coverage, bbox, width, height):
+    """Pixels of a WCS coverage request, bbox is (xmin, ymin, xmax, ymax)"""
+    cell_x = (bbox[2] - bbox[0]) / width
+    cell_y = (bbox[3] - bbox[1]) / height
+    col0 = int(round(bbox[0] / cell_x))
+    row0 = int(round(-bbox[3] / cell_y))
+    if "Impervious" in coverage:
+        return patchValues(list(range(0, 101, 5)), col0, row0, width, height)
+    if "Land_Cover" in coverage:
+        return patchValues(NLCD_CLASSES, col0, row0, width, height)
+    return patchValues(ORNL_HSG_CLASSES, col0, row0, width, height)
+
+
+def writeRaster(path, array, geotransform, crs, driver="GTiff", nodata=None):
+    ds = gdal.GetDriverByName(driver).Create(
+        path, array.shape[1], array.shape[0], 1, gdal.GDT_Byte, ["COMPRESS=DEFLATE", "TILED=YES"]
+    )
+    ds.SetGeoTransform(geotransform)
+    srs = osr.SpatialReference()
+    srs.SetFromUserInput(crs)
+    ds.SetProjection(srs.ExportToWkt())
+    band = ds.GetRasterBand(1)
+    if nodata is not None:
+        band.SetNoDataValue(nodata)
+    band.WriteArray(array)
+    ds = None
+
+
+def coverageGeoTiff(coverage, crs, bbox, width, height) -> bytes:
+    """GeoTIFF bytes answering a WCS GetCoverage request"""
+    array = coverageArray(coverage, bbox, width, height)
+    geotransform = (bbox[0], (bbox[2] - bbox[0]) / width, 0, bbox[3], 0, -(bbox[3] - bbox[1]) / height)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "coverage.tif")
+        writeRaster(path, array, geotransform, crs)
+        with open(path, "rb") as f:
+            return f.read()
+
+
+def mupolygonKey(i, j) -> int:
+    return (i + 20000) * 100000 + (j + 20000)
+
+
+def mupolygonCell(key) -> tuple:
+    return key // 100000 - 20000, key % 100000 - 20000
+
+
+def mukey(i, j) -> int:
+    return 100000 + (i * 7 + j * 13) % MAP_UNITS
+
+
+def soilCells(bbox):
+    """Indices of the soil polygons intersecting bbox (xmin, ymin, xmax, ymax) in EPSG:4326"""
+    for i in range(math.floor(bbox[0] / SOIL_CELL_SIZE), math.ceil(bbox[2] / SOIL_CELL_SIZE)):
+        for j in range(math.floor(bbox[1] / SOIL_CELL_SIZE), math.ceil(bbox[3] / SOIL_CELL_SIZE)):
+            yield i, j
+
+
+def soilWkt(i, j) -> str:
+    x0, y0 = i * SOIL_CELL_SIZE, j * SOIL_CELL_SIZE
+    x1, y1 = x0 + SOIL_CELL_SIZE, y0 + SOIL_CELL_SIZE
+    return f"POLYGON (({x0} {y0}, {x1} {y0}, {x1} {y1}, {x0} {y1}, {x0} {y0}))"
+
+
+def muaggattRow(key) -> list:
+    n = key - 100000
+    row = [None] * MUAGGATT_COLUMNS
+    row[0] = f"S{n}"
+    row[1] = f"Synthetic map unit {n}"
+    row[DRCLASSDCD_INDEX] = "Well drained" if n % 2 else "Poorly drained"
+    row[HYDGRPDCD_INDEX] = HSG_VALUES[n % len(HSG_VALUES)]
+    row[-1] = str(key)
+    return row
+
+
+def mupolygonRow(key) -> list:
+    """mupolygonkey, mukey, areasymbol, nationalmusym, mupolygongeo"""
+    i, j = mupolygonCell(key)
+    return [str(key), str(mukey(i, j)), "XX001", f"n{mukey(i, j)}", soilWkt(i, j)]
+
+
+def writeAoi(path, center_lon, center_lat, area_acres):
+    """Square AOI of area_acres in EPSG:5070 centered at the given point"""
+    srs_4326 = osr.SpatialReference()
+    srs_4326.ImportFromEPSG(4326)
+    srs_4326.SetAxisMappingStrategy(osr.OAMS_TRADITIONAL_GIS_ORDER)
+    srs = osr.SpatialReference()
+    srs.ImportFromEPSG(5070)
+    x, y, _ = osr.CoordinateTransformation(srs_4326, srs).TransformPoint(center_lon, center_lat)
+
+    half = math.sqrt(area_acres * 4046.8564224) / 2
+    ds = ogr.GetDriverByName("GPKG").CreateDataSource(path)
+    layer = ds.CreateLayer("aoi", srs, ogr.wkbPolygon)
+    feat = ogr.Feature(layer.GetLayerDefn())
+    feat.SetGeometry(
+        ogr.CreateGeometryFromWkt(
+            f"POLYGON (({x - half} {y - half}, {x + half} {y - half}, {x + half} {y + half}, "
+            f"{x - half} {y + half}, {x - half} {y - half}))"
+        )
+    )
+    layer.CreateFeature(feat)
+    ds = None
+    return (x - half, y - half, x + half, y + half)
+
+
+def writeLandCover(path, extent, cell_size=30):
+    """NLCD like land cover raster in EPSG:5070 covering extent"""
+    xmin = math.floor(extent[0] / cell_size) * cell_size
+    ymax = math.ceil(extent[3] / cell_size) * cell_size
+    width = math.ceil((extent[2] - xmin) / cell_size)
+    height = math.ceil((ymax - extent[1]) / cell_size)
+    array = patchValues(NLCD_CLASSES, int(xmin // cell_size), int(-ymax // cell_size), width, height)
+    writeRaster(path, array, (xmin, cell_size, 0, ymax, 0, -cell_size), "EPSG:5070")
+
+
+def writeSoils(path, extent, cell_size=1000):
+    """Soil polygons in EPSG:5070 with an hsg field covering extent"""
+    srs = osr.SpatialReference()
+    srs.ImportFromEPSG(5070)
+    ds = ogr.GetDriverByName("GPKG").CreateDataSource(path)
+    layer = ds.CreateLayer("soils", srs, ogr.wkbPolygon)
+    layer.CreateField(ogr.FieldDefn("hsg", ogr.OFTString))
+    layer.StartTransaction()
+    for i in range(math.floor(extent[0] / cell_size), math.ceil(extent[2] / cell_size)):
+        for j in range(math.floor(extent[1] / cell_size), math.ceil(extent[3] / cell_size)):
+            x0, y0 = i * cell_size, j * cell_size
+            x1, y1 = x0 + cell_size, y0 + cell_size
+            feat = ogr.Feature(layer.GetLayerDefn())
+            feat.SetField("hsg", "ABCD"[(i * 7 + j * 13) % 4])
+            feat.SetGeometry(
+                ogr.CreateGeometryFromWkt(f"POLYGON (({x0} {y0}, {x1} {y0}, {x1} {y1}, {x0} {y1}, {x0} {y0}))")
+            )
+            layer.CreateFeature(feat)
+    layer.CommitTransaction()
+    ds = None
+
+
+def writeWorldCoverTiles(folder, extent_4326, tile_url_name="ESA_WorldCover_10m_2021_v200_{}_Map.vrt"):
+    """Stand-in WorldCover tiles intersecting extent. Each tile is a VRT of the full 36000 x 36000
+    tile size upsampling one small shared pattern raster, so they cost nothing to create."""
+    os.makedirs(folder, exist_ok=True)
+    pattern = os.path.join(folder, "pattern.tif")
+    if not os.path.exists(pattern):
+        writeRaster(pattern, patchValues(ESA_CLASSES, 0, 0, 360, 360), (0, 1, 0, 0, 0, -1), "EPSG:4326")
+
+    for lon in range(math.floor(extent_4326[0] / 3) * 3, math.ceil(extent_4326[2] / 3) * 3, 3):
+        for lat in range(math.floor(extent_4326[1] / 3) * 3, math.ceil(extent_4326[3] / 3) * 3, 3):
+            name = f"{'N' if lat >= 0 else 'S'}{abs(lat):02d}{'E' if lon >= 0 else 'W'}{abs(lon):03d}"
+            path = os.path.join(folder, tile_url_name.format(name))
+            if os.path.exists(path):
+                continue
+            with open(path, "w") as f:
+                f.write(
+                    f"""<VRTDataset rasterXSize="36000" rasterYSize="36000">
+  <SRS>EPSG:4326</SRS>
+  <GeoTransform>{lon}, {1 / 12000!r}, 0, {lat + 3}, 0, {-1 / 12000!r}</GeoTransform>
+  <VRTRasterBand dataType="Byte" band="1">
+    <NoDataValue>0</NoDataValue>
+    <SimpleSource resampling="nearest">
+      <SourceFilename relativeToVRT="1">pattern.tif</SourceFilename>
+      <SourceBand>1</SourceBand>
+      <SrcRect xOff="0" yOff="0" xSize="360" ySize="360" />
+      <DstRect xOff="0" yOff="0" xSize="36000" ySize="36000" />
+    </SimpleSource>
+  </VRTRasterBand>
+</VRTDataset>
+"""
+                )
+    return os.path.join(folder, tile_url_name)
@@ -0,0 +1,246 @@
+# -*- coding: utf-8 -*-
+
+"""
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+
+Run a Curve Number Generator algorithm headless for every AOI of a layer, e.g. every HUC-12 of a region.
+
+    python -m curve_number_generator.batch huc12.gpkg output_folder --layer huc12 --id-field huc12 --workers 4
+
+Run it with the Python interpreter of a QGIS installation, with the folder containing the plugin on the
+PYTHONPATH. Each AOI is processed in a pool of worker processes, each one with its own QGIS instance.
+Vector outputs are appended to one GeoPackage per output in output_folder with an aoi_id field. Raster
+outputs are kept per AOI in a folder per output and mosaicked into a VRT. The status of every AOI is
+written to output_folder/status.csv as it completes, AOIs that are done there are skipped on a rerun.
+"""
+
+__author__ = "Abdul Raheem Siddiqui"
+__date__ = "2026-10-18"
+__copyright__ = "(C) 2026 by Abdul Raheem Siddiqui"
+
+# This will get replaced with a git SHA1 when you do a git archive
+
+__revision__ = "$Format:%H$"
+
+import argparse
+import csv
+import json
+import multiprocessing
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+STATUS_FIELDS = ["aoi_id", "fid", "status", "seconds", "error", "outputs"]
+
+_app = None  # QgsApplication of a worker process
+
+
+def startQgis() -> None:
+    """Initialize QGIS and Processing without a GUI in this worker process"""
+    global _app
+    from qgis.core import QgsApplication
+
+    QgsApplication.setPrefixPath(os.environ.get("QGIS_PREFIX_PATH", "/usr"), True)
+    _app = QgsApplication([], False)
+    _app.initQgis()
+    sys.path.append(os.path.join(QgsApplication.prefixPath(), "share", "qgis", "python", "plugins"))
+
+    from processing.core.Processing import Processing
+
+    Processing.initialize()
+
+    from curve_number_generator.processing import CurveNumberGeneratorProvider
+
+    QgsApplication.processingRegistry().addProvider(CurveNumberGeneratorProvider())
+
+
+def safeName(aoi_id) -> str:
+    return re.sub(r"[^\w.-]", "_", str(aoi_id))
+
+
+def runAoi(
+    algorithm: str, source: str, layer_name: str, fid: int, aoi_id, parameters: dict, outputs: list, folder: str
+) -> dict:
+    """Run algorithm on one AOI feature in a worker process, writing outputs to per AOI files in folder"""
+    import processing
+    from qgis.core import QgsApplication, QgsProcessingFeedback, QgsVectorLayer
+
+    start = time.perf_counter()
+    status = {"aoi_id": aoi_id, "fid": fid, "status": "failed", "error": "", "outputs": {}}
+    try:
+        aoi = QgsVectorLayer(f"{source}|layername={layer_name}" if layer_name else source, "aoi", "ogr")
+        aoi.setSubsetString(f"fid = {int(fid)}")
+        if not aoi.isValid() or not aoi.featureCount():
+            raise ValueError(f"AOI feature {fid} not found in {source}")
+
+        alg = QgsApplication.processingRegistry().algorithmById(f"curvenumbergenerator:{algorithm}")
+        run_parameters = dict(parameters, aoi=aoi)
+        for name in outputs:
+            extension = alg.parameterDefinition(name).defaultFileExtension()
+            output_folder = os.path.join(folder, name)
+            os.makedirs(output_folder, exist_ok=True)
+            run_parameters[name] = os.path.join(output_folder, f"{safeName(aoi_id)}.{extension}")
+
+        results = processing.run(f"curvenumbergenerator:{algorithm}", run_parameters, feedback=QgsProcessingFeedback())
+        status["outputs"] = {name: results[name] for name in outputs if results.get(name)}
+        status["status"] = "done"
+    except Exception as e:  # reported in the status table, the batch goes on
+        status["error"] = f"{type(e).__name__}: {e}"
+    status["seconds"] = round(time.perf_counter() - start, 3)
+    return status
+
+
+def readAois(source: str, layer_name: str, id_field: str) -> list:
+    """(fid, AOI id) of every feature of the AOI layer"""
+    from osgeo import ogr
+
+    ds = ogr.Open(source)
+    if ds is None:
+        raise SystemExit(f"Cannot open {source}")
+    layer = ds.GetLayerByName(layer_name) if layer_name else ds.GetLayer(0)
+    if layer is None:
+        raise SystemExit(f"No layer {layer_name} in {source}")
+    layer.SetIgnoredFields(["OGR_GEOMETRY"] + [f.GetName() for f in layer.schema if f.GetName() != id_field])
+    return [(feature.GetFID(), feature.GetField(id_field) if id_field else feature.GetFID()) for feature in layer]
+
+
+def readStatus(path: str) -> dict:
+    """Rows of an existing status table by AOI id"""
+    if not os.path.exists(path):
+        return {}
+    with open(path, newline="") as f:
+        return {row["aoi_id"]: row for row in csv.DictReader(f)}
+
+
+def sqlString(value) -> str:
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def appendToStore(store: str, layer_name: str, part: str, aoi_id) -> None:
+    """Append the features of the GeoPackage part to layer_name of store, tagged with aoi_id. Features of
+    aoi_id already in the store are replaced, e.g. when a rerun appends again an AOI whose status was not
+    written because the batch stopped."""
+    from osgeo import gdal, ogr
+
+    ds = ogr.Open(part)
+    source_layer = ds.GetLayer(0).GetName()
+    ds = None
+    if os.path.exists(store):
+        ds = ogr.Open(store, update=1)
+        if ds.GetLayerByName(layer_name) is not None:
+            ds.ExecuteSQL(f'DELETE FROM "{layer_name}" WHERE aoi_id = {sqlString(aoi_id)}')
+        ds = None
+    options = gdal.VectorTranslateOptions(
+        format="GPKG",
+        layerName=layer_name,
+        accessMode="append" if os.path.exists(store) else None,
+        SQLStatement=f'SELECT *, {sqlString(aoi_id)} AS aoi_id FROM "{source_layer}"',
+        SQLDialect="SQLITE",
+    )
+    if gdal.VectorTranslate(store, part, options=options) is None:
+        raise RuntimeError(f"Cannot append {part} to {store}: {gdal.GetLastErrorMsg()}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("aois", help="vector file of the AOI polygons")
+    parser.add_argument("output", help="output folder, shared by reruns of the batch")
+    parser.add_argument("--layer", default="", help="AOI layer name, the first layer by default")
+    parser.add_argument("--id-field", default="", help="field identifying AOIs in the outputs, the fid by default")
+    parser.add_argument("--algorithm", default="conusnlcdssurgo", help="curvenumbergenerator algorithm id")
+    parser.add_argument("--outputs", nargs="+", default=["CurveNumber"], help="outputs of the algorithm to keep")
+    parser.add_argument(
+        "--param", action="append", default=[], metavar="NAME=VALUE", help="algorithm parameter, values are JSON or text"
+    )
+    parser.add_argument("--workers", type=int, default=max(1, min(4, (os.cpu_count() or 2) // 2)))
+    parser.add_argument("--retry-failed", action="store_true", help="rerun the AOIs that failed in a previous run")
+    args = parser.parse_args()
+
+    parameters = {}
+    for param in args.param:
+        name, _, value = param.partition("=")
+        try:
+            parameters[name] = json.loads(value)
+        except ValueError:
+            parameters[name] = value
+
+    os.makedirs(args.output, exist_ok=True)
+    status_path = os.path.join(args.output, "status.csv")
+    previous = readStatus(status_path)
+    skip = {"done", "failed"} if not args.retry_failed else {"done"}
+    aois = [
+        (fid, aoi_id)
+        for fid, aoi_id in readAois(args.aois, args.layer, args.id_field)
+        if previous.get(str(aoi_id), {}).get("status") not in skip
+    ]
+    print(f"{len(aois)} AOIs to process with {args.workers} workers", flush=True)
+
+    new_table = not os.path.exists(status_path)
+    counts = {"done": 0, "failed": 0}
+    with open(status_path, "a", newline="") as status_file:
+        writer = csv.DictWriter(status_file, STATUS_FIELDS)
+        if new_table:
+            writer.writeheader()
+
+        # spawned rather than forked workers, each initializes its own QGIS
+        with ProcessPoolExecutor(
+            max_workers=args.workers, mp_context=multiprocessing.get_context("spawn"), initializer=startQgis
+        ) as executor:
+            futures = {
+                executor.submit(
+                    runAoi, args.algorithm, args.aois, args.layer, fid, aoi_id, parameters, args.outputs, args.output
+                ): (fid, aoi_id)
+                for fid, aoi_id in aois
+            }
+            for future in as_completed(futures):
+                try:
+                    status = future.result()
+                except Exception as e:  # the worker process died, e.g. out of memory
+                    fid, aoi_id = futures[future]
+                    status = {"aoi_id": aoi_id, "fid": fid, "status": "failed", "seconds": "", "error": repr(e)}
+                    status["outputs"] = {}
+                # vector outputs go to the shared store from this process only, GeoPackages have one writer at a time
+                for name, path in list(status["outputs"].items()):
+                    if path.endswith(".gpkg"):
+                        try:
+                            store = os.path.join(args.output, f"{name}.gpkg")
+                            appendToStore(store, name, path, status["aoi_id"])
+                            os.remove(path)
+                            status["outputs"][name] = store
+                        except Exception as e:
+                            status["status"], status["error"] = "failed", str(e)
+
+                counts[status["status"]] += 1
+                writer.writerow(dict(status, outputs=json.dumps(status["outputs"])))
+                status_file.flush()
+                progress = f"[{sum(counts.values())}/{len(aois)}]"
+                print(f"{progress} {status['aoi_id']}: {status['status']} {status['error']}", flush=True)
+
+    # mosaic of the raster outputs of all the AOIs processed so far
+    from osgeo import gdal
+
+    for name in args.outputs:
+        folder = os.path.join(args.output, name)
+        if not os.path.isdir(folder):
+            continue
+        rasters = sorted(os.path.join(folder, f) for f in os.listdir(folder) if f.endswith(".tif"))
+        if rasters:
+            gdal.BuildVRT(os.path.join(args.output, f"{name}.vrt"), rasters)
+        elif not os.listdir(folder):  # vector parts, all appended to the store
+            os.rmdir(folder)
+
+    print(f"{counts['done']} done, {counts['failed']} failed, status in {status_path}")
+    sys.exit(1 if counts["failed"] else 0)
+
+
+if __name__ == "__main__":
+    main()
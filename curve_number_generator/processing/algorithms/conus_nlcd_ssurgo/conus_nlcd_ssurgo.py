@@ -22,19 +22,23 @@
  ***************************************************************************/
 """
 import inspect
+import math
 import os
 import sys
+from functools import partial
 
 import processing
 from qgis.core import (
     QgsCoordinateReferenceSystem,
     QgsProcessing,
     QgsProcessingMultiStepFeedback,
+    QgsProcessingOutputString,
     QgsProcessingParameterBoolean,
     QgsProcessingParameterDefinition,
     QgsProcessingParameterRasterDestination,
     QgsProcessingParameterVectorDestination,
     QgsProcessingParameterVectorLayer,
+    QgsProcessingUtils,
     QgsUnitTypes,
 )
 from qgis.PyQt.QtGui import QIcon
@@ -42,24 +46,40 @@ from qgis.PyQt.QtGui import QIcon
 from curve_number_generator.processing.algorithms.conus_nlcd_ssurgo.ssurgo_soil import (
     SsurgoSoil,
 )
-from curve_number_generator.processing.config import CONUS_NLCD_SSURGO, PLUGIN_VERSION
+from curve_number_generator.processing.config import (
+    CONUS_NLCD_SSURGO,
+    NLCD_GRID_ORIGIN,
+    PLUGIN_VERSION,
+)
 from curve_number_generator.processing.curve_number_generator_algorithm import (
     CurveNumberGeneratorAlgorithm,
 )
-from curve_number_generator.processing.tools.curve_numper import CurveNumber
+from curve_number_generator.processing.tools.cn_lookup import (
+    applyCnLookup,
+    buildCnLookupArray,
+)
+from curve_number_generator.processing.tools.composite_cn import compositeCurveNumber
+from curve_number_generator.processing.tools.curve_number import CurveNumber
+from curve_number_generator.processing.tools.data_sources import WcsSource, getDataSource
+from curve_number_generator.processing.tools.instrumentation import StageReport
 from curve_number_generator.processing.tools.utils import (
     checkAreaLimits,
     createDefaultLookup,
-    createRequestBBOXDim,
-    downloadFile,
     fixGeometries,
+    gdalMerge,
     gdalPolygonize,
+    gdalRasterize,
     gdalWarp,
     getAndUpdateMessage,
     getExtent,
     getExtentArea,
     getExtentWKTIn3857,
+    mergeVectorLayers,
     reprojectLayer,
+    runConcurrently,
+    snapExtentToGrid,
+    splitByAoiFeatures,
+    splitExtent,
 )
 
 cmd_folder = os.path.split(inspect.getfile(inspect.currentframe()))[0]
@@ -74,6 +94,15 @@ __copyright__ = "(C) 2022 by Abdul Raheem Siddiqui"
 
 __revision__ = "$Format:%H$"
 
+# values of the rasterized soil layer used by the raster engine
+HSG_CODES = {"": 0, "A": 1, "B": 2, "C": 3, "D": 4}
+WATER_HSG_CODE = 5
+
+AREA_SOFT_LIMIT = 100000  # acres
+AREA_HARD_LIMIT = 500000  # acres
+# side in meters of the largest square tile on the NLCD grid that is within the soft limit
+TILE_SIZE = math.floor(math.sqrt(AREA_SOFT_LIMIT * 4046.8564224) / 30) * 30
+
 
 class ConusNlcdSsurgo(CurveNumberGeneratorAlgorithm):
     # Constants used to refer to parameters and outputs. They will be
@@ -108,6 +137,36 @@ class ConusNlcdSsurgo(CurveNumberGeneratorAlgorithm):
         )
         param.setFlags(param.flags() | QgsProcessingParameterDefinition.FlagAdvanced)
         self.addParameter(param)
+        param = QgsProcessingParameterBoolean(
+            "Tiled",
+            f"Process Large Areas in Tiles? [required for areas over {AREA_HARD_LIMIT:,} acres, vector outputs are split at tile edges]",
+            defaultValue=False,
+        )
+        param.setFlags(param.flags() | QgsProcessingParameterDefinition.FlagAdvanced)
+        self.addParameter(param)
+        param = QgsProcessingParameterBoolean(
+            "RasterEngine",
+            "Use Raster Engine? [faster for large areas, vector Curve Number only keeps cn field]",
+            defaultValue=False,
+        )
+        param.setFlags(param.flags() | QgsProcessingParameterDefinition.FlagAdvanced)
+        self.addParameter(param)
+        param = QgsProcessingParameterBoolean(
+            "PerFeature",
+            "Split Curve Number by Area of Interest Feature? [adds an aoi_fid field, data is still downloaded once]",
+            defaultValue=False,
+        )
+        param.setFlags(param.flags() | QgsProcessingParameterDefinition.FlagAdvanced)
+        self.addParameter(param)
+        self.addParameter(
+            QgsProcessingParameterVectorLayer(
+                "Zones",
+                "Zones for Composite Curve Number [e.g. subbasins]",
+                optional=True,
+                types=[QgsProcessing.TypeVectorPolygon],
+                defaultValue=None,
+            )
+        )
         self.addParameter(
             QgsProcessingParameterRasterDestination(
                 "NLCDLandCover",
@@ -144,13 +203,34 @@ class ConusNlcdSsurgo(CurveNumberGeneratorAlgorithm):
                 defaultValue=None,
             )
         )
+        self.addParameter(
+            QgsProcessingParameterRasterDestination(
+                "CurveNumberRaster",
+                "Curve Number (Raster)",
+                optional=True,
+                createByDefault=False,
+                defaultValue=None,
+            )
+        )
+        self.addParameter(
+            QgsProcessingParameterVectorDestination(
+                "CompositeCurveNumber",
+                "Composite Curve Number [table per zone]",
+                type=QgsProcessing.TypeVector,
+                optional=True,
+                createByDefault=False,
+                defaultValue=None,
+            )
+        )
+        self.addOutput(QgsProcessingOutputString("StageReport", "Stage Report"))
 
     def processAlgorithm(self, parameters, context, model_feedback):
         # Use a multi-step feedback, so that individual child algorithm progress reports are adjusted for the
         # overall progress through the model
-        feedback = QgsProcessingMultiStepFeedback(19, model_feedback)
+        feedback = QgsProcessingMultiStepFeedback(21, model_feedback)
         results = {}
         outputs = {}
+        stage_report = StageReport.start()
 
         # Assiging Default CN_Lookup Table
         if not parameters.get("CnLookup", None):
@@ -178,31 +258,75 @@ class ConusNlcdSsurgo(CurveNumberGeneratorAlgorithm):
 
         area_acres = getExtentArea(aoi_layer, QgsUnitTypes.AreaAcres)
 
-        checkAreaLimits(area_acres, 100000, 500000, feedback=feedback)
-        extent = getExtent(aoi_layer)
+        if self.parameterAsBool(parameters, "Tiled", context) and area_acres > AREA_SOFT_LIMIT:
+            results = self.processTiles(parameters, aoi_layer, orig_epsg_code, context, model_feedback)
+            if results:
+                results["StageReport"] = stage_report.finish(model_feedback)
+            return results
+
+        checkAreaLimits(area_acres, AREA_SOFT_LIMIT, AREA_HARD_LIMIT, feedback=feedback)
+        # snap to the NLCD grid so that the requested cells line up with the source and with neighbouring tiles
+        extent = snapExtentToGrid(getExtent(aoi_layer), 30, NLCD_GRID_ORIGIN)
         # add a buffer cell on each side, refer to #49 for reasoning
         extent = (extent[0] - 30, extent[1] - 30, extent[2] + 30, extent[3] + 30)
-        bbox_dim = createRequestBBOXDim(extent, 30)
 
-        # NLCD Impervious Raster
+        raster_engine = self.parameterAsBool(parameters, "RasterEngine", context)
+        composite_required = bool(parameters.get("Zones", None) and parameters.get("CompositeCurveNumber", None))
+        # the composite is summed from the Curve Number raster unless only the vector Curve Number is computed
+        composite_from_raster = composite_required and (
+            raster_engine or parameters.get("CurveNumberRaster", None) or not parameters.get("CurveNumber", None)
+        )
+        cn_required = any(
+            [parameters.get("CurveNumber", None), parameters.get("CurveNumberRaster", None), composite_required]
+        )
+
+        # Data acquisitions are independent of each other so they are run concurrently,
+        # everything that needs the processing context runs afterwards in this thread
+        nlcd_error_message = "Error requesting land use data from 'www.mrlc.gov'. Most probably because either their server is down or there is a certification issue.\nThis should be temporary. Try again later.\n"
+        downloads = {}
         if parameters.get("NLCDImpervious", None):
-            outputs["DownloadNlcdImp"] = downloadFile(
-                CONUS_NLCD_SSURGO["NLCD_IMP_2021"].format(
-                    epsg_code,
-                    bbox_dim[0],
-                    bbox_dim[1],
-                    ",".join([str(item) for item in extent]),
+            imp_source = getDataSource(
+                "NLCD_IMP_2021",
+                WcsSource(
+                    CONUS_NLCD_SSURGO["NLCD_IMP_2021"],
+                    30,
+                    CONUS_NLCD_SSURGO["NLCD_IMP_2021_PING"],
+                    nlcd_error_message,
+                ),
+            )
+            downloads["DownloadNlcdImp"] = partial(imp_source.fetch, extent, epsg_code, feedback)
+
+        if any([parameters.get("NLCDLandCover", None), cn_required]):
+            lc_source = getDataSource(
+                "NLCD_LC_2021",
+                WcsSource(
+                    CONUS_NLCD_SSURGO["NLCD_LC_2021"],
+                    30,
+                    CONUS_NLCD_SSURGO["NLCD_LC_2021_PING"],
+                    nlcd_error_message,
                 ),
-                "https://www.mrlc.gov/geoserver/mrlc_display/NLCD_2021_Impervious_L48/ows",
-                "Error requesting land use data from 'www.mrlc.gov'. Most probably because either their server is down or there is a certification issue.\nThis should be temporary. Try again later.\n",
-                context=context,
-                feedback=feedback,
             )
+            downloads["DownloadNlcdLC"] = partial(lc_source.fetch, extent, epsg_code, feedback)
 
-            step += 1
-            feedback.setCurrentStep(step)
-            if feedback.isCanceled():
-                return {}
+        if any([parameters.get("Soils", None), cn_required]):
+            ssurgoSoil = SsurgoSoil(parameters["aoi"], context=context, feedback=feedback)
+            # Call class method in required sequence
+            ssurgoSoil.reprojectTo4326()
+            downloads["Soils"] = partial(getDataSource("SSURGO_SOILS", ssurgoSoil).fetch, extent, epsg_code, feedback)
+
+        step += 1
+        feedback.setCurrentStep(step)
+        if feedback.isCanceled():
+            return {}
+
+        feedback.pushInfo("Downloading data...")
+        downloaded = runConcurrently(downloads, feedback)
+        if feedback.isCanceled():
+            return {}
+
+        # NLCD Impervious Raster
+        if parameters.get("NLCDImpervious", None):
+            outputs["DownloadNlcdImp"] = downloaded["DownloadNlcdImp"].result()
 
             # failing if called by processing.run()
             try:
@@ -212,13 +336,15 @@ class ConusNlcdSsurgo(CurveNumberGeneratorAlgorithm):
 
             # reproject to original crs
             # Warp (reproject)
-            results["NLCDImpervious"] = gdalWarp(
+            outputs["NLCDImpervious"] = gdalWarp(
                 outputs["DownloadNlcdImp"],
                 QgsCoordinateReferenceSystem(str(orig_epsg_code)),
-                parameters["NLCDImpervious"],
                 context=context,
                 feedback=feedback,
             )
+            results["NLCDImpervious"] = self.rasterOutput(
+                outputs["NLCDImpervious"], parameters, "NLCDImpervious", context, feedback
+            )
 
             step += 1
             feedback.setCurrentStep(step)
@@ -229,24 +355,8 @@ class ConusNlcdSsurgo(CurveNumberGeneratorAlgorithm):
             self.handle_post_processing(results["NLCDImpervious"], imp_style_path, context)
 
         # NLCD Land Cover Data
-        if any([parameters.get("NLCDLandCover", None), parameters.get("CurveNumber", None)]):
-            outputs["DownloadNlcdLC"] = downloadFile(
-                CONUS_NLCD_SSURGO["NLCD_LC_2021"].format(
-                    epsg_code,
-                    bbox_dim[0],
-                    bbox_dim[1],
-                    ",".join([str(item) for item in extent]),
-                ),
-                "https://www.mrlc.gov/geoserver/mrlc_display/NLCD_2021_Land_Cover_L48/ows",
-                "Error requesting land use data from 'www.mrlc.gov'. Most probably because either their server is down or there is a certification issue.\nThis should be temporary. Try again later.\n",
-                context=context,
-                feedback=feedback,
-            )
-
-            step += 1
-            feedback.setCurrentStep(step)
-            if feedback.isCanceled():
-                return {}
+        if any([parameters.get("NLCDLandCover", None), cn_required]):
+            outputs["DownloadNlcdLC"] = downloaded["DownloadNlcdLC"].result()
 
             if parameters.get("NLCDLandCover", None):
                 try:
@@ -254,16 +364,11 @@ class ConusNlcdSsurgo(CurveNumberGeneratorAlgorithm):
                 except AttributeError:
                     pass
 
-                lc_output = parameters["NLCDLandCover"]
-            else:
-                lc_output = QgsProcessing.TEMPORARY_OUTPUT
-
             # reproject to original crs
             # Warp (reproject)
             outputs["NLCDLandCover"] = gdalWarp(
                 outputs["DownloadNlcdLC"],
                 QgsCoordinateReferenceSystem(str(orig_epsg_code)),
-                lc_output,
                 context=context,
                 feedback=feedback,
             )
@@ -275,21 +380,15 @@ class ConusNlcdSsurgo(CurveNumberGeneratorAlgorithm):
 
             if parameters.get("NLCDLandCover", None):
                 lc_style_path = os.path.join(cmd_folder, "nlcd_land_cover.qml")
-                results["NLCDLandCover"] = outputs["NLCDLandCover"]
+                results["NLCDLandCover"] = self.rasterOutput(
+                    outputs["NLCDLandCover"], parameters, "NLCDLandCover", context, feedback
+                )
                 self.handle_post_processing(results["NLCDLandCover"], lc_style_path, context)
 
         # Soil Layer
-        if any([parameters.get("Soils", None), parameters.get("CurveNumber", None)]):
-            ssurgoSoil = SsurgoSoil(parameters["aoi"], context=context, feedback=feedback)
-            # Call class method in required sequence
-            ssurgoSoil.reprojectTo4326()
-            step += 1
-            feedback.setCurrentStep(step)
-            if feedback.isCanceled():
-                return {}
-
+        if any([parameters.get("Soils", None), cn_required]):
             try:
-                ssurgoSoil.postRequest()
+                ssurgoSoil.soil_layer = downloaded["Soils"].result()
                 step += 1
                 feedback.setCurrentStep(step)
                 if feedback.isCanceled():
@@ -362,28 +461,9 @@ class ConusNlcdSsurgo(CurveNumberGeneratorAlgorithm):
                 self.handle_post_processing(results["Soils"], soils_style_path, context)
 
         # # Curve Number Calculations
-        if parameters.get("CurveNumber", None):
-            # Prepare Land Cover for Curve Number Calculation
-            # Polygonize (raster to vector)
-            outputs["NLCDLandCoverPolygonize"] = gdalPolygonize(
-                outputs["NLCDLandCover"],
-                "land_cover",
-                context=context,
-                feedback=feedback,
-            )
-
-            step += 1
-            feedback.setCurrentStep(step)
-            if feedback.isCanceled():
-                return {}
-
-            # Fix geometries
-            outputs["NLCDLandCoverVector"] = fixGeometries(
-                outputs["NLCDLandCoverPolygonize"], context=context, feedback=feedback
-            )
-
+        if cn_required:
             # Prepare Soil for Curve Number Calculation by turning dual soil to single soil
-            if parameters["DrainedSoils"]:
+            if self.parameterAsBool(parameters, "DrainedSoils", context):
                 single_soil_formula = "replace(\"HYDGRPDCD\", '/D', '')"
             else:
                 single_soil_formula = "replace(\"HYDGRPDCD\", map('A/', '', 'B/', '', 'C/', ''))"
@@ -405,26 +485,160 @@ class ConusNlcdSsurgo(CurveNumberGeneratorAlgorithm):
                 is_child_algorithm=True,
             )["OUTPUT"]
 
-            curve_number = CurveNumber(
-                outputs["NLCDLandCoverVector"],
-                outputs["SoilsSingle"],
-                parameters["CnLookup"],
+            step += 1
+            feedback.setCurrentStep(step)
+            if feedback.isCanceled():
+                return {}
+
+        if (
+            parameters.get("CurveNumberRaster", None)
+            or (raster_engine and parameters.get("CurveNumber", None))
+            or composite_from_raster
+        ):
+            # Burn HSG of the soils onto the land cover grid, water soils without HSG get their own code
+            alg_params = {
+                "FIELD_LENGTH": 2,
+                "FIELD_NAME": "_hsg_code_",
+                "FIELD_PRECISION": 0,
+                "FIELD_TYPE": 1,  # integer
+                "FORMULA": "CASE "
+                + " ".join(f"WHEN \"_hsg_single_\" = '{hsg}' THEN {code}" for hsg, code in HSG_CODES.items() if hsg)
+                + f" WHEN \"_hsg_single_\" IS NULL AND (\"MUSYM\" = 'W' OR lower(\"MUSYM\") = 'water' OR lower(\"MUNAME\") = 'water' OR \"MUNAME\" = 'W') THEN {WATER_HSG_CODE}"
+                + f" ELSE {HSG_CODES['']} END",
+                "INPUT": outputs["SoilsSingle"],
+                "NEW_FIELD": True,
+                "OUTPUT": QgsProcessing.TEMPORARY_OUTPUT,
+            }
+            outputs["SoilsHSGCode"] = processing.run(
+                "qgis:fieldcalculator",
+                alg_params,
                 context=context,
                 feedback=feedback,
+                is_child_algorithm=True,
+            )["OUTPUT"]
+
+            lc_layer = QgsProcessingUtils.mapLayerFromString(outputs["NLCDLandCover"], context)
+            lc_extent = lc_layer.extent()
+            outputs["SoilsRaster"] = gdalRasterize(
+                outputs["SoilsHSGCode"],
+                "_hsg_code_",
+                f"{lc_extent.xMinimum()},{lc_extent.xMaximum()},{lc_extent.yMinimum()},{lc_extent.yMaximum()} [{lc_layer.crs().authid()}]",
+                lc_layer.width(),
+                lc_layer.height(),
+                nodata=255,
+                init=255,
+                data_type=0,
+                context=context,
+                feedback=feedback,
+            )
+
+            step += 1
+            feedback.setCurrentStep(step)
+            if feedback.isCanceled():
+                return {}
+
+            cn_lut = buildCnLookupArray(
+                self.parameterAsVectorLayer(parameters, "CnLookup", context),
+                hsg_map=HSG_CODES,
+                nodata_hsg=None,
+                overrides={WATER_HSG_CODE: "11_"},
+            )
+
+            if parameters.get("CurveNumberRaster", None):
+                try:
+                    parameters["CurveNumberRaster"].destinationName = "Curve Number"
+                except AttributeError:
+                    pass
+
+            outputs["CurveNumberRaster"] = applyCnLookup(
+                outputs["NLCDLandCover"],
+                outputs["SoilsRaster"],
+                cn_lut,
+                QgsProcessingUtils.generateTempFilename("CurveNumber.tif"),
+                nodata=255,
+                feedback=feedback,
             )
 
+            step += 1
+            feedback.setCurrentStep(step)
+            if feedback.isCanceled():
+                return {}
+
+            if parameters.get("CurveNumberRaster", None):
+                cn_style_path = os.path.join(os.path.dirname(cmd_folder), "curve_number_raster.qml")
+                results["CurveNumberRaster"] = self.rasterOutput(
+                    outputs["CurveNumberRaster"], parameters, "CurveNumberRaster", context, feedback
+                )
+                self.handle_post_processing(results["CurveNumberRaster"], cn_style_path, context)
+
+        if parameters.get("CurveNumber", None):
             try:
                 parameters["CurveNumber"].destinationName = "Curve Number"
             except AttributeError:
                 pass
 
-            results["CurveNumber"], step = curve_number.generateCurveNumber(
-                ["MUSYM", "HYDGRPDCD", "MUNAME", "_hsg_single_"],
-                ["MUSYM", "MUNAME", "_hsg_single_"],
-                'IF ("_hsg_single_" IS NOT NULL, "land_cover" || \'_\' ||  "_hsg_single_", IF (("MUSYM" = \'W\' OR lower("MUSYM") = \'water\' OR lower("MUNAME") = \'water\' OR "MUNAME" = \'W\'), \'11_\', "land_cover" || \'_\'))',
-                start_step=step + 1,
-                output=parameters["CurveNumber"],
-            )
+            # split by AOI feature into the output at the end
+            per_feature = self.parameterAsBool(parameters, "PerFeature", context)
+
+            if raster_engine:
+                # Polygonize (raster to vector)
+                results["CurveNumber"] = gdalPolygonize(
+                    outputs["CurveNumberRaster"],
+                    "cn",
+                    output=QgsProcessing.TEMPORARY_OUTPUT if per_feature else parameters["CurveNumber"],
+                    context=context,
+                    feedback=feedback,
+                )
+            else:
+                # Prepare Land Cover for Curve Number Calculation
+                # Polygonize (raster to vector)
+                outputs["NLCDLandCoverPolygonize"] = gdalPolygonize(
+                    outputs["NLCDLandCover"],
+                    "land_cover",
+                    context=context,
+                    feedback=feedback,
+                )
+
+                step += 1
+                feedback.setCurrentStep(step)
+                if feedback.isCanceled():
+                    return {}
+
+                # Fix geometries
+                outputs["NLCDLandCoverVector"] = fixGeometries(
+                    outputs["NLCDLandCoverPolygonize"], context=context, feedback=feedback
+                )
+
+                curve_number = CurveNumber(
+                    outputs["NLCDLandCoverVector"],
+                    outputs["SoilsSingle"],
+                    parameters["CnLookup"],
+                    context=context,
+                    feedback=feedback,
+                )
+
+                results["CurveNumber"], step = curve_number.generateCurveNumber(
+                    ["MUSYM", "HYDGRPDCD", "MUNAME", "_hsg_single_"],
+                    ["MUSYM", "MUNAME", "_hsg_single_"],
+                    'IF ("_hsg_single_" IS NOT NULL, "land_cover" || \'_\' ||  "_hsg_single_", IF (("MUSYM" = \'W\' OR lower("MUSYM") = \'water\' OR lower("MUNAME") = \'water\' OR "MUNAME" = \'W\'), \'11_\', "land_cover" || \'_\'))',
+                    start_step=step + 1,
+                    output=(
+                        QgsProcessing.TEMPORARY_OUTPUT
+                        if per_feature
+                        else self.parameterAsOutputLayer(parameters, "CurveNumber", context)
+                    ),
+                    fused=True,
+                )
+
+            outputs["CurveNumberVector"] = results["CurveNumber"]
+            if per_feature:
+                results["CurveNumber"] = splitByAoiFeatures(
+                    results["CurveNumber"],
+                    parameters["aoi"],
+                    parameters["CurveNumber"],
+                    context=context,
+                    feedback=feedback,
+                )
 
             step += 1
             feedback.setCurrentStep(step)
@@ -434,6 +648,170 @@ class ConusNlcdSsurgo(CurveNumberGeneratorAlgorithm):
             cn_style_path = os.path.join(os.path.dirname(cmd_folder), "curve_number.qml")
             self.handle_post_processing(results["CurveNumber"], cn_style_path, context)
 
+        if composite_required:
+            try:
+                parameters["CompositeCurveNumber"].destinationName = "Composite Curve Number"
+            except AttributeError:
+                pass
+
+            results["CompositeCurveNumber"] = compositeCurveNumber(
+                outputs["CurveNumberRaster"] if composite_from_raster else outputs["CurveNumberVector"],
+                self.parameterAsVectorLayer(parameters, "Zones", context),
+                self.parameterAsOutputLayer(parameters, "CompositeCurveNumber", context),
+                context=context,
+                feedback=feedback,
+            )
+
+        results["StageReport"] = stage_report.finish(model_feedback)
+        return results
+
+    def processTiles(self, parameters, aoi_layer, orig_epsg_code, context, model_feedback):
+        """Run the algorithm on each grid aligned tile of the AOI (in EPSG:5070) and stitch the tile outputs.
+        Tiles share cell edges so rasters are merged without resampling and vectors meet at the tile edges.
+        Vector features crossing a tile edge are kept as one feature per tile, they are not dissolved as that
+        would be a pass over the whole stitched layer."""
+
+        raster_outputs = [
+            ("NLCDImpervious", "NLCD Impervious Surface", os.path.join(cmd_folder, "nlcd_impervious.qml"), None),
+            ("NLCDLandCover", "NLCD Land Cover", os.path.join(cmd_folder, "nlcd_land_cover.qml"), None),
+            (
+                "CurveNumberRaster",
+                "Curve Number",
+                os.path.join(os.path.dirname(cmd_folder), "curve_number_raster.qml"),
+                255,
+            ),
+        ]
+        vector_outputs = [
+            ("Soils", "SSURGO Soils", os.path.join(cmd_folder, "soils.qml")),
+            ("CurveNumber", "Curve Number", os.path.join(os.path.dirname(cmd_folder), "curve_number.qml")),
+        ]
+        requested = [output[0] for output in raster_outputs + vector_outputs if parameters.get(output[0], None)]
+
+        # the composite is summed once over the stitched Curve Number, a raster one if nothing else is requested
+        composite_required = bool(parameters.get("Zones", None) and parameters.get("CompositeCurveNumber", None))
+        internal_cn_raster = composite_required and not {"CurveNumber", "CurveNumberRaster"} & set(requested)
+        if internal_cn_raster:
+            requested.append("CurveNumberRaster")
+            parameters = dict(parameters, CurveNumberRaster=QgsProcessing.TEMPORARY_OUTPUT)
+
+        extent = snapExtentToGrid(getExtent(aoi_layer), 30, NLCD_GRID_ORIGIN)
+        tiles = splitExtent(extent, TILE_SIZE)
+
+        feedback = QgsProcessingMultiStepFeedback(len(tiles) + len(requested), model_feedback)
+        feedback.pushInfo(f"Processing the Area of Interest in {len(tiles)} tiles of {AREA_SOFT_LIMIT:,} acres or less.\n")
+        results = {}
+        tile_outputs = {name: [] for name in requested}
+
+        step = 0
+        for tile in tiles:
+            feedback.setCurrentStep(step)
+            step += 1
+            if feedback.isCanceled():
+                return {}
+
+            alg_params = {
+                "INPUT": aoi_layer,
+                "EXTENT": f"{tile[0]},{tile[2]},{tile[1]},{tile[3]} [EPSG:5070]",
+                "CLIP": True,
+                "OUTPUT": QgsProcessing.TEMPORARY_OUTPUT,
+            }
+            tile_aoi = context.takeResultLayer(
+                processing.run(
+                    "native:extractbyextent",
+                    alg_params,
+                    context=context,
+                    feedback=feedback,
+                    is_child_algorithm=True,
+                )["OUTPUT"]
+            )
+            if not tile_aoi.featureCount():
+                continue
+
+            feedback.pushInfo(f"Processing tile {step} of {len(tiles)}\n")
+            tile_parameters = {
+                "aoi": tile_aoi,
+                "CnLookup": parameters["CnLookup"],
+                "DrainedSoils": self.parameterAsBool(parameters, "DrainedSoils", context),
+                "RasterEngine": self.parameterAsBool(parameters, "RasterEngine", context),
+                "Tiled": False,
+            }
+            tile_parameters.update({name: QgsProcessing.TEMPORARY_OUTPUT for name in requested})
+
+            tile_alg = self.create()
+            tile_results = tile_alg.processAlgorithm(tile_parameters, context, feedback)
+            if feedback.isCanceled():
+                return {}
+
+            for name in requested:
+                tile_outputs[name].append(tile_results[name])
+
+        # Stitch tiles
+        for name, display_name, style_path, nodata in raster_outputs:
+            if not tile_outputs.get(name, None):
+                continue
+            feedback.setCurrentStep(step)
+            step += 1
+            if feedback.isCanceled():
+                return {}
+
+            try:
+                parameters[name].destinationName = display_name
+            except AttributeError:
+                pass
+
+            merged = gdalMerge(tile_outputs[name], nodata=nodata, context=context, feedback=feedback)
+            warped = gdalWarp(
+                merged,
+                QgsCoordinateReferenceSystem(str(orig_epsg_code)),
+                context=context,
+                feedback=feedback,
+            )
+            results[name] = self.rasterOutput(warped, parameters, name, context, feedback)
+            self.handle_post_processing(results[name], style_path, context)
+
+        for name, display_name, style_path in vector_outputs:
+            if not tile_outputs.get(name, None):
+                continue
+            feedback.setCurrentStep(step)
+            step += 1
+            if feedback.isCanceled():
+                return {}
+
+            try:
+                parameters[name].destinationName = display_name
+            except AttributeError:
+                pass
+
+            # the tiles cut the AOI features, so the per feature split is done on the merged output
+            per_feature = name == "CurveNumber" and self.parameterAsBool(parameters, "PerFeature", context)
+            results[name] = mergeVectorLayers(
+                tile_outputs[name],
+                QgsCoordinateReferenceSystem(str(orig_epsg_code)),
+                QgsProcessing.TEMPORARY_OUTPUT if per_feature else parameters[name],
+                context=context,
+                feedback=feedback,
+            )
+            if per_feature:
+                results[name] = splitByAoiFeatures(
+                    results[name], parameters["aoi"], parameters[name], context=context, feedback=feedback
+                )
+            self.handle_post_processing(results[name], style_path, context)
+
+        if composite_required:
+            try:
+                parameters["CompositeCurveNumber"].destinationName = "Composite Curve Number"
+            except AttributeError:
+                pass
+
+            cn = results.pop("CurveNumberRaster") if internal_cn_raster else results.get("CurveNumberRaster")
+            results["CompositeCurveNumber"] = compositeCurveNumber(
+                cn or results["CurveNumber"],
+                self.parameterAsVectorLayer(parameters, "Zones", context),
+                self.parameterAsOutputLayer(parameters, "CompositeCurveNumber", context),
+                context=context,
+                feedback=feedback,
+            )
+
         return results
 
     def name(self):
@@ -474,6 +852,14 @@ class ConusNlcdSsurgo(CurveNumberGeneratorAlgorithm):
 <p>Polygon layer representing area of interest.</p>
 <h3>Lookup Table [optional]</h3>
 <p>Optional Table to relate NLCD Land Cover Value and HSG Value to a particular curve number. By default the algorithm uses pre defined table. The table must have two columns 'grid_code' and 'cn'. grid_code is concatenation of NLCD Land Use code and Hydrologic Soil Group (HSG). <a href="https://raw.githubusercontent.com/ar-siddiqui/curve_number_generator/v{PLUGIN_VERSION}/curve_number_generator/processing/algorithms/conus_nlcd_ssurgo/default_lookup.csv">Template csv file to create custom table</a> (add an optional <a href="https://raw.githubusercontent.com/ar-siddiqui/curve_number_generator/v{PLUGIN_VERSION}/curve_number_generator/processing/algorithms/conus_nlcd_ssurgo/default_lookup.csvt">`.csvt`</a> file to control column data types).</p>
+<h3>Process Large Areas in Tiles?</h3>
+<p>If checked, an Area of Interest larger than 100,000 acres is split into tiles on the NLCD grid. Each tile is downloaded and processed on its own and the outputs are stitched together. This keeps the memory use and the size of each request bounded and allows areas larger than 500,000 acres. Vector outputs (Soils and Curve Number) are split at the tile edges: a polygon crossing an edge is one feature per tile, with the same attributes.</p>
+<h3>Use Raster Engine?</h3>
+<p>If checked, the Curve Number is computed per pixel by burning the soil HSG onto the NLCD Land Cover grid instead of overlaying vector layers. This is much faster for large areas. The vectorized Curve Number layer will only have the cn field.</p>
+<h3>Split Curve Number by Area of Interest Feature?</h3>
+<p>If checked, the Curve Number layer is split by the features of the Area of Interest and each part gets an aoi_fid field with the feature id of its Area of Interest feature, e.g. to summarize the Curve Number per parcel. The data is still downloaded and processed once for the whole Area of Interest. Parts that are in several overlapping Area of Interest features are repeated once per feature.</p>
+<h3>Zones for Composite Curve Number [optional]</h3>
+<p>Polygon layer of the zones, e.g. subbasins, to compute the Composite Curve Number table for. Zones should not overlap. The areas are summed from the Curve Number raster, by pixel center, when the Raster Engine is used, when Curve Number (Raster) is requested or when the vector Curve Number is not requested. Otherwise they are summed from the overlay of the zones with the vector Curve Number layer.</p>
 <h3>Drained Soils? [leave unchecked if not sure]</h3>
 <p>Certain Soils are categorized as dual category in SSURGO dataset. They have Hydrologic Soil Group D for Undrained Conditions and Hydrologic Soil Group A/B/C for Drained Conditions.
 
@@ -489,6 +875,16 @@ If checked the algorithm will assume HSG A/B/C for each dual category soil.</p>
 <p>SSURGO Extended Soil Dataset </p>
 <h3>Curve Number</h3>
 <p>Generated Curve Number layer based on Land Cover and HSG values.</p>
+<h3>Curve Number (Raster)</h3>
+<p>Generated Curve Number raster on the NLCD Land Cover grid.</p>
+<h3>Composite Curve Number</h3>
+<p>Table with one row per polygon of the Zones layer, with the zone attributes and:
+<ul>
+<li>area_m2: area in square meters of the zone that has a Curve Number</li>
+<li>composite_cn: area-weighted composite Curve Number of the zone, NULL if no part of the zone has a Curve Number</li>
+<li>cn_&lt;value&gt;_m2: area in square meters of the zone with each Curve Number value found in any zone, e.g. cn_70_m2</li>
+</ul>
+Areas are measured on the ellipsoid, so they are comparable across projections.</p>
 <br><p align="right">Algorithm author: Abdul Raheem Siddiqui</p><p align="right">Help author: Abdul Raheem Siddiqui</p><p align="right">Algorithm version: {PLUGIN_VERSION}</p><p align="right">Contact email: ar-siddiqui@outlook.com</p><p>Disclaimer: The curve numbers generated with this algorithm are high level estimates and should be reviewed in detail before being used for detailed modeling or construction projects.</p></body></html>"""
         )
 
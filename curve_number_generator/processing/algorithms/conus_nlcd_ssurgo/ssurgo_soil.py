@@ -21,19 +21,79 @@ __revision__ = "$Format:%H$"
 
 
 import processing
-import requests
+from curve_number_generator.processing.algorithms.conus_nlcd_ssurgo.ssurgo_store import (
+    SsurgoStore, batched)
 from curve_number_generator.processing.config import CONUS_NLCD_SSURGO
-from curve_number_generator.processing.tools.utils import (clip, downloadFile,
+from curve_number_generator.processing.tools.data_sources import DataSource
+from curve_number_generator.processing.tools.instrumentation import instrumented
+from curve_number_generator.processing.tools.utils import (clip, cn_ssurgo_store_file,
+                                                           downloadFile,
                                                            fixGeometries,
                                                            getExtent,
-                                                           reprojectLayer)
-from qgis.core import (QgsCoordinateReferenceSystem, QgsFeature, QgsField,
-                       QgsGeometry, QgsProcessing, QgsVectorLayer)
+                                                           getSetting,
+                                                           iterJsonArray,
+                                                           reprojectLayer,
+                                                           settingsFilePath)
+from qgis.core import (QgsCoordinateReferenceSystem,
+                       QgsCoordinateTransformContext, QgsFeature, QgsField,
+                       QgsFields, QgsGeometry, QgsProcessing,
+                       QgsProcessingException, QgsProcessingUtils,
+                       QgsVectorFileWriter, QgsVectorLayer, QgsWkbTypes)
 from qgis.PyQt.QtCore import QVariant
 
 
-class SsurgoSoil:
-    """Class to get SSURGO soil data"""
+SOIL_FIELDS = [
+    "musym",
+    "muname",
+    "mustatus",
+    "slopegraddcp",
+    "slopegradwta",
+    "brockdepmin",
+    "wtdepannmin",
+    "wtdepaprjunmin",
+    "flodfreqdcd",
+    "flodfreqmax",
+    "pondfreqprs",
+    "aws025wta",
+    "aws050wta",
+    "aws0100wta",
+    "aws0150wta",
+    "drclassdcd",
+    "drclasswettest",
+    "hydgrpdcd",
+    "iccdcd",
+    "iccdcdpct",
+    "niccdcd",
+    "niccdcdpct",
+    "engdwobdcd",
+    "engdwbdcd",
+    "engdwbll",
+    "engdwbml",
+    "engstafdcd",
+    "engstafll",
+    "engstafml",
+    "engsldcd",
+    "engsldcp",
+    "englrsdcd",
+    "engcmssdcd",
+    "engcmssmp",
+    "urbrecptdcd",
+    "urbrecptwta",
+    "forpehrtdcp",
+    "hydclprs",
+    "awmmfpwwta",
+    "mukey",
+    "mupolygonkey",
+    "areasymbol",
+    "nationalmusym",
+]
+
+# features added to the soil layer at once
+FEATURE_BATCH_SIZE = 5000
+
+
+class SsurgoSoil(DataSource):
+    """Class to get SSURGO soil data, as a data source it downloads the soil of the AOI from SDA"""
 
     def __init__(self, aoi_layer: QgsVectorLayer, context=None, feedback=None):
         self.aoi_layer = aoi_layer
@@ -41,6 +101,7 @@ class SsurgoSoil:
         self.feedback = feedback
         self.outputs = {}
         self.aoi_layer_4326 = None
+        self.aoi_wkt_4326 = ""
         self.soil_layer = None
 
     def reprojectTo4326(self) -> None:
@@ -55,92 +116,125 @@ class SsurgoSoil:
         self.aoi_layer_4326 = self.context.takeResultLayer(
             self.outputs["ReprojectLayer4326"]
         )
+        # get area layer extent polygon as WKT in 4326
+        self.aoi_wkt_4326 = self.aoi_layer_4326.extent().asWktPolygon()
 
         return
 
-    def postRequest(self):
+    def fetch(self, extent: tuple, crs: str, feedback=None) -> str:
+        """Download the soil of the AOI, rather than of extent, to a temporary GeoPackage"""
+        output = QgsProcessingUtils.generateTempFilename("Soils4326.gpkg")
+        self.loadPostResponse(self.fetchPostResponse(), output)
+        return output
+
+    def postRequest(self, output: str = ""):
         """Download soil for AOI using post request and populate self.soil_layer"""
 
-        # create vector layer structure to store data
         self.feedback.pushInfo("Creating POST request...")
-        uri = "Polygon?crs=epsg:4326"
-        self.soil_layer = QgsVectorLayer(uri, "soil layer", "memory")
-        provider = self.soil_layer.dataProvider()
-        attributes = []
-        attr_dict = [
-            {"name": "musym", "type": "str"},
-            {"name": "muname", "type": "str"},
-            {"name": "mustatus", "type": "str"},
-            {"name": "slopegraddcp", "type": "str"},
-            {"name": "slopegradwta", "type": "str"},
-            {"name": "brockdepmin", "type": "str"},
-            {"name": "wtdepannmin", "type": "str"},
-            {"name": "wtdepaprjunmin", "type": "str"},
-            {"name": "flodfreqdcd", "type": "str"},
-            {"name": "flodfreqmax", "type": "str"},
-            {"name": "pondfreqprs", "type": "str"},
-            {"name": "aws025wta", "type": "str"},
-            {"name": "aws050wta", "type": "str"},
-            {"name": "aws0100wta", "type": "str"},
-            {"name": "aws0150wta", "type": "str"},
-            {"name": "drclassdcd", "type": "str"},
-            {"name": "drclasswettest", "type": "str"},
-            {"name": "hydgrpdcd", "type": "str"},
-            {"name": "iccdcd", "type": "str"},
-            {"name": "iccdcdpct", "type": "str"},
-            {"name": "niccdcd", "type": "str"},
-            {"name": "niccdcdpct", "type": "str"},
-            {"name": "engdwobdcd", "type": "str"},
-            {"name": "engdwbdcd", "type": "str"},
-            {"name": "engdwbll", "type": "str"},
-            {"name": "engdwbml", "type": "str"},
-            {"name": "engstafdcd", "type": "str"},
-            {"name": "engstafll", "type": "str"},
-            {"name": "engstafml", "type": "str"},
-            {"name": "engsldcd", "type": "str"},
-            {"name": "engsldcp", "type": "str"},
-            {"name": "englrsdcd", "type": "str"},
-            {"name": "engcmssdcd", "type": "str"},
-            {"name": "engcmssmp", "type": "str"},
-            {"name": "urbrecptdcd", "type": "str"},
-            {"name": "urbrecptwta", "type": "str"},
-            {"name": "forpehrtdcp", "type": "str"},
-            {"name": "hydclprs", "type": "str"},
-            {"name": "awmmfpwwta", "type": "str"},
-            {"name": "mukey", "type": "str"},
-            {"name": "mupolygonkey", "type": "str"},
-            {"name": "areasymbol", "type": "str"},
-            {"name": "nationalmusym", "type": "str"},
-        ]
-
-        # initialize fields
-        for field in attr_dict:
-            attributes.append(QgsField(field["name"], QVariant.String))
-            provider.addAttributes(attributes)
-            self.soil_layer.updateFields()
+        self.loadPostResponse(self.fetchPostResponse(), output)
 
-        # get area layer extent polygon as WKT in 4326
-        aoi_reproj_wkt = self.aoi_layer_4326.extent().asWktPolygon()
+        return
 
-        # send post request
-        body = {
-            "format": "JSON",
-            "query": f"select Ma.*, M.mupolygonkey, M.areasymbol, M.nationalmusym, M.mupolygongeo from mupolygon M, muaggatt Ma where M.mupolygonkey in (select * from SDA_Get_Mupolygonkey_from_intersection_with_WktWgs84('{aoi_reproj_wkt.lower()}')) and M.mukey=Ma.mukey",
-        }
-        url = "https://sdmdataaccess.sc.egov.usda.gov/TABULAR/post.rest"
-        soil_response = requests.post(url, json=body).json()
+    def fetchPostResponse(self):
+        """Send the post request for soil of AOI and return an iterator over the response rows.
+        Does not touch the processing context, so it can run in a worker thread"""
+
+        if getSetting("CNG_SSURGO_STORE_ENABLED"):
+            return self.fetchThroughStore()
+
+        return self.sdaQuery(
+            f"select Ma.*, M.mupolygonkey, M.areasymbol, M.nationalmusym, M.mupolygongeo from mupolygon M, muaggatt Ma where M.mupolygonkey in (select * from SDA_Get_Mupolygonkey_from_intersection_with_WktWgs84('{self.aoi_wkt_4326.lower()}')) and M.mukey=Ma.mukey"
+        )
+
+    def fetchThroughStore(self):
+        """Ask SDA only for the map unit keys intersecting the AOI, fetch the polygons and attributes
+        missing from the local store and return the post request rows from the store"""
 
-        for row in soil_response["Table"]:
+        store = SsurgoStore(getSetting("CNG_SSURGO_STORE") or settingsFilePath(cn_ssurgo_store_file))
+
+        keys = self.sdaQuery(
+            f"select M.mupolygonkey, M.mukey from mupolygon M where M.mupolygonkey in (select * from SDA_Get_Mupolygonkey_from_intersection_with_WktWgs84('{self.aoi_wkt_4326.lower()}'))"
+        )
+        # keys are numeric, anything else is not sent back in a query
+        keys = [(str(row[0]), str(row[1])) for row in keys if str(row[0]).isdigit() and str(row[1]).isdigit()]
+        mupolygonkeys = [key[0] for key in keys]
+
+        for batch in batched(store.missingMukeys([key[1] for key in keys]), 1000):
+            store.addAttributes(self.sdaQuery(f"select Ma.* from muaggatt Ma where Ma.mukey in ({','.join(batch)})"))
+
+        missing_polygons = store.missingPolygonKeys(mupolygonkeys)
+        if missing_polygons:
+            self.feedback.pushInfo(
+                f"{len(mupolygonkeys) - len(missing_polygons)} of {len(mupolygonkeys)} soil polygons found in the local store."
+            )
+        for batch in batched(missing_polygons, 1000):
+            store.addPolygons(
+                self.sdaQuery(
+                    f"select M.mupolygonkey, M.mukey, M.areasymbol, M.nationalmusym, M.mupolygongeo from mupolygon M where M.mupolygonkey in ({','.join(batch)})"
+                )
+            )
+
+        return store.rows(mupolygonkeys)
+
+    @staticmethod
+    @instrumented(input_arg=None)
+    def sdaQuery(query: str):
+        """Stream the JSON response of a Soil Data Access query to a temporary file and return an
+        iterator over its rows"""
+        from curve_number_generator.processing.tools import downloader
+
+        output = QgsProcessingUtils.generateTempFilename("sda_response.json")
+        downloader.download("POST", CONUS_NLCD_SSURGO["SSURGO_SDA"], output, json={"format": "JSON", "query": query})
+        return iterJsonArray(output, "Table")
+
+    def loadPostResponse(self, rows, output: str = ""):
+        """Populate self.soil_layer from the post request response rows.
+        Features are added in batches to a memory layer or to the GeoPackage output if given"""
+
+        fields = QgsFields()
+        for name in SOIL_FIELDS:
+            fields.append(QgsField(name, QVariant.String))
+        geometry_index = len(SOIL_FIELDS)
+
+        if output:
+            options = QgsVectorFileWriter.SaveVectorOptions()
+            options.driverName = "GPKG"
+            options.layerName = "soil"
+            sink = QgsVectorFileWriter.create(
+                output,
+                fields,
+                QgsWkbTypes.MultiPolygon,
+                QgsCoordinateReferenceSystem("EPSG:4326"),
+                QgsCoordinateTransformContext(),  # written as is in EPSG:4326
+                options,
+            )
+            if sink.hasError() != QgsVectorFileWriter.NoError:
+                raise QgsProcessingException(sink.errorMessage())
+        else:
+            self.soil_layer = QgsVectorLayer("MultiPolygon?crs=epsg:4326", "soil layer", "memory")
+            sink = self.soil_layer.dataProvider()
+            sink.addAttributes(fields)
+            self.soil_layer.updateFields()
+
+        features = []
+        for row in rows:
+            feat = QgsFeature(fields)
             # None attribute for empty data
-            row = [None if not attr else attr for attr in row]
-            feat = QgsFeature(self.soil_layer.fields())
-            # populate data
-            for index, col in enumerate(row):
-                if index != len(attr_dict):
-                    feat.setAttribute(attr_dict[index]["name"], col)
-                else:
-                    feat.setGeometry(QgsGeometry.fromWkt(col))
-            provider.addFeatures([feat])
+            feat.setAttributes([attr if attr else None for attr in row[:geometry_index]])
+            geom = QgsGeometry.fromWkt(row[geometry_index])
+            geom.convertToMultiType()
+            feat.setGeometry(geom)
+            features.append(feat)
+            if len(features) == FEATURE_BATCH_SIZE:
+                sink.addFeatures(features)
+                features = []
+                if self.feedback.isCanceled():
+                    break
+        sink.addFeatures(features)
+
+        if output:
+            del sink  # flush and close the GeoPackage
+            self.soil_layer = output
 
         return
 
@@ -154,6 +248,7 @@ class SsurgoSoil:
             error_message="Error getting soil data through WFS request. Your input layer maybe too large.\nTry rerunning with a smaller aoi layer.",
             context=self.context,
             feedback=self.feedback,
+            file_name="soil.gml",
         )
         return
 
@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+
+"""
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+
+__author__ = "Abdul Raheem Siddiqui"
+__date__ = "2026-10-18"
+__copyright__ = "(C) 2026 by Abdul Raheem Siddiqui"
+
+# This will get replaced with a git SHA1 when you do a git archive
+
+__revision__ = "$Format:%H$"
+
+
+import json
+import sqlite3
+from contextlib import closing
+
+
+class SsurgoStore:
+    """Local SQLite store of SSURGO map unit polygons keyed by mupolygonkey and of their muaggatt
+    attributes keyed by mukey, so that only map units missing from the store are fetched from
+    Soil Data Access. Safe to use from several threads and processes."""
+
+    def __init__(self, path: str):
+        self.path = path
+        with closing(self.connect()) as con, con:
+            con.execute("PRAGMA journal_mode=WAL")
+            con.execute(
+                "CREATE TABLE IF NOT EXISTS mupolygon "
+                "(mupolygonkey TEXT PRIMARY KEY, mukey TEXT, areasymbol TEXT, nationalmusym TEXT, wkt TEXT)"
+            )
+            con.execute("CREATE TABLE IF NOT EXISTS muaggatt (mukey TEXT PRIMARY KEY, attributes TEXT)")
+
+    def connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=60)
+
+    def missingPolygonKeys(self, mupolygonkeys: list) -> list:
+        return self.missingKeys("mupolygon", "mupolygonkey", mupolygonkeys)
+
+    def missingMukeys(self, mukeys: list) -> list:
+        return self.missingKeys("muaggatt", "mukey", mukeys)
+
+    def missingKeys(self, table: str, key_field: str, keys: list) -> list:
+        keys = list(dict.fromkeys(keys))
+        with closing(self.connect()) as con:
+            stored = set()
+            for batch in batched(keys, 500):
+                stored.update(
+                    row[0]
+                    for row in con.execute(
+                        f"SELECT {key_field} FROM {table} WHERE {key_field} IN ({','.join('?' * len(batch))})",
+                        batch,
+                    )
+                )
+        return [key for key in keys if key not in stored]
+
+    def addPolygons(self, rows) -> None:
+        """Add rows of (mupolygonkey, mukey, areasymbol, nationalmusym, wkt)"""
+        with closing(self.connect()) as con, con:
+            con.executemany("INSERT OR REPLACE INTO mupolygon VALUES (?, ?, ?, ?, ?)", rows)
+
+    def addAttributes(self, rows) -> None:
+        """Add muaggatt rows, mukey is the last column of muaggatt"""
+        with closing(self.connect()) as con, con:
+            con.executemany(
+                "INSERT OR REPLACE INTO muaggatt VALUES (?, ?)",
+                ((row[-1], json.dumps(row)) for row in rows),
+            )
+
+    def rows(self, mupolygonkeys: list):
+        """Yield rows of muaggatt attributes, mupolygonkey, areasymbol, nationalmusym and geometry WKT,
+        the same as the post request query of SsurgoSoil"""
+        with closing(self.connect()) as con:
+            for batch in batched(list(dict.fromkeys(mupolygonkeys)), 500):
+                cursor = con.execute(
+                    "SELECT a.attributes, p.mupolygonkey, p.areasymbol, p.nationalmusym, p.wkt "
+                    "FROM mupolygon p JOIN muaggatt a ON p.mukey = a.mukey "
+                    f"WHERE p.mupolygonkey IN ({','.join('?' * len(batch))})",
+                    batch,
+                )
+                for attributes, *polygon in cursor:
+                    yield json.loads(attributes) + polygon
+
+
+def batched(items: list, size: int):
+    for i in range(0, len(items), size):
+        yield items[i : i + size]
@@ -31,6 +31,9 @@ import processing
 from qgis.core import (
     QgsProcessing,
     QgsProcessingMultiStepFeedback,
+    QgsProcessingOutputString,
+    QgsProcessingParameterBoolean,
+    QgsProcessingParameterDefinition,
     QgsProcessingParameterField,
     QgsProcessingParameterRasterLayer,
     QgsProcessingParameterVectorDestination,
@@ -42,13 +45,16 @@ from curve_number_generator.processing.config import PLUGIN_VERSION
 from curve_number_generator.processing.curve_number_generator_algorithm import (
     CurveNumberGeneratorAlgorithm,
 )
-from curve_number_generator.processing.tools.curve_numper import CurveNumber
+from curve_number_generator.processing.tools.composite_cn import compositeCurveNumber
+from curve_number_generator.processing.tools.curve_number import CurveNumber
+from curve_number_generator.processing.tools.instrumentation import StageReport
 from curve_number_generator.processing.tools.utils import (
     clip,
     fixGeometries,
     gdalPolygonize,
     getAndUpdateMessage,
     getExtentWKTIn3857,
+    splitByAoiFeatures,
 )
 
 cmd_folder = os.path.split(inspect.getfile(inspect.currentframe()))[0]
@@ -108,7 +114,34 @@ class Custom(CurveNumberGeneratorAlgorithm):
                 defaultValue="",
             )
         )
+        param = QgsProcessingParameterBoolean(
+            "PerFeature",
+            "Split Curve Number by Area of Interest Feature? [adds an aoi_fid field]",
+            defaultValue=False,
+        )
+        param.setFlags(param.flags() | QgsProcessingParameterDefinition.FlagAdvanced)
+        self.addParameter(param)
+        self.addParameter(
+            QgsProcessingParameterVectorLayer(
+                "Zones",
+                "Zones for Composite Curve Number [e.g. subbasins]",
+                optional=True,
+                types=[QgsProcessing.TypeVectorPolygon],
+                defaultValue=None,
+            )
+        )
         self.addParameter(QgsProcessingParameterVectorDestination("CurveNumber", "Curve Number", defaultValue=None))
+        self.addParameter(
+            QgsProcessingParameterVectorDestination(
+                "CompositeCurveNumber",
+                "Composite Curve Number [table per zone]",
+                type=QgsProcessing.TypeVector,
+                optional=True,
+                createByDefault=False,
+                defaultValue=None,
+            )
+        )
+        self.addOutput(QgsProcessingOutputString("StageReport", "Stage Report"))
 
     def processAlgorithm(self, parameters, context, model_feedback):
         # Use a multi-step feedback, so that individual child algorithm progress reports are adjusted for the
@@ -116,6 +149,7 @@ class Custom(CurveNumberGeneratorAlgorithm):
         feedback = QgsProcessingMultiStepFeedback(8, model_feedback)
         results = {}
         outputs = {}
+        stage_report = StageReport.start()
 
         aoi_layer = self.parameterAsVectorLayer(parameters, "aoi", context)
         self.aoi_wkt_3857 = getExtentWKTIn3857(aoi_layer)
@@ -165,14 +199,45 @@ class Custom(CurveNumberGeneratorAlgorithm):
         except AttributeError:
             pass
 
+        # split by AOI feature into the output at the end
+        per_feature = self.parameterAsBool(parameters, "PerFeature", context)
         results["CurveNumber"], step = curve_number.generateCurveNumber(
             [f"{parameters['SoilLookupField']}"],
             [],
             f'''"land_cover" || \'_\' || "{parameters['SoilLookupField']}"''',
             start_step=step + 1,
-            output=parameters["CurveNumber"],
+            output=(
+                QgsProcessing.TEMPORARY_OUTPUT
+                if per_feature
+                else self.parameterAsOutputLayer(parameters, "CurveNumber", context)
+            ),
+            fused=True,
         )
 
+        if parameters.get("Zones", None) and parameters.get("CompositeCurveNumber", None):
+            try:
+                parameters["CompositeCurveNumber"].destinationName = "Composite Curve Number"
+            except AttributeError:
+                pass
+
+            # areas are summed over the overlay of the zones with the Curve Number polygons
+            results["CompositeCurveNumber"] = compositeCurveNumber(
+                results["CurveNumber"],
+                self.parameterAsVectorLayer(parameters, "Zones", context),
+                self.parameterAsOutputLayer(parameters, "CompositeCurveNumber", context),
+                context=context,
+                feedback=feedback,
+            )
+
+        if per_feature:
+            results["CurveNumber"] = splitByAoiFeatures(
+                results["CurveNumber"],
+                parameters["aoi"],
+                parameters["CurveNumber"],
+                context=context,
+                feedback=feedback,
+            )
+
         step += 1
         feedback.setCurrentStep(step)
         if feedback.isCanceled():
@@ -181,6 +246,7 @@ class Custom(CurveNumberGeneratorAlgorithm):
         cn_style_path = os.path.join(os.path.dirname(cmd_folder), "curve_number.qml")
         self.handle_post_processing(results["CurveNumber"], cn_style_path, context)
 
+        results["StageReport"] = stage_report.finish(model_feedback)
         return results
 
     def name(self):
@@ -205,6 +271,7 @@ class Custom(CurveNumberGeneratorAlgorithm):
         return icon
 
     def shortHelpString(self):
+        msg = ""
         try:
             msg = getAndUpdateMessage()
         except Exception as e:
@@ -226,10 +293,22 @@ class Custom(CurveNumberGeneratorAlgorithm):
 <p>Field in the Soils Layer that describe soil properties and should be used in relating Curve Number to soils</p>
 <h3>Lookup Table</h3>
 <p>Table to relate Land Cover Value and Soils Lookup Field value to a particular curve number. The table must have two columns 'grid_code' and 'cn'. grid_code is concatenation of land cover and soil lookup field. <a href="https://raw.githubusercontent.com/ar-siddiqui/curve_number_generator/v{PLUGIN_VERSION}/curve_number_generator/processing/algorithms/conus_nlcd_ssurgo/default_lookup.csv">Example table.</a></p>
+<h3>Split Curve Number by Area of Interest Feature?</h3>
+<p>If checked, the Curve Number layer is split by the features of the Area of Interest and each part gets an aoi_fid field with the feature id of its Area of Interest feature. Parts that are in several overlapping Area of Interest features are repeated once per feature.</p>
+<h3>Zones for Composite Curve Number [optional]</h3>
+<p>Polygon layer of the zones, e.g. subbasins, to compute the Composite Curve Number table for. Zones should not overlap. The areas are summed from the overlay of the zones with the Curve Number layer.</p>
 
 <h2>Outputs</h2>
 <h3>Curve Number</h3>
 <p>Generated Curve Number Layer based on Land Cover and Soils.</p>
+<h3>Composite Curve Number</h3>
+<p>Table with one row per polygon of the Zones layer, with the zone attributes and:
+<ul>
+<li>area_m2: area in square meters of the zone that has a Curve Number</li>
+<li>composite_cn: area-weighted composite Curve Number of the zone, NULL if no part of the zone has a Curve Number</li>
+<li>cn_&lt;value&gt;_m2: area in square meters of the zone with each Curve Number value found in any zone, e.g. cn_70_m2</li>
+</ul>
+Areas are measured on the ellipsoid, so they are comparable across projections.</p>
 <br><p align="right">Algorithm author: Abdul Raheem Siddiqui</p><p align="right">Help author: Abdul Raheem Siddiqui</p><p align="right">Algorithm version: {PLUGIN_VERSION}</p><p align="right">Contact email: ar-siddiqui@outlook.com</p></body></html>"""
         )
 
@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+
+"""
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+
+__author__ = "Abdul Raheem Siddiqui"
+__date__ = "2026-10-18"
+__copyright__ = "(C) 2026 by Abdul Raheem Siddiqui"
+
+# This will get replaced with a git SHA1 when you do a git archive
+
+__revision__ = "$Format:%H$"
+
+
+import math
+import os
+from functools import lru_cache
+
+# WorldCover tiles are 3 x 3 degrees, named after their lower left corner, between 60S and 84N
+TILE_SIZE = 3  # degrees
+TILE_PIXELS = 36000
+PIXEL_SIZE = TILE_SIZE / TILE_PIXELS
+MIN_LAT = -60
+MAX_LAT = 84
+
+SRS_WKT = 'GEOGCS["WGS 84",DATUM["WGS_1984",SPHEROID["WGS 84",6378137,298.257223563,AUTHORITY["EPSG","7030"]],AUTHORITY["EPSG","6326"]],PRIMEM["Greenwich",0],UNIT["degree",0.0174532925199433,AUTHORITY["EPSG","9122"]],AXIS["Latitude",NORTH],AXIS["Longitude",EAST],AUTHORITY["EPSG","4326"]]'
+
+# land cover class: RGB, every other entry of the 256 color table is black
+COLOR_TABLE = {
+    10: (0, 100, 0),
+    20: (255, 187, 34),
+    30: (255, 255, 76),
+    40: (240, 150, 255),
+    50: (250, 0, 0),
+    60: (180, 180, 180),
+    70: (240, 240, 240),
+    80: (0, 100, 200),
+    90: (0, 150, 160),
+    95: (0, 207, 117),
+    100: (250, 230, 160),
+}
+
+VRT_TEMPLATE = """<VRTDataset rasterXSize="{width}" rasterYSize="{height}">
+  <SRS dataAxisToSRSAxisMapping="2,1">{srs}</SRS>
+  <GeoTransform>{xmin}, {pixel_size!r}, 0.0, {ymax}, 0.0, {neg_pixel_size!r}</GeoTransform>
+  <VRTRasterBand dataType="Byte" band="1">
+    <NoDataValue>0</NoDataValue>
+    <ColorInterp>Palette</ColorInterp>
+    <ColorTable>
+{entries}
+    </ColorTable>
+{sources}
+  </VRTRasterBand>
+</VRTDataset>
+"""
+
+SOURCE_TEMPLATE = """    <ComplexSource resampling="nearest">
+      <SourceFilename relativeToVRT="0">{file_name}</SourceFilename>
+      <SourceBand>1</SourceBand>
+      <SourceProperties RasterXSize="{size}" RasterYSize="{size}" DataType="Byte" BlockXSize="1024" BlockYSize="1024" />
+      <SrcRect xOff="0" yOff="0" xSize="{size}" ySize="{size}" />
+      <DstRect xOff="{x_off}" yOff="{y_off}" xSize="{size}" ySize="{size}" />
+      <NODATA>0</NODATA>
+    </ComplexSource>"""
+
+
+def tileName(lon: int, lat: int) -> str:
+    """Name of the tile with lower left corner at lon, lat e.g. S54E168"""
+    return f"{'N' if lat >= 0 else 'S'}{abs(lat):02d}{'E' if lon >= 0 else 'W'}{abs(lon):03d}"
+
+
+@lru_cache(maxsize=None)
+def readTileIndex(path: str) -> frozenset:
+    """Names of the WorldCover tiles that exist, tiles over open ocean are not published"""
+    with open(path) as f:
+        return frozenset(line.strip() for line in f if line.strip())
+
+
+def tileGrid(extent: tuple) -> tuple:
+    """Extent (xmin, ymin, xmax, ymax) in EPSG:4326 grown to the tile grid and clamped to the WorldCover coverage"""
+    xmin = max(math.floor(extent[0] / TILE_SIZE) * TILE_SIZE, -180)
+    ymin = min(max(math.floor(extent[1] / TILE_SIZE) * TILE_SIZE, MIN_LAT), MAX_LAT - TILE_SIZE)
+    xmax = min(math.ceil(extent[2] / TILE_SIZE) * TILE_SIZE, 180)
+    ymax = max(min(math.ceil(extent[3] / TILE_SIZE) * TILE_SIZE, MAX_LAT), ymin + TILE_SIZE)
+    return xmin, ymin, max(xmax, xmin + TILE_SIZE), ymax
+
+
+def buildWorldCoverVrt(extent: tuple, tile_index: str, tile_url: str, output: str, mirror_folder: str = "") -> list:
+    """Write a VRT mosaic of only the WorldCover tiles intersecting extent and return the tile names used.
+
+    tile_url is formatted with the tile name. Tiles found in mirror_folder under the same file name
+    are read from there instead."""
+    tiles = readTileIndex(tile_index)
+    xmin, ymin, xmax, ymax = tileGrid(extent)
+
+    used = []
+    sources = []
+    for lat in range(ymin, ymax, TILE_SIZE):
+        for lon in range(xmin, xmax, TILE_SIZE):
+            name = tileName(lon, lat)
+            if name not in tiles:
+                continue
+            file_name = tile_url.format(name)
+            if mirror_folder:
+                local_file = os.path.join(mirror_folder, os.path.basename(file_name))
+                if os.path.exists(local_file):
+                    file_name = local_file
+            used.append(name)
+            sources.append(
+                SOURCE_TEMPLATE.format(
+                    file_name=file_name,
+                    size=TILE_PIXELS,
+                    x_off=(lon - xmin) // TILE_SIZE * TILE_PIXELS,
+                    y_off=(ymax - lat - TILE_SIZE) // TILE_SIZE * TILE_PIXELS,
+                )
+            )
+
+    entries = []
+    for value in range(256):
+        r, g, b = COLOR_TABLE.get(value, (0, 0, 0))
+        entries.append(f'      <Entry c1="{r}" c2="{g}" c3="{b}" c4="{0 if value == 0 else 255}" />')
+
+    with open(output, "w") as f:
+        f.write(
+            VRT_TEMPLATE.format(
+                width=(xmax - xmin) // TILE_SIZE * TILE_PIXELS,
+                height=(ymax - ymin) // TILE_SIZE * TILE_PIXELS,
+                srs=SRS_WKT,
+                xmin=float(xmin),
+                ymax=float(ymax),
+                pixel_size=PIXEL_SIZE,
+                neg_pixel_size=-PIXEL_SIZE,
+                entries="\n".join(entries),
+                sources="\n".join(sources),
+            )
+        )
+
+    return used
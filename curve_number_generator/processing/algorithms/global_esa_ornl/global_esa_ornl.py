@@ -30,30 +30,50 @@ from qgis.core import (
     QgsCoordinateReferenceSystem,
     QgsProcessing,
     QgsProcessingMultiStepFeedback,
+    QgsProcessingOutputString,
+    QgsProcessingParameterBoolean,
     QgsProcessingParameterDefinition,
     QgsProcessingParameterEnum,
     QgsProcessingParameterRasterDestination,
     QgsProcessingParameterVectorDestination,
     QgsProcessingParameterVectorLayer,
+    QgsProcessingUtils,
 )
 from qgis.PyQt.QtGui import QIcon
 
-from curve_number_generator.processing.config import GLOBAL_ESA_ORNL, PLUGIN_VERSION
+from curve_number_generator.processing.algorithms.global_esa_ornl.esa_worldcover import (
+    buildWorldCoverVrt,
+)
+from curve_number_generator.processing.config import (
+    GLOBAL_ESA_ORNL,
+    PLUGIN_VERSION,
+    TEMP_GTIFF_CREATION_OPTIONS,
+)
 from curve_number_generator.processing.curve_number_generator_algorithm import (
     CurveNumberGeneratorAlgorithm,
 )
-from curve_number_generator.processing.tools.curve_numper import CurveNumber
+from curve_number_generator.processing.tools.cn_lookup import (
+    applyCnLookup,
+    buildCnLookupArray,
+)
+from curve_number_generator.processing.tools.composite_cn import compositeCurveNumber
+from curve_number_generator.processing.tools.data_sources import (
+    WcsSource,
+    getDataSource,
+    localDataPath,
+)
+from curve_number_generator.processing.tools.instrumentation import StageReport
 from curve_number_generator.processing.tools.utils import (
     createDefaultLookup,
-    createRequestBBOXDim,
-    downloadFile,
+    gdalConfigArgs,
     gdalPolygonize,
     gdalWarp,
-    generate_cn_exprs,
     getAndUpdateMessage,
     getExtentInEPSG4326,
     getExtentWKTIn3857,
-    perform_raster_math,
+    getSetting,
+    snapExtentToGrid,
+    splitByAoiFeatures,
 )
 
 cmd_folder = os.path.split(inspect.getfile(inspect.currentframe()))[0]
@@ -82,7 +102,7 @@ class GlobalEsaORNL(CurveNumberGeneratorAlgorithm):
         self.hc = ["Poor", "Fair", "Good"]
         self.arc = ["I", "II", "III"]
         self.lc_pixel_size = 0.000083333333333
-        self.soils_pixel_size = 0.00208333
+        self.soils_pixel_size = 1 / 480  # 15 arc-seconds, exact so the snap stays on the ORNL grid
 
         self.addParameter(
             QgsProcessingParameterVectorLayer(
@@ -124,6 +144,23 @@ class GlobalEsaORNL(CurveNumberGeneratorAlgorithm):
         param.setFlags(param.flags() | QgsProcessingParameterDefinition.FlagAdvanced)
         self.addParameter(param)
 
+        param = QgsProcessingParameterBoolean(
+            "PerFeature",
+            "Split Curve Number (Vectorized) by Area of Interest Feature? [adds an aoi_fid field, data is still downloaded once]",
+            defaultValue=False,
+        )
+        param.setFlags(param.flags() | QgsProcessingParameterDefinition.FlagAdvanced)
+        self.addParameter(param)
+
+        self.addParameter(
+            QgsProcessingParameterVectorLayer(
+                "Zones",
+                "Zones for Composite Curve Number [e.g. subbasins]",
+                optional=True,
+                types=[QgsProcessing.TypeVectorPolygon],
+                defaultValue=None,
+            )
+        )
         self.addParameter(
             QgsProcessingParameterRasterDestination(
                 "ESALandCover",
@@ -160,6 +197,17 @@ class GlobalEsaORNL(CurveNumberGeneratorAlgorithm):
                 defaultValue=None,
             )
         )
+        self.addParameter(
+            QgsProcessingParameterVectorDestination(
+                "CompositeCurveNumber",
+                "Composite Curve Number [table per zone]",
+                type=QgsProcessing.TypeVector,
+                optional=True,
+                createByDefault=False,
+                defaultValue=None,
+            )
+        )
+        self.addOutput(QgsProcessingOutputString("StageReport", "Stage Report"))
 
     def processAlgorithm(self, parameters, context, model_feedback):
         # Use a multi-step feedback, so that individual child algorithm progress reports are adjusted for the
@@ -167,6 +215,7 @@ class GlobalEsaORNL(CurveNumberGeneratorAlgorithm):
         feedback = QgsProcessingMultiStepFeedback(7, model_feedback)
         results = {}
         outputs = {}
+        stage_report = StageReport.start()
 
         # Assiging Default CN_Lookup Table
         if not parameters.get("CnLookup", None):
@@ -179,6 +228,7 @@ class GlobalEsaORNL(CurveNumberGeneratorAlgorithm):
 
         aoi_layer = self.parameterAsVectorLayer(parameters, "aoi", context)
         self.aoi_wkt_3857 = getExtentWKTIn3857(aoi_layer)
+        composite_required = bool(parameters.get("Zones", None) and parameters.get("CompositeCurveNumber", None))
 
         extent = getExtentInEPSG4326(aoi_layer)
         # add a buffer cell on each side, refer to #49 for reasoning
@@ -194,7 +244,8 @@ class GlobalEsaORNL(CurveNumberGeneratorAlgorithm):
             extent[2] + 2 * self.soils_pixel_size,
             extent[3] + 2 * self.soils_pixel_size,
         )
-        bbox_dim_soil = createRequestBBOXDim(extent_ornl, self.soils_pixel_size)
+        # snap to the ORNL grid so that repeated and overlapping requests can be served from the download cache
+        extent_ornl = snapExtentToGrid(extent_ornl, self.soils_pixel_size, (-180, 90))
 
         step = 1
         feedback.setCurrentStep(step)
@@ -206,6 +257,7 @@ class GlobalEsaORNL(CurveNumberGeneratorAlgorithm):
                 parameters.get("ESALandCover", None),
                 parameters.get("CurveNumber", None),
                 parameters.get("CurveNumberVector", None),
+                composite_required,
             ]
         ):
             # ESA Land Cover Data
@@ -215,18 +267,24 @@ class GlobalEsaORNL(CurveNumberGeneratorAlgorithm):
                 except AttributeError:
                     pass
 
-                lc_output = parameters["ESALandCover"]
-            else:
-                lc_output = QgsProcessing.TEMPORARY_OUTPUT
+            # mosaic of only the WorldCover tiles intersecting the AOI
+            outputs["ESAWorldCoverVrt"] = QgsProcessingUtils.generateTempFilename("esa_worldcover_2021.vrt")
+            buildWorldCoverVrt(
+                extent_esa,
+                os.path.join(cmd_folder, "esa_worldcover_2021_tiles.txt"),
+                GLOBAL_ESA_ORNL["ESA_WORLDCOVER_2021"],
+                outputs["ESAWorldCoverVrt"],
+                getSetting("CNG_ESA_WORLDCOVER_FOLDER") or localDataPath("ESA_WORLDCOVER_2021"),
+            )
 
             alg_params = {
                 "DATA_TYPE": 0,
-                "EXTRA": "",
-                "INPUT": os.path.join(cmd_folder, "esa_worldcover_2021.vrt"),
+                "EXTRA": gdalConfigArgs(),
+                "INPUT": outputs["ESAWorldCoverVrt"],
                 "NODATA": None,
-                "OPTIONS": "",
+                "OPTIONS": "|".join(TEMP_GTIFF_CREATION_OPTIONS),
                 "PROJWIN": f"{extent_esa[0]},{extent_esa[2]},{extent_esa[1]},{extent_esa[3]} [EPSG:4326]",
-                "OUTPUT": lc_output,
+                "OUTPUT": QgsProcessing.TEMPORARY_OUTPUT,
             }
             outputs["ESALandCover"] = processing.run(
                 "gdal:cliprasterbyextent",
@@ -243,7 +301,9 @@ class GlobalEsaORNL(CurveNumberGeneratorAlgorithm):
 
             if parameters.get("ESALandCover", None):
                 lc_style_path = os.path.join(cmd_folder, "esa_land_cover.qml")
-                results["ESALandCover"] = outputs["ESALandCover"]
+                results["ESALandCover"] = self.rasterOutput(
+                    outputs["ESALandCover"], parameters, "ESALandCover", context, feedback
+                )
                 self.handle_post_processing(results["ESALandCover"], lc_style_path, context)
 
         # Soil Layer
@@ -252,6 +312,7 @@ class GlobalEsaORNL(CurveNumberGeneratorAlgorithm):
                 parameters.get("Soils", None),
                 parameters.get("CurveNumber", None),
                 parameters.get("CurveNumberVector", None),
+                composite_required,
             ]
         ):
 
@@ -261,31 +322,26 @@ class GlobalEsaORNL(CurveNumberGeneratorAlgorithm):
                 except AttributeError:
                     pass
 
-                soils_output = parameters["Soils"]
-            else:
-                soils_output = QgsProcessing.TEMPORARY_OUTPUT
-
-            outputs["DownloadedSoils"] = downloadFile(
-                GLOBAL_ESA_ORNL["ORNL_HYSOG"].format(
-                    bbox_dim_soil[0],
-                    bbox_dim_soil[1],
-                    ",".join([str(item) for item in extent_ornl]),
+            hsg_source = getDataSource(
+                "ORNL_HYSOG",
+                WcsSource(
+                    GLOBAL_ESA_ORNL["ORNL_HYSOG"],
+                    self.soils_pixel_size,
+                    GLOBAL_ESA_ORNL["ORNL_HYSOG_PING"],
+                    "Error getting Hydorologic Soil Group data from 'https://webmap.ornl.gov/'. Most probably because either their server is down or there is a certification issue.\nThis should be temporary. Try again later.\n",
                 ),
-                "https://webmap.ornl.gov/ogcbroker/wcs",
-                "Error getting Hydorologic Soil Group data from 'https://webmap.ornl.gov/'. Most probably because either their server is down or there is a certification issue.\nThis should be temporary. Try again later.\n",
-                context=context,
-                feedback=feedback,
             )
+            outputs["DownloadedSoils"] = hsg_source.fetch(extent_ornl, "EPSG:4326", feedback)
 
             alg_params = {
                 "INPUT": outputs["DownloadedSoils"],
                 "TARGET_CRS": None,
                 "NODATA": None,
                 "COPY_SUBDATASETS": False,
-                "OPTIONS": "",
-                "EXTRA": "",
+                "OPTIONS": "|".join(TEMP_GTIFF_CREATION_OPTIONS),
+                "EXTRA": gdalConfigArgs(),
                 "DATA_TYPE": 0,
-                "OUTPUT": soils_output,
+                "OUTPUT": QgsProcessing.TEMPORARY_OUTPUT,
             }
 
             step += 1
@@ -308,13 +364,14 @@ class GlobalEsaORNL(CurveNumberGeneratorAlgorithm):
 
             if parameters.get("Soils", None):
                 soils_style_path = os.path.join(os.path.dirname(cmd_folder), "hsg_raster.qml")
-                results["Soils"] = outputs["Soils"]
+                results["Soils"] = self.rasterOutput(outputs["Soils"], parameters, "Soils", context, feedback)
                 self.handle_post_processing(results["Soils"], soils_style_path, context)
 
         if any(
             [
                 parameters.get("CurveNumber", None),
                 parameters.get("CurveNumberVector", None),
+                composite_required,
             ]
         ):
             outputs["SoilsAligned"] = gdalWarp(
@@ -330,13 +387,7 @@ class GlobalEsaORNL(CurveNumberGeneratorAlgorithm):
             if feedback.isCanceled():
                 return {}
 
-            cn_exprs = generate_cn_exprs(parameters["CnLookup"], nodata=255)
-            input_dict = {
-                "input_a": outputs["ESALandCover"],
-                "band_a": 1,
-                "input_b": outputs["SoilsAligned"],
-                "band_b": 1,
-            }
+            cn_lut = buildCnLookupArray(self.parameterAsVectorLayer(parameters, "CnLookup", context), nodata=255)
 
             if parameters.get("CurveNumber", None):
                 try:
@@ -344,19 +395,14 @@ class GlobalEsaORNL(CurveNumberGeneratorAlgorithm):
                 except AttributeError:
                     pass
 
-                soils_output = parameters["CurveNumber"]
-            else:
-                soils_output = QgsProcessing.TEMPORARY_OUTPUT
-
-            outputs["CurveNumber"] = perform_raster_math(
-                cn_exprs,
-                input_dict,
-                context,
-                feedback,
-                output=soils_output,
-                no_data=255,
-                out_data_type=0,
-                hide_no_data=True,
+            outputs["CurveNumber"] = applyCnLookup(
+                outputs["ESALandCover"],
+                outputs["SoilsAligned"],
+                cn_lut,
+                QgsProcessingUtils.generateTempFilename("CurveNumber.tif"),
+                nodata=255,
+                mask_nodata=False,
+                feedback=feedback,
             )
 
             step += 1
@@ -366,7 +412,9 @@ class GlobalEsaORNL(CurveNumberGeneratorAlgorithm):
 
             if parameters.get("CurveNumber", None):
                 cn_style_path = os.path.join(os.path.dirname(cmd_folder), "curve_number_raster.qml")
-                results["CurveNumber"] = outputs["CurveNumber"]
+                results["CurveNumber"] = self.rasterOutput(
+                    outputs["CurveNumber"], parameters, "CurveNumber", context, feedback
+                )
                 self.handle_post_processing(results["CurveNumber"], cn_style_path, context)
 
         if parameters.get("CurveNumberVector", None):
@@ -376,13 +424,22 @@ class GlobalEsaORNL(CurveNumberGeneratorAlgorithm):
                 pass
 
             # Polygonize (raster to vector)
+            per_feature = self.parameterAsBool(parameters, "PerFeature", context)
             outputs["CurveNumberVector"] = gdalPolygonize(
                 outputs["CurveNumber"],
                 "cn",
-                output=parameters["CurveNumberVector"],
+                output=QgsProcessing.TEMPORARY_OUTPUT if per_feature else parameters["CurveNumberVector"],
                 context=context,
                 feedback=feedback,
             )
+            if per_feature:
+                outputs["CurveNumberVector"] = splitByAoiFeatures(
+                    outputs["CurveNumberVector"],
+                    parameters["aoi"],
+                    parameters["CurveNumberVector"],
+                    context=context,
+                    feedback=feedback,
+                )
 
             step += 1
             feedback.setCurrentStep(step)
@@ -393,6 +450,22 @@ class GlobalEsaORNL(CurveNumberGeneratorAlgorithm):
             results["CurveNumberVector"] = outputs["CurveNumberVector"]
             self.handle_post_processing(results["CurveNumberVector"], cn_style_path, context)
 
+        if composite_required:
+            try:
+                parameters["CompositeCurveNumber"].destinationName = "Composite Curve Number"
+            except AttributeError:
+                pass
+
+            # straight from the Curve Number raster, nothing is vectorized
+            results["CompositeCurveNumber"] = compositeCurveNumber(
+                outputs["CurveNumber"],
+                self.parameterAsVectorLayer(parameters, "Zones", context),
+                self.parameterAsOutputLayer(parameters, "CompositeCurveNumber", context),
+                context=context,
+                feedback=feedback,
+            )
+
+        results["StageReport"] = stage_report.finish(model_feedback)
         return results
 
     def name(self):
@@ -443,6 +516,10 @@ If unsure, use the default fair hydrologic conidtion which is the most common ca
 <p> Antecedent Runoff Condition (ARC) is the relative wetness or dryness index for the soil. I for dry, II for average, and III for wet conditions. (see <a href="https://directives.sc.egov.usda.gov/17752.wba">Table 10-1</a> for further understanding)</p>
 
 If unsure, use the default ARC II which is the most common case in hydrologic studies.
+<h3>Split Curve Number (Vectorized) by Area of Interest Feature?</h3>
+<p>If checked, the Curve Number (Vectorized) layer is split by the features of the Area of Interest and each part gets an aoi_fid field with the feature id of its Area of Interest feature. The data is still downloaded and processed once for the whole Area of Interest. Parts that are in several overlapping Area of Interest features are repeated once per feature. The Curve Number raster is not split.</p>
+<h3>Zones for Composite Curve Number [optional]</h3>
+<p>Polygon layer of the zones, e.g. subbasins, to compute the Composite Curve Number table for. Zones should not overlap. The areas are summed from the Curve Number raster by pixel center, nothing is vectorized.</p>
 <h2>Outputs</h2>
 <h3>ESA World Cover</h3>
 <p>ESA Land Cover 2021 raster.</p>
@@ -452,6 +529,14 @@ If unsure, use the default ARC II which is the most common case in hydrologic st
 <p>Generated Curve Number layer based on Land Cover and HSG values.</p>
 <h3>Curve Number (Vectorized)</h3>
 <p>Vector form of the generated Curve Number layer.</p>
+<h3>Composite Curve Number</h3>
+<p>Table with one row per polygon of the Zones layer, with the zone attributes and:
+<ul>
+<li>area_m2: area in square meters of the zone that has a Curve Number</li>
+<li>composite_cn: area-weighted composite Curve Number of the zone, NULL if no part of the zone has a Curve Number</li>
+<li>cn_&lt;value&gt;_m2: area in square meters of the zone with each Curve Number value found in any zone, e.g. cn_70_m2</li>
+</ul>
+Areas are measured on the ellipsoid, so they are comparable across projections.</p>
 <br>
 <p align="right">Algorithm science author: Abdullah Azzam</p><p align="right">Code author: Abdul Raheem Siddiqui</p><p align="right">Help author: Abdullah Azzam</p><p align="right">Algorithm version: {PLUGIN_VERSION}</p><p align="right">Contact email: ar-siddiqui@outlook.com</p><p>Disclaimer: The curve numbers generated with this algorithm are high level estimates and should be reviewed in detail before being used for detailed modeling or construction projects.</p></body></html>"""
         )
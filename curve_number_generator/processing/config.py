@@ -25,266 +25,70 @@ PROFILE_DICT = {"usage_counter": 1, "registered": False}
 
 CONUS_NLCD_SSURGO = {
     # urls
-    "NLCD_IMP_2021": "https://www.mrlc.gov/geoserver/ows?version=1.1.0&SERVICE=WCS&VERSION=1.0.0&REQUEST=GetCoverage&FORMAT=GeoTIFF&COVERAGE=mrlc_download:NLCD_2021_Impervious_L48&CRS={}&WIDTH={}&HEIGHT={}&BBOX={}&",
-    "NLCD_LC_2021": "https://www.mrlc.gov/geoserver/ows?version=1.1.0&SERVICE=WCS&VERSION=1.0.0&REQUEST=GetCoverage&FORMAT=GeoTIFF&COVERAGE=mrlc_download:NLCD_2021_Land_Cover_L48&CRS={}&WIDTH={}&HEIGHT={}&BBOX={}&",
+    "NLCD_IMP_2021": "https://www.mrlc.gov/geoserver/ows?version=1.1.0&SERVICE=WCS&VERSION=1.0.0&REQUEST=GetCoverage&FORMAT=GeoTIFF&COVERAGE=mrlc_download:NLCD_2021_Impervious_L48&CRS={crs}&WIDTH={width}&HEIGHT={height}&BBOX={bbox}&",
+    "NLCD_IMP_2021_PING": "https://www.mrlc.gov/geoserver/mrlc_display/NLCD_2021_Impervious_L48/ows",
+    "NLCD_LC_2021": "https://www.mrlc.gov/geoserver/ows?version=1.1.0&SERVICE=WCS&VERSION=1.0.0&REQUEST=GetCoverage&FORMAT=GeoTIFF&COVERAGE=mrlc_download:NLCD_2021_Land_Cover_L48&CRS={crs}&WIDTH={width}&HEIGHT={height}&BBOX={bbox}&",
+    "NLCD_LC_2021_PING": "https://www.mrlc.gov/geoserver/mrlc_display/NLCD_2021_Land_Cover_L48/ows",
+    "SSURGO_SDA": "https://sdmdataaccess.sc.egov.usda.gov/TABULAR/post.rest",
     "SSURGO_Soil": "https://sdmdataaccess.sc.egov.usda.gov/Spatial/SDMWGS84GEOGRAPHIC.wfs?SERVICE=WFS&VERSION=1.1.0&REQUEST=GetFeature&TYPENAME=mapunitpolyextended&SRSNAME=EPSG:4326&BBOX={}",
 }
 
+# file or folder names of the datasets in the local data folder, see data_sources.getDataSource
+LOCAL_DATA_FILES = {
+    "NLCD_IMP_2021": "nlcd_2021_impervious_l48.tif",
+    "NLCD_LC_2021": "nlcd_2021_land_cover_l48.tif",
+    # polygons with the fields of ssurgo_soil.SOIL_FIELDS
+    "SSURGO_SOILS": "ssurgo_soils.gpkg",
+    "ORNL_HYSOG": "hysogs250m.tif",
+    # folder of ESA WorldCover 2021 tiles
+    "ESA_WORLDCOVER_2021": "esa_worldcover_2021",
+}
+
+# larger WCS GetCoverage requests are split into sub-requests of at most this many pixels per side
+WCS_MAX_SIZE = 4096
+# sub-requests of one coverage in flight at once
+WCS_MAX_CONCURRENT_REQUESTS = 4
+
+# GDAL creation options of the raster outputs, written as Cloud Optimized GeoTIFFs: internally tiled, compressed
+# and with overviews. Nearest neighbour overviews keep the land cover, HSG and Curve Number classes intact.
+COG_CREATION_OPTIONS = ["COMPRESS=DEFLATE", "BLOCKSIZE=512", "RESAMPLING=NEAREST", "BIGTIFF=IF_SAFER", "NUM_THREADS=ALL_CPUS"]
+# GeoTIFF creation options of the intermediate rasters, tiled and cheap to compress and decompress
+TEMP_GTIFF_CREATION_OPTIONS = ["TILED=YES", "COMPRESS=LZW", "BIGTIFF=IF_SAFER"]
+
+# GDAL tuning per machine class, see utils.gdalConfigOptions. threads is the number of threads GDAL uses for
+# warping and compression (None for all CPUs), cache_mb the raster block cache, warp_memory_mb the gdalwarp
+# working buffer and vsi_cache_mb the cache of remote files read over HTTP such as the ESA WorldCover tiles
+PERFORMANCE_PROFILES = {
+    "light": {"threads": 1, "cache_mb": 256, "warp_memory_mb": 128, "vsi_cache_mb": 32},
+    "default": {"threads": 2, "cache_mb": 512, "warp_memory_mb": 256, "vsi_cache_mb": 64},
+    "workstation": {"threads": None, "cache_mb": 2048, "warp_memory_mb": 1024, "vsi_cache_mb": 256},
+}
+
+# upper left corner of the NLCD CONUS 30 m grid in EPSG:5070
+NLCD_GRID_ORIGIN = (-2493045.0, 3310005.0)
+
 GLOBAL_ESA_ORNL = {
-    "ORNL_HYSOG": "https://webmap.ornl.gov/ogcbroker/wcs?SERVICE=WCS&VERSION=1.0.0&REQUEST=GetCoverage&FORMAT=GeoTIFF_BYTE&COVERAGE=1566_1&WIDTH={}&HEIGHT={}&BBOX={}&CRS=epsg:4326&RESPONSE_CRS=epsg:4326"
+    "ORNL_HYSOG": "https://webmap.ornl.gov/ogcbroker/wcs?SERVICE=WCS&VERSION=1.0.0&REQUEST=GetCoverage&FORMAT=GeoTIFF_BYTE&COVERAGE=1566_1&WIDTH={width}&HEIGHT={height}&BBOX={bbox}&CRS=epsg:4326&RESPONSE_CRS=epsg:4326",
+    "ORNL_HYSOG_PING": "https://webmap.ornl.gov/ogcbroker/wcs",
+    "ESA_WORLDCOVER_2021": "/vsicurl/https://esa-worldcover.s3.eu-central-1.amazonaws.com/v200/2021/map/ESA_WorldCover_10m_2021_v200_{}_Map.tif",
 }
 
 
-MESSAGE_URL = "https://gist.githubusercontent.com/ar-siddiqui/2260461cfd0107150840ab6fb4f83516/raw"
+# Processing settings of the plugin as name: (description, default value, Setting value type or None for booleans)
+# an environment variable with the same name takes precedence over the setting
+SETTINGS = {
+    "CNG_CACHE_FOLDER": ("Download cache folder [leave empty for default]", "", "FOLDER"),
+    "CNG_CACHE_SIZE_MB": ("Download cache size in MB [0 to disable]", 2048, "INT"),
+    "CNG_SSURGO_STORE_ENABLED": ("Keep downloaded SSURGO map units in a local store", True, None),
+    "CNG_SSURGO_STORE": ("SSURGO map unit store file [leave empty for default]", "", "FILE"),
+    "CNG_DATA_FOLDER": ("Local data folder [leave empty to download all data]", "", "FOLDER"),
+    "CNG_ESA_WORLDCOVER_FOLDER": ("ESA WorldCover 2021 local mirror folder [leave empty to stream tiles]", "", "FOLDER"),
+    "CNG_TELEMETRY_ENABLED": ("Share the Area of Interest extent of each run with the plugin author", True, None),
+    "CNG_PERFORMANCE_PROFILE": ("GDAL performance profile [light, default or workstation]", "default", "STRING"),
+    "CNG_GDAL_NUM_THREADS": ("GDAL threads [0 for the performance profile value]", 0, "INT"),
+    "CNG_GDAL_CACHEMAX_MB": ("GDAL block cache in MB [0 for the performance profile value]", 0, "INT"),
+    "CNG_GDAL_WARP_MEMORY_MB": ("GDAL warp memory in MB [0 for the performance profile value]", 0, "INT"),
+    "CNG_GDAL_VSI_CACHE_MB": ("GDAL remote file cache in MB [0 for the performance profile value]", 0, "INT"),
+}
 
-LIST_OF_COUNTRIES = [
-    "",
-    "Afghanistan",
-    "Åland Islands",
-    "Albania",
-    "Algeria",
-    "American Samoa",
-    "Andorra",
-    "Angola",
-    "Anguilla",
-    "Antarctica",
-    "Antigua and Barbuda",
-    "Argentina",
-    "Armenia",
-    "Aruba",
-    "Australia",
-    "Austria",
-    "Azerbaijan",
-    "Bahamas",
-    "Bahrain",
-    "Bangladesh",
-    "Barbados",
-    "Belarus",
-    "Belgium",
-    "Belize",
-    "Benin",
-    "Bermuda",
-    "Bhutan",
-    "Bolivia",
-    "Bonaire, Sint Eustatius and Saba",
-    "Bosnia and Herzegovina",
-    "Botswana",
-    "Bouvet Island",
-    "Brazil",
-    "British Indian Ocean Territory",
-    "Brunei Darussalam",
-    "Bulgaria",
-    "Burkina Faso",
-    "Burundi",
-    "Cambodia",
-    "Cameroon",
-    "Canada",
-    "Cape Verde",
-    "Cayman Islands",
-    "Central African Republic",
-    "Chad",
-    "Chile",
-    "China",
-    "Christmas Island",
-    "Cocos (Keeling) Islands",
-    "Colombia",
-    "Comoros",
-    "Congo",
-    "Congo",
-    "Cook Islands",
-    "Costa Rica",
-    "Côte D'Ivoire",
-    "Croatia",
-    "Cuba",
-    "Curaçao",
-    "Cyprus",
-    "Czech Republic",
-    "Denmark",
-    "Djibouti",
-    "Dominica",
-    "Dominican Republic",
-    "Ecuador",
-    "Egypt",
-    "El Salvador",
-    "Equatorial Guinea",
-    "Eritrea",
-    "Estonia",
-    "Ethiopia",
-    "Falkland Islands (Malvinas)",
-    "Faroe Islands",
-    "Fiji",
-    "Finland",
-    "France",
-    "French Guiana",
-    "French Polynesia",
-    "French Southern Territories",
-    "Gabon",
-    "Gambia",
-    "Georgia",
-    "Germany",
-    "Ghana",
-    "Gibraltar",
-    "Greece",
-    "Greenland",
-    "Grenada",
-    "Guadeloupe",
-    "Guam",
-    "Guatemala",
-    "Guernsey",
-    "Guinea",
-    "Guinea-Bissau",
-    "Guyana",
-    "Haiti",
-    "Heard Island and Mcdonald Islands",
-    "Honduras",
-    "Hong Kong",
-    "Hungary",
-    "Iceland",
-    "India",
-    "Indonesia",
-    "Iran",
-    "Iraq",
-    "Ireland",
-    "Isle of Man",
-    "Italy",
-    "Jamaica",
-    "Japan",
-    "Jersey",
-    "Jordan",
-    "Kazakhstan",
-    "Kenya",
-    "Kiribati",
-    "Kuwait",
-    "Kyrgyzstan",
-    "Lao People's Democratic Republic",
-    "Latvia",
-    "Lebanon",
-    "Lesotho",
-    "Liberia",
-    "Libya",
-    "Liechtenstein",
-    "Lithuania",
-    "Luxembourg",
-    "Macao",
-    "Macedonia",
-    "Madagascar",
-    "Malawi",
-    "Malaysia",
-    "Maldives",
-    "Mali",
-    "Malta",
-    "Marshall Islands",
-    "Martinique",
-    "Mauritania",
-    "Mauritius",
-    "Mayotte",
-    "Mexico",
-    "Micronesia",
-    "Moldova",
-    "Monaco",
-    "Mongolia",
-    "Montenegro",
-    "Montserrat",
-    "Morocco",
-    "Mozambique",
-    "Myanmar",
-    "Namibia",
-    "Nauru",
-    "Nepal",
-    "Netherlands",
-    "New Caledonia",
-    "New Zealand",
-    "Nicaragua",
-    "Niger",
-    "Nigeria",
-    "Niue",
-    "Norfolk Island",
-    "North Korea",
-    "Northern Mariana Islands",
-    "Norway",
-    "Oman",
-    "Pakistan",
-    "Palau",
-    "Palestine / Israel",
-    "Panama",
-    "Papua New Guinea",
-    "Paraguay",
-    "Peru",
-    "Philippines",
-    "Pitcairn",
-    "Poland",
-    "Portugal",
-    "Puerto Rico",
-    "Qatar",
-    "Réunion",
-    "Romania",
-    "Russia",
-    "Rwanda",
-    "Saint Barthélemy",
-    "Saint Helena, Ascension and Tristan Da Cunha",
-    "Saint Kitts and Nevis",
-    "Saint Lucia",
-    "Saint Martin (French Part)",
-    "Saint Pierre and Miquelon",
-    "Saint Vincent and The Grenadines",
-    "Samoa",
-    "San Marino",
-    "Sao Tome and Principe",
-    "Saudi Arabia",
-    "Senegal",
-    "Serbia",
-    "Seychelles",
-    "Sierra Leone",
-    "Singapore",
-    "Sint Maarten (Dutch Part)",
-    "Slovakia",
-    "Slovenia",
-    "Solomon Islands",
-    "Somalia",
-    "South Africa",
-    "South Georgia",
-    "South Korea",
-    "South Sudan",
-    "Spain",
-    "Sri Lanka",
-    "Sudan",
-    "Suriname",
-    "Svalbard and Jan Mayen",
-    "Swaziland",
-    "Sweden",
-    "Switzerland",
-    "Syrian Arab Republic",
-    "Taiwan",
-    "Tajikistan",
-    "Tanzania",
-    "Thailand",
-    "Timor-Leste",
-    "Togo",
-    "Tokelau",
-    "Tonga",
-    "Trinidad and Tobago",
-    "Tunisia",
-    "Turkey",
-    "Turkmenistan",
-    "Turks and Caicos Islands",
-    "Tuvalu",
-    "Uganda",
-    "Ukraine",
-    "United Arab Emirates",
-    "United Kingdom",
-    "United States",
-    "United States Minor Outlying Islands",
-    "Uruguay",
-    "Uzbekistan",
-    "Vanuatu",
-    "Vatican City",
-    "Venezuela",
-    "Viet Nam",
-    "Virgin Islands, British",
-    "Virgin Islands, U.S.",
-    "Wallis and Futuna",
-    "Western Sahara",
-    "Yemen",
-    "Zambia",
-    "Zimbabwe",
-]
+MESSAGE_URL = "https://gist.githubusercontent.com/ar-siddiqui/2260461cfd0107150840ab6fb4f83516/raw"
@@ -25,8 +25,7 @@ import inspect
 import os
 import sys
 
-import requests
-from qgis.core import QgsApplication, QgsProcessingAlgorithm
+from qgis.core import QgsProcessing, QgsProcessingAlgorithm
 from qgis.PyQt.QtCore import QCoreApplication
 from qgis.PyQt.QtGui import QIcon
 
@@ -39,17 +38,19 @@ from curve_number_generator.processing.config import (
 from curve_number_generator.processing.tools.layer_post_processor import (
     LayerPostProcessor,
 )
-from curve_number_generator.processing.tools.registration import RegisterForm
 from curve_number_generator.processing.tools.utils import (
     checkPluginUptodate,
+    cn_telemetry_file,
     displayUsageMessage,
     getRegistrationStatus,
+    getSetting,
     incrementUsageCounter,
+    settingsFilePath,
+    writeCog,
 )
 
 cmd_folder = os.path.split(inspect.getfile(inspect.currentframe()))[0]
 sys.path.append(cmd_folder)
-qgis_settings_path = QgsApplication.qgisSettingsDirPath().replace("\\", "/")
 
 __author__ = "Abdul Raheem Siddiqui"
 __date__ = "2022-06-29"
@@ -77,6 +78,14 @@ class CurveNumberGeneratorAlgorithm(QgsProcessingAlgorithm):
 
     def postProcessAlgorithm(self, context, feedback):
         try:  # try-except because trivial features
+            from qgis.utils import iface
+
+            # messages and forms need the QGIS interface, there is none in qgis_process or a batch run.
+            # Batch workers run in parallel processes, which would race on the usage counter file.
+            if iface is None:
+                self.postWKTInfo()
+                return {}
+
             counter = incrementUsageCounter()
 
             # check if counter is milestone for plugin version check
@@ -89,6 +98,8 @@ class CurveNumberGeneratorAlgorithm(QgsProcessingAlgorithm):
 
             # check if plugin is registered
             if not getRegistrationStatus():
+                from curve_number_generator.processing.tools.registration import RegisterForm
+
                 form = RegisterForm("Register Curve Number Plugin", REGISTRATION_FORM_LINK, REGISTRATION_FORM_ENRIES)
                 form.show()
 
@@ -103,6 +114,13 @@ class CurveNumberGeneratorAlgorithm(QgsProcessingAlgorithm):
 
         return {}
 
+    def rasterOutput(self, raster, parameters, name, context, feedback) -> str:
+        """Write the intermediate raster to the raster destination parameter name as a Cloud Optimized GeoTIFF.
+        A plain temporary output, as requested for the tiles of a tiled run, is returned as is."""
+        if parameters[name] == QgsProcessing.TEMPORARY_OUTPUT:
+            return raster
+        return writeCog(raster, self.parameterAsOutputLayer(parameters, name, context), context=context, feedback=feedback)
+
     def handle_post_processing(self, layer, style_file, context) -> None:
         if context.willLoadLayerOnCompletion(layer):
             self.styler_dict[layer] = LayerPostProcessor(style_file)
@@ -137,11 +155,20 @@ class CurveNumberGeneratorAlgorithm(QgsProcessingAlgorithm):
         return "mailto:ar-siddiqui@outlook.com"
 
     def postWKTInfo(self):
+        """Queue the AOI of the run to be reported in the background, see telemetry"""
+        if not getSetting("CNG_TELEMETRY_ENABLED"):
+            return
+
+        from curve_number_generator.processing.tools.telemetry import (
+            TelemetrySpool,
+            flushInBackground,
+        )
 
         data = {
             AOI_WKTS_FORM_ENRIES["algorithm"]: self.name(),
             AOI_WKTS_FORM_ENRIES["aoi_wkt"]: self.aoi_wkt_3857,
         }
 
-        r = requests.post(AOI_WKTS_FORM_LINK, data=data, timeout=5)
-        r.raise_for_status()
+        spool = TelemetrySpool(settingsFilePath(cn_telemetry_file))
+        spool.append([data])
+        flushInBackground(spool, AOI_WKTS_FORM_LINK)
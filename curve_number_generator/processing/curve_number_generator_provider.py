@@ -33,10 +33,12 @@ __revision__ = "$Format:%H$"
 import inspect
 import os
 
+from processing.core.ProcessingConfig import ProcessingConfig, Setting
 from qgis.core import QgsProcessingProvider
 from qgis.PyQt.QtGui import QIcon
 
 from curve_number_generator.processing import algorithms
+from curve_number_generator.processing.config import SETTINGS
 from curve_number_generator.processing.curve_number_generator_algorithm import (
     CurveNumberGeneratorAlgorithm,
 )
@@ -49,11 +51,32 @@ class CurveNumberGeneratorProvider(QgsProcessingProvider):
         """
         QgsProcessingProvider.__init__(self)
 
+    def load(self):
+        """
+        Loads the provider and adds its settings to the Processing options.
+        """
+        ProcessingConfig.settingIcons[self.name()] = self.icon()
+        for name, (description, default, valuetype) in SETTINGS.items():
+            ProcessingConfig.addSetting(
+                Setting(
+                    self.name(),
+                    name,
+                    description,
+                    default,
+                    valuetype=getattr(Setting, valuetype) if valuetype else None,
+                )
+            )
+        ProcessingConfig.readSettings()
+        self.refreshAlgorithms()
+        return True
+
     def unload(self):
         """
         Unloads the provider. Any tear-down steps required by the provider
         should be implemented here.
         """
+        for name in SETTINGS:
+            ProcessingConfig.removeSetting(name)
 
     def loadAlgorithms(self):
         """
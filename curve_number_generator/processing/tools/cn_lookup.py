@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+
+"""
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+
+__author__ = "Abdul Raheem Siddiqui"
+__date__ = "2026-10-18"
+__copyright__ = "(C) 2026 by Abdul Raheem Siddiqui"
+
+# This will get replaced with a git SHA1 when you do a git archive
+
+__revision__ = "$Format:%H$"
+
+import os
+
+from osgeo import gdal
+from qgis.core import QgsProcessingException, QgsRasterFileWriter, QgsVectorLayer
+
+from curve_number_generator.processing.config import TEMP_GTIFF_CREATION_OPTIONS
+
+# land cover and HSG rasters are Byte rasters, so a 256 x 256 table covers every combination
+LOOKUP_SIZE = 256
+
+
+def buildCnLookupArray(
+    lookup_layer: QgsVectorLayer,
+    hsg_map: dict = None,
+    nodata_hsg: str = "D",
+    overrides: dict = None,
+    nodata: int = 255,
+    fill_value: int = 0,
+) -> "numpy.ndarray":
+    """Compile a lookup table with 'grid_code' and 'cn' columns into a dense array indexed by
+    [land cover value, HSG value].
+
+    hsg_map relates the HSG part of grid_code to the values of the HSG raster, lookup rows with an HSG
+    missing from hsg_map are skipped. HSG nodata is treated as nodata_hsg (None to disable).
+    overrides maps an HSG value to a grid_code whose CN is used irrespective of land cover.
+    Combinations that are not in the lookup table get fill_value, as do rows with a NULL cn or a grid_code
+    that is not a land cover value and an HSG joined by an underscore, like polygons that such rows do
+    not match in the vector overlay.
+    """
+    import numpy
+
+    if hsg_map is None:
+        hsg_map = {
+            "A": 1,
+            "B": 2,
+            "C": 3,
+            "D": 4,
+        }
+
+    lut = numpy.full((LOOKUP_SIZE, LOOKUP_SIZE), fill_value, dtype=numpy.uint8)
+    cn_lookup = {}
+    for feat in lookup_layer.getFeatures():
+        grid_code = str(feat.attribute("grid_code"))
+        try:
+            cn = int(feat.attribute("cn"))
+            lc, hsg = grid_code.split("_")
+            lc = int(lc)
+        except (TypeError, ValueError):
+            continue
+        if not (0 <= cn < LOOKUP_SIZE and 0 <= lc < LOOKUP_SIZE):
+            continue
+        cn_lookup[grid_code] = cn
+        if hsg not in hsg_map:
+            continue
+        lut[lc, hsg_map[hsg]] = cn
+        if hsg == nodata_hsg:
+            lut[lc, nodata] = cn
+
+    for hsg_value, grid_code in (overrides or {}).items():
+        if grid_code in cn_lookup:
+            lut[:, hsg_value] = cn_lookup[grid_code]
+
+    return lut
+
+
+def applyCnLookup(
+    lc_raster: str,
+    hsg_raster: str,
+    lut: "numpy.ndarray",
+    output: str,
+    nodata: int = 255,
+    mask_nodata: bool = True,
+    feedback=None,
+) -> str:
+    """Write a Curve Number raster by indexing lut with the land cover and HSG rasters block by block.
+    Both rasters must share the same grid. If mask_nodata, pixels that are nodata in either input are
+    nodata in the output. GeoTIFFs are written with the intermediate raster creation options, see
+    utils.writeCog for the final output."""
+    import numpy
+
+    lc_ds = gdal.Open(lc_raster)
+    hsg_ds = gdal.Open(hsg_raster)
+    if lc_ds is None or hsg_ds is None:
+        raise QgsProcessingException(f"Could not open {lc_raster if lc_ds is None else hsg_raster}")
+    if (lc_ds.RasterXSize, lc_ds.RasterYSize) != (hsg_ds.RasterXSize, hsg_ds.RasterYSize):
+        raise QgsProcessingException("Land Cover and HSG rasters must have the same dimensions.")
+
+    x_size, y_size = lc_ds.RasterXSize, lc_ds.RasterYSize
+    lc_band = lc_ds.GetRasterBand(1)
+    hsg_band = hsg_ds.GetRasterBand(1)
+    lc_nodata = lc_band.GetNoDataValue()
+    hsg_nodata = hsg_band.GetNoDataValue()
+
+    driver_name = QgsRasterFileWriter.driverForExtension(os.path.splitext(output)[1]) or "GTiff"
+    options = TEMP_GTIFF_CREATION_OPTIONS if driver_name == "GTiff" else []
+    out_ds = gdal.GetDriverByName(driver_name).Create(output, x_size, y_size, 1, gdal.GDT_Byte, options)
+    out_ds.SetGeoTransform(lc_ds.GetGeoTransform())
+    out_ds.SetProjection(lc_ds.GetProjection())
+    out_band = out_ds.GetRasterBand(1)
+    out_band.SetNoDataValue(nodata)
+
+    # read whole rows of blocks so every read is aligned with the storage of the land cover raster
+    block_rows = max(lc_band.GetBlockSize()[1], 256)
+    for y_off in range(0, y_size, block_rows):
+        if feedback and feedback.isCanceled():
+            break
+        rows = min(block_rows, y_size - y_off)
+        lc = lc_band.ReadAsArray(0, y_off, x_size, rows)
+        hsg = hsg_band.ReadAsArray(0, y_off, x_size, rows)
+
+        outside = None
+        if lc.dtype != numpy.uint8 or hsg.dtype != numpy.uint8:
+            outside = (lc < 0) | (lc >= LOOKUP_SIZE) | (hsg < 0) | (hsg >= LOOKUP_SIZE)
+            lc = numpy.where(outside, 0, lc).astype(numpy.intp)
+            hsg = numpy.where(outside, 0, hsg).astype(numpy.intp)
+
+        cn = lut[lc, hsg]
+
+        if outside is not None:
+            cn[outside] = nodata
+        if mask_nodata:
+            if lc_nodata is not None:
+                cn[lc == lc_nodata] = nodata
+            if hsg_nodata is not None:
+                cn[hsg == hsg_nodata] = nodata
+
+        out_band.WriteArray(cn, 0, y_off)
+        if feedback:
+            feedback.setProgress(100 * (y_off + rows) / y_size)
+
+    out_band.FlushCache()
+    out_ds = None
+
+    return output
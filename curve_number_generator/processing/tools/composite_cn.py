@@ -0,0 +1,244 @@
+# -*- coding: utf-8 -*-
+
+"""
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+
+__author__ = "Abdul Raheem Siddiqui"
+__date__ = "2026-10-18"
+__copyright__ = "(C) 2026 by Abdul Raheem Siddiqui"
+
+# This will get replaced with a git SHA1 when you do a git archive
+
+__revision__ = "$Format:%H$"
+
+
+from qgis.core import (
+    QgsCoordinateReferenceSystem,
+    QgsCoordinateTransform,
+    QgsDistanceArea,
+    QgsFeature,
+    QgsField,
+    QgsFields,
+    QgsGeometry,
+    QgsProcessing,
+    QgsProcessingException,
+    QgsProcessingUtils,
+    QgsProject,
+    QgsRasterLayer,
+    QgsRectangle,
+    QgsUnitTypes,
+    QgsVectorLayer,
+    QgsWkbTypes,
+)
+from qgis.PyQt.QtCore import QVariant
+
+from curve_number_generator.processing.tools.instrumentation import instrumented
+from curve_number_generator.processing.tools.overlay import LandCoverOverlay
+
+# curve numbers 0 to 100, other values of a Curve Number raster such as its nodata are ignored
+CN_CLASSES = 101
+
+
+def distanceArea(crs: QgsCoordinateReferenceSystem, ellipsoid: str = None) -> QgsDistanceArea:
+    """Ellipsoidal area measurement of geometries in crs, so areas are comparable across CRSs"""
+    d = QgsDistanceArea()
+    d.setSourceCrs(crs, QgsProject.instance().transformContext())
+    d.setEllipsoid(ellipsoid or crs.ellipsoidAcronym() or "EPSG:7030")
+    return d
+
+
+def squareMeters(d: QgsDistanceArea, geom: QgsGeometry) -> float:
+    return d.convertAreaMeasurement(d.measureArea(geom), QgsUnitTypes.AreaSquareMeters)
+
+
+def zoneGeometries(zones_layer: QgsVectorLayer, crs: QgsCoordinateReferenceSystem) -> list:
+    """(feature, geometry in crs) of every zone, in the order of the rows of the composite table"""
+    transform = QgsCoordinateTransform(zones_layer.crs(), crs, QgsProject.instance())
+    zones = []
+    for feat in zones_layer.getFeatures():
+        geom = QgsGeometry(feat.geometry())
+        if not geom.isEmpty():
+            geom.transform(transform)
+        zones.append((feat, geom))
+    return zones
+
+
+def rowPixelAreas(ds, d: QgsDistanceArea) -> "numpy.ndarray":
+    """Area in square meters of a pixel of each row of the raster dataset ds. On a geographic grid the
+    pixel area changes with the latitude, the middle pixel of each row is measured."""
+    import numpy
+
+    x_origin, x_res, _, y_origin, _, y_res = ds.GetGeoTransform()
+    x_min = x_origin + x_res * (ds.RasterXSize // 2)
+    areas = numpy.empty(ds.RasterYSize)
+    for row in range(ds.RasterYSize):
+        y_min = y_origin + y_res * row
+        areas[row] = squareMeters(d, QgsGeometry.fromRect(QgsRectangle(x_min, y_min, x_min + x_res, y_min + y_res)))
+    return areas
+
+
+def rasterCnAreas(cn_raster: str, zones: list, ellipsoid: str = None, feedback=None) -> "numpy.ndarray":
+    """Area in square meters of each Curve Number in each zone, as a (zones, CN_CLASSES) array.
+
+    The zones are burnt into a raster on the grid of cn_raster (by pixel center, the last zone wins where
+    zones overlap), then both rasters are read a row of blocks at a time and the pixel areas are summed
+    by zone and Curve Number with a single bincount per block."""
+    import numpy
+    from osgeo import gdal, ogr, osr
+
+    cn_ds = gdal.Open(cn_raster)
+    if cn_ds is None:
+        raise QgsProcessingException(f"Could not open {cn_raster}")
+    x_size, y_size = cn_ds.RasterXSize, cn_ds.RasterYSize
+    cn_band = cn_ds.GetRasterBand(1)
+    cn_nodata = cn_band.GetNoDataValue()
+
+    srs = osr.SpatialReference()
+    srs.ImportFromWkt(cn_ds.GetProjection())
+    zone_source = ogr.GetDriverByName("Memory").CreateDataSource("zones")
+    zone_layer = zone_source.CreateLayer("zones", srs, ogr.wkbUnknown)
+    zone_layer.CreateField(ogr.FieldDefn("zone", ogr.OFTInteger))
+    for index, (_, geom) in enumerate(zones, 1):
+        if geom.isEmpty():
+            continue
+        zone_feat = ogr.Feature(zone_layer.GetLayerDefn())
+        zone_feat.SetField("zone", index)
+        zone_feat.SetGeometry(ogr.CreateGeometryFromWkb(bytes(geom.asWkb())))
+        zone_layer.CreateFeature(zone_feat)
+
+    # 0 is outside every zone
+    zones_ds = gdal.GetDriverByName("GTiff").Create(
+        QgsProcessingUtils.generateTempFilename("Zones.tif"), x_size, y_size, 1, gdal.GDT_UInt32, ["COMPRESS=LZW"]
+    )
+    zones_ds.SetGeoTransform(cn_ds.GetGeoTransform())
+    zones_ds.SetProjection(cn_ds.GetProjection())
+    gdal.RasterizeLayer(zones_ds, [1], zone_layer, options=["ATTRIBUTE=zone"])
+    zones_band = zones_ds.GetRasterBand(1)
+
+    pixel_areas = rowPixelAreas(
+        cn_ds, distanceArea(QgsCoordinateReferenceSystem.fromWkt(cn_ds.GetProjection()), ellipsoid)
+    )
+    areas = numpy.zeros((len(zones) + 1) * CN_CLASSES)
+
+    block_rows = max(cn_band.GetBlockSize()[1], 256)
+    for y_off in range(0, y_size, block_rows):
+        if feedback and feedback.isCanceled():
+            break
+        rows = min(block_rows, y_size - y_off)
+        cn = cn_band.ReadAsArray(0, y_off, x_size, rows)
+        zone = zones_band.ReadAsArray(0, y_off, x_size, rows)
+
+        valid = (zone > 0) & (cn >= 0) & (cn < CN_CLASSES)
+        if cn_nodata is not None:
+            valid &= cn != cn_nodata
+        keys = zone[valid].astype(numpy.int64) * CN_CLASSES + cn[valid].astype(numpy.int64)
+        weights = numpy.broadcast_to(pixel_areas[y_off : y_off + rows, None], cn.shape)[valid]
+        areas += numpy.bincount(keys, weights=weights, minlength=areas.size)
+
+        if feedback:
+            feedback.setProgress(100 * (y_off + rows) / y_size)
+
+    zones_ds = None
+    return areas.reshape(len(zones) + 1, CN_CLASSES)[1:]
+
+
+def vectorCnAreas(cn_layer: QgsVectorLayer, zones: list, ellipsoid: str = None, feedback=None) -> "numpy.ndarray":
+    """Area in square meters of each Curve Number in each zone, as a (zones, CN_CLASSES) array, from the
+    overlay of the zones with the polygons of a Curve Number layer. Only the areas are accumulated, the
+    intersections are never written."""
+    import numpy
+
+    cn_index = cn_layer.fields().lookupField("cn")
+    if cn_index == -1:
+        raise QgsProcessingException("Field cn not found in Curve Number layer.")
+
+    d = distanceArea(cn_layer.crs(), ellipsoid)
+    areas = numpy.zeros((len(zones), CN_CLASSES))
+    overlay = LandCoverOverlay(cn_layer, cn_index, feedback)
+    for current, (_, zone_geom) in enumerate(zones):
+        if feedback and feedback.isCanceled():
+            break
+        if zone_geom.isEmpty():
+            continue
+        for cn, geom in overlay.intersect(zone_geom):
+            try:
+                cn = int(round(float(cn)))
+            except (TypeError, ValueError):  # NULL cn, land cover missing from the lookup table
+                continue
+            if 0 <= cn < CN_CLASSES:
+                areas[current, cn] += squareMeters(d, geom)
+        if feedback:
+            feedback.setProgress(100 * (current + 1) / len(zones))
+    return areas
+
+
+def writeCompositeCn(areas: "numpy.ndarray", zones: list, zone_fields: QgsFields, output: str, context) -> str:
+    """Write one row per zone with the zone attributes, the area in square meters with a Curve Number
+    (area_m2), the area-weighted composite Curve Number (composite_cn, NULL without any area) and the
+    area of each Curve Number found in any zone (cn_<value>_m2)."""
+    import numpy
+
+    classes = [int(cn) for cn in numpy.flatnonzero(areas.sum(axis=0))]
+    new_fields = ["area_m2", "composite_cn"] + [f"cn_{cn}_m2" for cn in classes]
+
+    fields = QgsFields()
+    kept_indices = []
+    for i, field in enumerate(zone_fields):
+        if field.name().lower() not in new_fields:
+            fields.append(field)
+            kept_indices.append(i)
+    for name in new_fields:
+        fields.append(QgsField(name, QVariant.Double))
+
+    if output == QgsProcessing.TEMPORARY_OUTPUT:
+        output = QgsProcessingUtils.generateTempFilename("CompositeCurveNumber.gpkg")
+    sink, dest = QgsProcessingUtils.createFeatureSink(
+        output, context, fields, QgsWkbTypes.NoGeometry, QgsCoordinateReferenceSystem()
+    )
+
+    cn_values = numpy.arange(CN_CLASSES)
+    for (zone_feat, _), zone_areas in zip(zones, areas):
+        total = float(zone_areas.sum())
+        composite = round(float(zone_areas @ cn_values) / total, 2) if total else None
+        feat = QgsFeature(fields)
+        feat.setAttributes(
+            [zone_feat.attribute(i) for i in kept_indices]
+            + [round(total, 2), composite]
+            + [round(float(zone_areas[cn]), 2) for cn in classes]
+        )
+        sink.addFeature(feat)
+
+    # close the sink so that the output is flushed to disk
+    del sink
+
+    return dest
+
+
+@instrumented(input_arg="zones")
+def compositeCurveNumber(
+    cn, zones, output=QgsProcessing.TEMPORARY_OUTPUT, context=None, feedback=None
+) -> str:
+    """Table of the area-weighted composite Curve Number and of the area of each Curve Number per polygon
+    of the zones layer, e.g. per subbasin. cn is a Curve Number raster or a vector with a cn field. Zones are
+    expected not to overlap."""
+    cn_layer = cn if not isinstance(cn, str) else QgsProcessingUtils.mapLayerFromString(cn, context)
+    zones_layer = zones if not isinstance(zones, str) else QgsProcessingUtils.mapLayerFromString(zones, context)
+    if cn_layer is None or zones_layer is None:
+        raise QgsProcessingException(f"Could not load {cn if cn_layer is None else zones}")
+
+    ellipsoid = context.ellipsoid() if context else None
+    zone_list = zoneGeometries(zones_layer, cn_layer.crs())
+    if isinstance(cn_layer, QgsRasterLayer):
+        areas = rasterCnAreas(cn_layer.source(), zone_list, ellipsoid, feedback)
+    else:
+        areas = vectorCnAreas(cn_layer, zone_list, ellipsoid, feedback)
+
+    return writeCompositeCn(areas, zone_list, zones_layer.fields(), output, context)
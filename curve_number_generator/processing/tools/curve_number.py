@@ -21,7 +21,25 @@ __revision__ = "$Format:%H$"
 
 
 import processing
-from qgis.core import QgsProcessing, QgsProcessingContext, QgsProcessingMultiStepFeedback, QgsVectorLayer
+from qgis.core import (
+    QgsExpression,
+    QgsExpressionContext,
+    QgsExpressionContextUtils,
+    QgsFeature,
+    QgsFeatureRequest,
+    QgsField,
+    QgsFields,
+    QgsProcessing,
+    QgsProcessingContext,
+    QgsProcessingException,
+    QgsProcessingMultiStepFeedback,
+    QgsProcessingUtils,
+    QgsVectorLayer,
+    QgsWkbTypes,
+)
+from qgis.PyQt.QtCore import QVariant
+
+from curve_number_generator.processing.tools.overlay import LandCoverOverlay
 
 
 class CurveNumber:
@@ -51,7 +69,18 @@ class CurveNumber:
         land_cover_field: str = "land_cover",
         start_step: int = 0,
         output=QgsProcessing.TEMPORARY_OUTPUT,
+        fused: bool = False,
     ):
+        if fused:
+            return self.generateCurveNumberFused(
+                soil_fields_to_keep,
+                fields_to_drop_in_result,
+                gdcode_formula,
+                land_cover_field,
+                start_step,
+                output,
+            )
+
         self.feedback.pushInfo("Generating Curve Number Layer. This may take a while. Do not cancel.")
 
         # Intersection
@@ -152,3 +181,114 @@ class CurveNumber:
             )["OUTPUT"],
             step,
         )
+
+    def generateCurveNumberFused(
+        self,
+        soil_fields_to_keep: list,
+        fields_to_drop_in_result: list,
+        gdcode_formula: str,
+        land_cover_field: str = "land_cover",
+        start_step: int = 0,
+        output=QgsProcessing.TEMPORARY_OUTPUT,
+    ):
+        """Same result as generateCurveNumber but soil and land cover features are intersected,
+        given a grid_code and a cn in a single pass that writes straight to the output. Land cover is
+        transformed to the soil CRS, the output is in the soil CRS. Returns the same step as
+        generateCurveNumber, so callers budget the same feedback steps for both."""
+
+        self.feedback.pushInfo("Generating Curve Number Layer. This may take a while.")
+        step = start_step
+        self.feedback.setCurrentStep(step)
+
+        soil_layer = self.asLayer(self.soil_layer)
+        lc_layer = self.asLayer(self.lc_layer)
+        lookup_layer = self.asLayer(self.lookup_layer)
+
+        # keep the first cn of each grid_code like the one-to-one table join does
+        cn_lookup = {}
+        for feat in lookup_layer.getFeatures():
+            cn_lookup.setdefault(str(feat.attribute("grid_code")), feat.attribute("cn"))
+
+        # fields of the intersection, the grid_code expression is evaluated against these
+        soil_field_indices = []
+        for name in soil_fields_to_keep:
+            index = soil_layer.fields().lookupField(name)
+            if index == -1:
+                raise QgsProcessingException(f"Field {name} not found in soil layer.")
+            soil_field_indices.append(index)
+        lc_field_index = lc_layer.fields().lookupField(land_cover_field)
+        if lc_field_index == -1:
+            raise QgsProcessingException(f"Field {land_cover_field} not found in land cover layer.")
+
+        calc_fields = QgsFields()
+        for index in soil_field_indices:
+            calc_fields.append(soil_layer.fields().at(index))
+        calc_fields.append(lc_layer.fields().at(lc_field_index))
+
+        all_fields = QgsFields(calc_fields)
+        all_fields.append(QgsField("grid_code", QVariant.String))
+        all_fields.append(lookup_layer.fields().field("cn"))
+
+        dropped = [name.lower() for name in fields_to_drop_in_result]
+        kept_indices = [i for i, field in enumerate(all_fields) if field.name().lower() not in dropped]
+        out_fields = QgsFields()
+        for i in kept_indices:
+            out_fields.append(all_fields.at(i))
+
+        if output == QgsProcessing.TEMPORARY_OUTPUT:
+            output = QgsProcessingUtils.generateTempFilename("CurveNumber.gpkg")
+        sink, dest = QgsProcessingUtils.createFeatureSink(
+            output,
+            self.context,
+            out_fields,
+            QgsWkbTypes.multiType(soil_layer.wkbType()),
+            soil_layer.crs(),
+        )
+
+        expression = QgsExpression(gdcode_formula)
+        exp_context = QgsExpressionContext(QgsExpressionContextUtils.globalProjectLayerScopes(soil_layer))
+        exp_context.setFields(calc_fields)
+        expression.prepare(exp_context)
+
+        lc_overlay = LandCoverOverlay(
+            lc_layer, lc_field_index, self.feedback, soil_layer.crs(), self.context.transformContext()
+        )
+
+        total = 100.0 / soil_layer.featureCount() if soil_layer.featureCount() else 0
+        soil_request = QgsFeatureRequest().setSubsetOfAttributes(soil_field_indices)
+        for current, soil_feat in enumerate(soil_layer.getFeatures(soil_request)):
+            if self.feedback.isCanceled():
+                break
+            soil_geom = soil_feat.geometry()
+            if soil_geom.isEmpty():
+                continue
+            soil_attrs = [soil_feat.attribute(index) for index in soil_field_indices]
+
+            for lc_value, geom in lc_overlay.intersect(soil_geom):
+                calc_feat = QgsFeature(calc_fields)
+                calc_feat.setAttributes(soil_attrs + [lc_value])
+                exp_context.setFeature(calc_feat)
+                grid_code = expression.evaluate(exp_context)
+                grid_code = str(grid_code) if grid_code else None
+
+                attrs = calc_feat.attributes() + [grid_code, cn_lookup.get(grid_code)]
+                out_feat = QgsFeature(out_fields)
+                out_feat.setGeometry(geom)
+                out_feat.setAttributes([attrs[i] for i in kept_indices])
+                sink.addFeature(out_feat)
+
+            self.feedback.setProgress(int(current * total))
+
+        # close the sink so that the output is flushed to disk
+        del sink
+
+        # the steps of the intersection, grid_code, join and drop fields of generateCurveNumber
+        step = start_step + (2 if fields_to_drop_in_result else 1)
+        self.feedback.setCurrentStep(step)
+
+        return dest, step
+
+    def asLayer(self, layer) -> QgsVectorLayer:
+        if isinstance(layer, QgsVectorLayer):
+            return layer
+        return QgsProcessingUtils.mapLayerFromString(layer, self.context)
@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+
+"""
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+
+__author__ = "Abdul Raheem Siddiqui"
+__date__ = "2026-10-18"
+__copyright__ = "(C) 2026 by Abdul Raheem Siddiqui"
+
+# This will get replaced with a git SHA1 when you do a git archive
+
+__revision__ = "$Format:%H$"
+
+
+import os
+from abc import ABC, abstractmethod
+
+from osgeo import gdal
+from qgis.core import QgsProcessingException, QgsProcessingUtils
+
+from curve_number_generator.processing.config import LOCAL_DATA_FILES
+from curve_number_generator.processing.tools.utils import fetchCoverage, getSetting
+
+
+class DataSource(ABC):
+    """Source of a dataset clipped to an extent. fetch does not use the processing context,
+    so it can run in a worker thread, see runConcurrently."""
+
+    @abstractmethod
+    def fetch(self, extent: tuple, crs: str, feedback=None) -> str:
+        """Path of a raster or vector file covering extent (xmin, ymin, xmax, ymax) in crs"""
+
+
+class WcsSource(DataSource):
+    """Coverage downloaded from a WCS server, through the download cache"""
+
+    def __init__(self, url_template: str, cell_size: float, ping_URL="", error_message=""):
+        self.url_template = url_template
+        self.cell_size = cell_size
+        self.ping_URL = ping_URL
+        self.error_message = error_message
+
+    def fetch(self, extent: tuple, crs: str, feedback=None) -> str:
+        return fetchCoverage(
+            self.url_template,
+            extent,
+            self.cell_size,
+            self.ping_URL,
+            self.error_message,
+            feedback=feedback,
+            crs=crs,
+        )
+
+
+class LocalRasterSource(DataSource):
+    """Window of a local raster such as a national GeoTIFF. The window is a VRT referencing
+    the local file, so no pixels are copied."""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def fetch(self, extent: tuple, crs: str, feedback=None) -> str:
+        if feedback:
+            feedback.pushInfo(f"Reading {self.path}")
+        output = QgsProcessingUtils.generateTempFilename(f"{os.path.splitext(os.path.basename(self.path))[0]}.vrt")
+        ds = gdal.Translate(
+            output,
+            self.path,
+            format="VRT",
+            projWin=[extent[0], extent[3], extent[2], extent[1]],
+            projWinSRS=crs,
+        )
+        if ds is None:
+            raise QgsProcessingException(f"Error reading {self.path}: {gdal.GetLastErrorMsg()}")
+        ds = None  # flush to disk
+        return output
+
+
+class LocalVectorSource(DataSource):
+    """Features of a local vector dataset such as a GeoPackage intersecting extent, copied to a
+    temporary GeoPackage in EPSG:4326"""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def fetch(self, extent: tuple, crs: str, feedback=None) -> str:
+        if feedback:
+            feedback.pushInfo(f"Reading {self.path}")
+        output = QgsProcessingUtils.generateTempFilename(f"{os.path.splitext(os.path.basename(self.path))[0]}.gpkg")
+        ds = gdal.VectorTranslate(
+            output,
+            self.path,
+            format="GPKG",
+            spatFilter=list(extent),
+            spatSRS=crs,
+            dstSRS="EPSG:4326",
+            geometryType="PROMOTE_TO_MULTI",
+        )
+        if ds is None:
+            raise QgsProcessingException(f"Error reading {self.path}: {gdal.GetLastErrorMsg()}")
+        ds = None  # flush to disk
+        return output
+
+
+def localDataPath(name: str) -> str:
+    """Path of dataset name in the local data folder setting, empty if not set"""
+    folder = getSetting("CNG_DATA_FOLDER")
+    return os.path.join(folder, LOCAL_DATA_FILES[name]) if folder else ""
+
+
+def getDataSource(name: str, remote: DataSource) -> DataSource:
+    """Local source of dataset name if the local data folder has it, remote otherwise"""
+    path = localDataPath(name)
+    if not path or not os.path.exists(path):
+        return remote
+    if os.path.splitext(path)[1].lower() in (".gpkg", ".shp", ".fgb"):
+        return LocalVectorSource(path)
+    return LocalRasterSource(path)
@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+
+"""
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+
+__author__ = "Abdul Raheem Siddiqui"
+__date__ = "2026-10-18"
+__copyright__ = "(C) 2026 by Abdul Raheem Siddiqui"
+
+# This will get replaced with a git SHA1 when you do a git archive
+
+__revision__ = "$Format:%H$"
+
+import hashlib
+import os
+import shutil
+import threading
+import time
+import uuid
+from urllib.parse import parse_qsl, urlparse
+
+# entries used this recently are never evicted as another run may be reading them
+MIN_ENTRY_AGE = 10 * 60  # seconds
+
+
+class DownloadCache:
+    """On-disk cache of WCS GetCoverage responses keyed by server, coverage, CRS, bbox and dimensions.
+
+    Entries are written to a unique temporary file and renamed into place, so several threads and
+    processes can share a cache folder. Once the folder grows over max_size bytes the least recently
+    used entries are evicted."""
+
+    def __init__(self, folder: str, max_size: int):
+        self.folder = folder
+        self.max_size = max_size
+        os.makedirs(self.folder, exist_ok=True)
+
+    @staticmethod
+    def key(request_URL: str) -> str:
+        """Cache key of a WCS GetCoverage request or an empty string if request_URL is not one"""
+        url = urlparse(request_URL)
+        query = {k.upper(): v for k, v in parse_qsl(url.query)}
+        if query.get("REQUEST", "").lower() != "getcoverage" or "BBOX" not in query:
+            return ""
+
+        # requests are snapped to the source grid, rounding only removes float noise
+        bbox = ",".join(f"{float(item):.6f}" for item in query["BBOX"].split(","))
+        parts = [
+            url.netloc,
+            query.get("COVERAGE", ""),
+            query.get("CRS", "").upper(),
+            query.get("RESPONSE_CRS", "").upper(),
+            bbox,
+            query.get("WIDTH", ""),
+            query.get("HEIGHT", ""),
+            query.get("FORMAT", ""),
+        ]
+        return hashlib.sha256("|".join(parts).encode("utf-8")).hexdigest()
+
+    def entryPath(self, key: str) -> str:
+        return os.path.join(self.folder, f"{key}.tif")
+
+    def get(self, request_URL: str) -> str:
+        """Path of the cached response of request_URL or an empty string on a miss"""
+        key = self.key(request_URL)
+        if not key:
+            return ""
+        path = self.entryPath(key)
+        try:
+            os.utime(path)  # mark as recently used
+        except OSError:
+            return ""
+        return path
+
+    def put(self, request_URL: str, file_path: str) -> str:
+        """Store a copy of file_path as the response of request_URL and return the cached path"""
+        key = self.key(request_URL)
+        if not key:
+            return file_path
+
+        path = self.entryPath(key)
+        temp_path = f"{path}.{uuid.uuid4().hex}.part"
+        try:
+            shutil.copyfile(file_path, temp_path)
+            os.replace(temp_path, path)
+        except OSError:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            return file_path
+
+        self.evict()
+        return path
+
+    def evict(self) -> None:
+        entries = []
+        for entry in os.scandir(self.folder):
+            try:
+                stat = entry.stat()
+            except OSError:  # removed by another process
+                continue
+            if entry.name.endswith(".part"):
+                # left behind by an interrupted download
+                if time.time() - stat.st_mtime > MIN_ENTRY_AGE:
+                    self.remove(entry.path)
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+        total_size = sum(entry[1] for entry in entries)
+        for mtime, size, path in sorted(entries):
+            if total_size <= self.max_size:
+                break
+            if time.time() - mtime < MIN_ENTRY_AGE:
+                break
+            if self.remove(path):
+                total_size -= size
+
+    @staticmethod
+    def remove(path: str) -> bool:
+        try:
+            os.remove(path)
+            return True
+        except OSError:  # removed by another process or still open on Windows
+            return False
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def getDownloadCache(folder: str, max_size_mb: int):
+    """Shared DownloadCache of this process or None if the cache is disabled"""
+    global _cache
+    if max_size_mb <= 0:
+        return None
+    with _cache_lock:
+        if _cache is None or _cache.folder != folder:
+            _cache = DownloadCache(folder, max_size_mb * 1024 * 1024)
+        _cache.max_size = max_size_mb * 1024 * 1024
+    return _cache
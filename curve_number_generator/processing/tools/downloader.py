@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+
+"""
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+
+__author__ = "Abdul Raheem Siddiqui"
+__date__ = "2026-10-18"
+__copyright__ = "(C) 2026 by Abdul Raheem Siddiqui"
+
+# This will get replaced with a git SHA1 when you do a git archive
+
+__revision__ = "$Format:%H$"
+
+
+import threading
+import time
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from curve_number_generator.processing.tools.instrumentation import addToStage
+
+CONNECT_TIMEOUT = 15  # seconds
+READ_TIMEOUT = 300  # seconds between bytes, WCS servers can take long to render a coverage
+RETRIES = 3
+BACKOFF_FACTOR = 2  # seconds, doubled on every retry
+RETRY_STATUS = (429, 500, 502, 503, 504)
+# connections kept open per host, enough for every concurrent download of a run
+POOL_SIZE = 8
+# a host that answered this recently is not pinged before a download
+HEALTHY_TTL = 60  # seconds
+# requests failing in a row, after their retries, before requests to the host fail fast
+FAILURE_THRESHOLD = 2
+OPEN_CIRCUIT_DURATION = 120  # seconds
+
+_sessions = {}
+_health = {}
+_sessions_lock = threading.Lock()
+
+
+class HostUnavailableError(requests.exceptions.ConnectionError):
+    """Raised without sending a request while the circuit breaker of a host is open"""
+
+
+class HostHealth:
+    """Recent health of an upstream host shared by every download of the process. After
+    FAILURE_THRESHOLD failed requests in a row the circuit opens and requests to the host fail
+    fast for OPEN_CIRCUIT_DURATION seconds, after which requests are let through again."""
+
+    def __init__(self, host: str):
+        self.host = host
+        self.last_success = 0.0
+        self.failures = 0
+        self.open_until = 0.0
+        self.lock = threading.Lock()
+
+    def isHealthy(self) -> bool:
+        return time.time() - self.last_success < HEALTHY_TTL
+
+    def check(self) -> None:
+        remaining = self.open_until - time.time()
+        if remaining > 0:
+            raise HostUnavailableError(
+                f"{self.host} failed to respond to the last {self.failures} requests, not retrying for {int(remaining) + 1} seconds."
+            )
+
+    def succeeded(self) -> None:
+        with self.lock:
+            self.last_success = time.time()
+            self.failures = 0
+            self.open_until = 0.0
+
+    def failed(self) -> None:
+        with self.lock:
+            self.last_success = 0.0
+            self.failures += 1
+            if self.failures >= FAILURE_THRESHOLD:
+                self.open_until = time.time() + OPEN_CIRCUIT_DURATION
+
+
+def hostOf(url: str) -> str:
+    url = urlparse(url)
+    return f"{url.scheme}://{url.netloc}"
+
+
+def getHostHealth(url: str) -> HostHealth:
+    host = hostOf(url)
+    with _sessions_lock:
+        if host not in _health:
+            _health[host] = HostHealth(host)
+        return _health[host]
+
+
+def isHealthy(url: str) -> bool:
+    """Whether the host of url answered a request in the last HEALTHY_TTL seconds"""
+    return getHostHealth(url).isHealthy()
+
+
+def createRetry() -> Retry:
+    kwargs = dict(
+        total=RETRIES,
+        backoff_factor=BACKOFF_FACTOR,
+        status_forcelist=RETRY_STATUS,
+        raise_on_status=False,
+    )
+    # all requests of the plugin are reads, so POST requests to SDA are retried as well
+    try:
+        return Retry(allowed_methods=None, **kwargs)
+    except TypeError:  # urllib3 < 1.26
+        return Retry(method_whitelist=False, **kwargs)
+
+
+def getSession(url: str) -> requests.Session:
+    """Shared session of the host of url. Sessions keep a pool of open connections and retry failed
+    requests with exponential backoff. They are safe to use from the worker threads of runConcurrently."""
+    host = hostOf(url)
+    with _sessions_lock:
+        session = _sessions.get(host)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE, max_retries=createRetry())
+            session.mount(host, adapter)
+            _sessions[host] = session
+    return session
+
+
+def request(method: str, url: str, **kwargs) -> requests.Response:
+    """Send a request through the shared session of the host with the default timeouts and
+    record the outcome in the health of the host"""
+    health = getHostHealth(url)
+    health.check()
+    kwargs.setdefault("timeout", (CONNECT_TIMEOUT, READ_TIMEOUT))
+    try:
+        response = getSession(url).request(method, url, **kwargs)
+    except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+        health.failed()
+        raise
+    if response.status_code >= 500:
+        health.failed()
+    else:
+        health.succeeded()
+    return response
+
+
+def download(method: str, url: str, output: str, feedback=None, **kwargs) -> str:
+    """Stream the response body of a request to output and return its Content-Type.
+    Connections dropped in the middle of the body are retried from the start."""
+    for attempt in range(RETRIES + 1):
+        with request(method, url, stream=True, **kwargs) as r:
+            r.raise_for_status()
+            try:
+                with open(output, "wb") as f:
+                    for chunk in r.iter_content(chunk_size=1024 * 1024):
+                        if feedback and feedback.isCanceled():
+                            break
+                        f.write(chunk)
+                    addToStage("bytes", f.tell())
+            except (requests.exceptions.ChunkedEncodingError, requests.exceptions.ConnectionError):
+                if attempt == RETRIES:
+                    raise
+                time.sleep(BACKOFF_FACTOR * 2**attempt)
+                continue
+            return r.headers.get("Content-Type", "")
@@ -0,0 +1,282 @@
+# -*- coding: utf-8 -*-
+
+"""
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+
+__author__ = "Abdul Raheem Siddiqui"
+__date__ = "2026-10-18"
+__copyright__ = "(C) 2026 by Abdul Raheem Siddiqui"
+
+# This will get replaced with a git SHA1 when you do a git archive
+
+__revision__ = "$Format:%H$"
+
+
+import inspect
+import json
+import os
+import sys
+import threading
+import time
+import weakref
+from functools import wraps
+
+from qgis.core import QgsProcessingUtils, QgsRasterLayer, QgsVectorLayer
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# guards the stages of reports shared with worker threads, see withReports
+_lock = threading.Lock()
+# reports recording the stages of each thread and the stages being recorded, innermost last
+_local = threading.local()
+
+
+def _windowsMemoryCounters():
+    import ctypes
+    from ctypes import wintypes
+
+    class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+        _fields_ = [
+            ("cb", wintypes.DWORD),
+            ("PageFaultCount", wintypes.DWORD),
+            ("PeakWorkingSetSize", ctypes.c_size_t),
+            ("WorkingSetSize", ctypes.c_size_t),
+            ("QuotaPeakPagedPoolUsage", ctypes.c_size_t),
+            ("QuotaPagedPoolUsage", ctypes.c_size_t),
+            ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+            ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+            ("PagefileUsage", ctypes.c_size_t),
+            ("PeakPagefileUsage", ctypes.c_size_t),
+        ]
+
+    counters = PROCESS_MEMORY_COUNTERS()
+    counters.cb = ctypes.sizeof(counters)
+    ctypes.windll.psapi.GetProcessMemoryInfo(
+        ctypes.windll.kernel32.GetCurrentProcess(), ctypes.byref(counters), counters.cb
+    )
+    return counters
+
+
+def peakMemoryMb(children: bool = False) -> float:
+    """Peak resident memory of this process since it started, or of its largest finished subprocess such
+    as a GDAL command line tool, in MB. It only ever grows, see currentMemoryMb for the memory of a stage.
+    0 if unknown."""
+    if resource:
+        usage = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF).ru_maxrss
+        # kilobytes on Linux, bytes on macOS
+        return usage / 1024 / 1024 if sys.platform == "darwin" else usage / 1024
+    if children:
+        return 0.0
+    try:
+        return _windowsMemoryCounters().PeakWorkingSetSize / 1024 / 1024
+    except Exception:
+        return 0.0
+
+
+def currentMemoryMb():
+    """Current resident memory of this process in MB, None if unknown"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024 / 1024
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+    try:
+        import psutil
+
+        return psutil.Process().memory_info().rss / 1024 / 1024
+    except Exception:
+        pass
+    if sys.platform == "win32":
+        try:
+            return _windowsMemoryCounters().WorkingSetSize / 1024 / 1024
+        except Exception:
+            pass
+    return None
+
+
+def roundMb(value):
+    return None if value is None else round(value, 1)
+
+
+def countOf(value, context=None):
+    """Feature count of a vector or pixel count of a raster given as a layer, a layer source or a list
+    of these, None if unknown. Sources are only counted if their layer is already loaded in the processing
+    context, so counting never opens a layer."""
+    if isinstance(value, (list, tuple)):
+        counts = [countOf(item, context) for item in value]
+        return None if None in counts else sum(counts)
+    layer = value
+    if isinstance(value, str):
+        if context is None:
+            return None
+        layer = QgsProcessingUtils.mapLayerFromString(value, context, allowLoadingNewLayers=False)
+    if isinstance(layer, QgsVectorLayer):
+        return layer.featureCount()
+    if isinstance(layer, QgsRasterLayer):
+        return layer.width() * layer.height()
+    return None
+
+
+class StageReport:
+    """Records the stages of an algorithm run, see instrumented. A report records the stages of the thread
+    that started it and of the worker threads it is handed to with withReports, so concurrent runs do not
+    record each other's stages. A report only records while it is referenced, so a run that fails or is
+    canceled before finish does not leave it recording."""
+
+    def __init__(self, nested: bool = False):
+        self.started = time.perf_counter()
+        self.rss_start_mb = currentMemoryMb()
+        # ru_maxrss of the subprocesses is the largest one since the process started
+        self.child_peak_start_mb = peakMemoryMb(children=True)
+        self.stages = []
+        # started while another report of this thread runs, e.g. for a tile of a tiled run
+        self.nested = nested
+
+    @classmethod
+    def start(cls):
+        if getattr(_local, "reports", None) is None:
+            _local.reports = weakref.WeakSet()
+        report = cls(nested=bool(_local.reports))
+        with _lock:
+            _local.reports.add(report)
+        return report
+
+    def finish(self, feedback=None) -> str:
+        """Stop recording, log a summary to feedback unless nested and return the report as JSON"""
+        with _lock:
+            _local.reports.discard(self)
+        if feedback and not self.nested:
+            feedback.pushInfo(self.summary())
+        return json.dumps(self.asDict())
+
+    def totals(self) -> dict:
+        totals = {}
+        for stage in self.stages:
+            total = totals.setdefault(stage["stage"], {"calls": 0, "seconds": 0.0, "bytes": 0})
+            total["calls"] += 1
+            total["seconds"] += stage["seconds"]
+            total["bytes"] += stage.get("bytes") or 0
+        return totals
+
+    def largestSubprocessMb(self):
+        """Peak memory of the largest subprocess of this run, None unless it is larger than every
+        subprocess the process ran before"""
+        peak = peakMemoryMb(children=True)
+        return peak if peak > self.child_peak_start_mb else None
+
+    def asDict(self) -> dict:
+        return {
+            "seconds": round(time.perf_counter() - self.started, 3),
+            "rss_start_mb": roundMb(self.rss_start_mb),
+            "rss_end_mb": roundMb(currentMemoryMb()),
+            "process_peak_rss_mb": round(peakMemoryMb(), 1),
+            "largest_subprocess_rss_mb": roundMb(self.largestSubprocessMb()),
+            "totals": self.totals(),
+            "stages": self.stages,
+        }
+
+    def summary(self) -> str:
+        lines = ["Stage report:"]
+        for name, total in sorted(self.totals().items(), key=lambda item: -item[1]["seconds"]):
+            line = f"  {name:<20}{total['calls']:>4} call(s){total['seconds']:>10.2f} s"
+            if total["bytes"]:
+                line += f"{total['bytes'] / 1024 / 1024:>10.1f} MB downloaded"
+            lines.append(line)
+        line = f"  Total {time.perf_counter() - self.started:.2f} s"
+        rss_end = currentMemoryMb()
+        if self.rss_start_mb is not None and rss_end is not None:
+            line += f", memory {self.rss_start_mb:.0f} MB at start and {rss_end:.0f} MB at end"
+        line += f", process peak {peakMemoryMb():.0f} MB"
+        largest_subprocess = self.largestSubprocessMb()
+        if largest_subprocess:
+            line += f", largest subprocess {largest_subprocess:.0f} MB"
+        lines.append(line)
+        return "\n".join(lines)
+
+
+def currentReports():
+    """Reports recording the stages of this thread, None if there are none"""
+    return getattr(_local, "reports", None) or None
+
+
+def record(stage: dict, reports) -> None:
+    with _lock:
+        for report in list(reports):
+            report.stages.append(stage)
+
+
+def withReports(func):
+    """func recording its stages in the reports of the calling thread when it runs in a worker thread,
+    e.g. a task submitted to a thread pool"""
+    reports = currentReports()
+    if reports is None:
+        return func
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        previous = getattr(_local, "reports", None)
+        _local.reports = reports
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _local.reports = previous
+
+    return wrapper
+
+
+def addToStage(key: str, amount) -> None:
+    """Add amount to key of the innermost stage recorded by this thread, e.g. the downloaded bytes"""
+    stages = getattr(_local, "stages", None)
+    if stages:
+        stages[-1][key] = stages[-1].get(key, 0) + amount
+
+
+def instrumented(input_arg: str = "input"):
+    """Record the duration, the input and output feature or pixel counts, the resident memory at the end
+    of the call and its change during the call, and the values added with addToStage of every call of the decorated function in the reports of the
+    algorithm runs of this thread. Counts are only taken for calls given a processing context."""
+
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            reports = currentReports()
+            if reports is None:
+                return func(*args, **kwargs)
+
+            arguments = signature.bind(*args, **kwargs).arguments
+            context = arguments.get("context")
+            stage = {"stage": func.__name__, "input_count": countOf(arguments.get(input_arg), context)}
+            if not hasattr(_local, "stages"):
+                _local.stages = []
+            _local.stages.append(stage)
+            rss_start = currentMemoryMb()
+            start = time.perf_counter()
+            try:
+                result = func(*args, **kwargs)
+            finally:
+                stage["seconds"] = round(time.perf_counter() - start, 3)
+                rss_end = currentMemoryMb()
+                stage["rss_mb"] = roundMb(rss_end)
+                if rss_start is not None and rss_end is not None:
+                    stage["rss_delta_mb"] = roundMb(rss_end - rss_start)
+                _local.stages.pop()
+                record(stage, reports)
+            stage["output_count"] = countOf(result, context)
+            return result
+
+        return wrapper
+
+    return decorator
@@ -1,5 +1,4 @@
 from qgis.core import QgsProcessingLayerPostProcessorInterface
-from qgis.utils import iface
 
 
 class LayerPostProcessor(QgsProcessingLayerPostProcessorInterface):
@@ -8,6 +7,8 @@ class LayerPostProcessor(QgsProcessingLayerPostProcessorInterface):
         self.style_file = style_file
 
     def postProcessLayer(self, layer, context, feedback):
+        from qgis.utils import iface
+
         if layer.isValid():
             layer.loadNamedStyle(self.style_file)
             iface.layerTreeView().refreshLayerSymbology(layer.id())
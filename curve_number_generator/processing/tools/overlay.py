@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+
+"""
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+
+__author__ = "Abdul Raheem Siddiqui"
+__date__ = "2026-10-18"
+__copyright__ = "(C) 2026 by Abdul Raheem Siddiqui"
+
+# This will get replaced with a git SHA1 when you do a git archive
+
+__revision__ = "$Format:%H$"
+
+
+from qgis.core import (
+    QgsCoordinateReferenceSystem,
+    QgsCoordinateTransformContext,
+    QgsFeatureRequest,
+    QgsGeometry,
+    QgsSpatialIndex,
+    QgsVectorLayer,
+    QgsWkbTypes,
+)
+
+
+class LandCoverOverlay:
+    """Intersect few large soil polygons with many small land cover polygons such as the ones
+    produced by polygonizing a land cover raster.
+
+    The land cover polygons are bulk loaded (STR packed) into a spatial index that also stores their
+    geometries, each soil geometry is prepared once and land cover polygons that are wholly inside a
+    soil polygon are returned as is without clipping.
+
+    If crs is given the land cover polygons are transformed to it, it must be the CRS of the soil geometries."""
+
+    def __init__(
+        self,
+        lc_layer: QgsVectorLayer,
+        lc_field_index: int,
+        feedback=None,
+        crs: QgsCoordinateReferenceSystem = None,
+        transform_context: QgsCoordinateTransformContext = None,
+    ):
+        self.lc_values = {
+            feat.id(): feat.attribute(lc_field_index)
+            for feat in lc_layer.getFeatures(
+                QgsFeatureRequest().setFlags(QgsFeatureRequest.NoGeometry).setSubsetOfAttributes([lc_field_index])
+            )
+        }
+        request = QgsFeatureRequest().setNoAttributes()
+        if crs is not None and crs != lc_layer.crs():
+            request.setDestinationCrs(crs, transform_context or QgsCoordinateTransformContext())
+        self.index = QgsSpatialIndex(
+            lc_layer.getFeatures(request),
+            feedback,
+            QgsSpatialIndex.FlagStoreFeatureGeometries,
+        )
+
+    def intersect(self, soil_geom: QgsGeometry):
+        """Yield (land cover value, polygon geometry) for every land cover polygon intersecting soil_geom"""
+
+        candidates = self.index.intersects(soil_geom.boundingBox())
+        if not candidates:
+            return
+
+        engine = QgsGeometry.createGeometryEngine(soil_geom.constGet())
+        engine.prepareGeometry()
+
+        for fid in candidates:
+            lc_geom = self.index.geometry(fid)
+            if engine.contains(lc_geom.constGet()):
+                geom = QgsGeometry(lc_geom)
+            elif engine.intersects(lc_geom.constGet()):
+                geom = QgsGeometry(engine.intersection(lc_geom.constGet()))
+                if geom.isEmpty():
+                    continue
+                if QgsWkbTypes.geometryType(geom.wkbType()) != QgsWkbTypes.PolygonGeometry:
+                    if not geom.convertGeometryCollectionToSubclass(QgsWkbTypes.PolygonGeometry):
+                        continue
+            else:
+                continue
+
+            geom.convertToMultiType()
+            yield self.lc_values[fid], geom
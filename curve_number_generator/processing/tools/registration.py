@@ -14,7 +14,7 @@ from qgis.PyQt.QtGui import QFont
 from qgis.PyQt.QtWidgets import *
 from qgis.utils import iface
 
-from curve_number_generator.processing.config import LIST_OF_COUNTRIES
+from curve_number_generator.processing.tools.countries import LIST_OF_COUNTRIES
 from curve_number_generator.processing.tools.utils import (
     displayMessageWidget,
     getMessageWidget,
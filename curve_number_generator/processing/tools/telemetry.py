@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+
+"""
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+
+__author__ = "Abdul Raheem Siddiqui"
+__date__ = "2026-10-18"
+__copyright__ = "(C) 2026 by Abdul Raheem Siddiqui"
+
+# This will get replaced with a git SHA1 when you do a git archive
+
+__revision__ = "$Format:%H$"
+
+import glob
+import json
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+POST_TIMEOUT = 5  # seconds
+MAX_CONCURRENT_POSTS = 2
+# the oldest records are dropped past this spool size, e.g. on a node that is never online
+MAX_SPOOL_SIZE = 5 * 1024 * 1024  # bytes
+# no flush is attempted for this long after a flush failed
+RETRY_DURATION = 60 * 60  # seconds
+# batches claimed by a process this long ago are considered abandoned and sent again
+ABANDONED_BATCH_AGE = 60 * 60  # seconds
+
+_lock = threading.Lock()
+_flush = None  # thread of the running flush
+
+
+class TelemetrySpool:
+    """Records waiting to be posted, one JSON object per line of an append only file.
+
+    A flush claims the records by renaming the spool to a unique batch file, so several threads and
+    processes can share a spool without posting a record twice. Records that could not be posted are
+    appended back to the spool."""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    @property
+    def failed_marker(self) -> str:
+        return self.path + ".failed"
+
+    def append(self, records: list) -> None:
+        with _lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.writelines(json.dumps(record) + "\n" for record in records)
+            if os.path.getsize(self.path) > MAX_SPOOL_SIZE:
+                self.trim()
+
+    def trim(self) -> None:
+        with open(self.path, "r", encoding="utf-8") as f:
+            lines = f.readlines()
+        temp = f"{self.path}.{uuid.uuid4().hex}.tmp"
+        with open(temp, "w", encoding="utf-8") as f:
+            f.writelines(lines[len(lines) // 2 :])
+        os.replace(temp, self.path)
+
+    def isEmpty(self) -> bool:
+        return not os.path.exists(self.path) and not self.abandonedBatches()
+
+    def hasFailedRecently(self) -> bool:
+        try:
+            return time.time() - os.path.getmtime(self.failed_marker) < RETRY_DURATION
+        except OSError:
+            return False
+
+    def abandonedBatches(self) -> list:
+        now = time.time()
+        batches = []
+        for batch in glob.glob(glob.escape(self.path) + ".*.batch"):
+            try:
+                if now - os.path.getmtime(batch) > ABANDONED_BATCH_AGE:
+                    batches.append(batch)
+            except OSError:
+                pass
+        return batches
+
+    def claim(self) -> list:
+        """Take the spooled records, as a list of batch files only this caller will read"""
+        claimed = []
+        for source in [self.path] + self.abandonedBatches():
+            batch = f"{self.path}.{uuid.uuid4().hex}.batch"
+            try:
+                os.replace(source, batch)
+                os.utime(batch)
+            except OSError:  # nothing spooled or claimed by someone else
+                continue
+            claimed.append(batch)
+        return claimed
+
+    def flush(self, post, max_workers: int = MAX_CONCURRENT_POSTS) -> bool:
+        """Post the spooled records with post(record), at most max_workers at once. After the first
+        failure the remaining records are spooled again without trying them. True if all were posted."""
+        records = []
+        batches = self.claim()
+        for batch in batches:
+            with open(batch, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        records.append(json.loads(line))
+                    except ValueError:  # a line cut short by a crash
+                        pass
+
+        failed = threading.Event()
+
+        def send(record) -> bool:
+            if failed.is_set():
+                return False
+            try:
+                post(record)
+                return True
+            except Exception:
+                failed.set()
+                return False
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            sent = list(executor.map(send, records))
+
+        unsent = [record for record, ok in zip(records, sent) if not ok]
+        if unsent:
+            self.append(unsent)
+            with open(self.failed_marker, "w"):
+                pass
+        for batch in batches:
+            os.remove(batch)
+        return not unsent
+
+
+def postForm(url: str):
+    """post(record) function submitting records to a form at url over one pooled session"""
+    import requests
+
+    session = requests.Session()
+
+    def post(record: dict) -> None:
+        session.post(url, data=record, timeout=POST_TIMEOUT).raise_for_status()
+
+    return post
+
+
+def flushInBackground(spool: TelemetrySpool, url: str) -> threading.Thread:
+    """Flush spool to the form at url in a daemon thread, unless a flush is running or the last one
+    failed recently. Records still spooled when the process exits are sent by a later run."""
+    global _flush
+    with _lock:
+        if _flush is not None and _flush.is_alive():
+            return _flush
+        if spool.isEmpty() or spool.hasFailedRecently():
+            return None
+        _flush = threading.Thread(
+            target=lambda: spool.flush(postForm(url)), name="cng-telemetry-flush", daemon=True
+        )
+        _flush.start()
+        return _flush
@@ -1,10 +1,14 @@
+import codecs
+import json
+import math
 import os
-import pickle
+import threading
 import time
-import xml.etree.ElementTree as ET
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from functools import partial
 
 import processing
-import requests
+from osgeo import gdal
 from qgis.core import (
     Qgis,
     QgsApplication,
@@ -15,37 +19,136 @@ from qgis.core import (
     QgsGeometry,
     QgsProcessing,
     QgsProcessingException,
+    QgsProcessingUtils,
     QgsProject,
+    QgsRasterFileWriter,
+    QgsTask,
     QgsVectorLayer,
 )
-from qgis.PyQt.QtWidgets import QPushButton
-from qgis.utils import iface
 
 from curve_number_generator.processing.config import (
+    COG_CREATION_OPTIONS,
     MESSAGE_URL,
+    PERFORMANCE_PROFILES,
     PLUGIN_VERSION,
     PROFILE_DICT,
+    SETTINGS,
+    TEMP_GTIFF_CREATION_OPTIONS,
+    WCS_MAX_CONCURRENT_REQUESTS,
+    WCS_MAX_SIZE,
 )
+from curve_number_generator.processing.tools.download_cache import getDownloadCache
+from curve_number_generator.processing.tools.instrumentation import instrumented, withReports
 
-qgis_settings_path = QgsApplication.qgisSettingsDirPath().replace("\\", "/")
-cn_log_path = os.path.join(qgis_settings_path, "curve_number_generator.log")
-cn_pickle_path = os.path.join(qgis_settings_path, "curve_number_generator.p")
-cn_msg_path = os.path.join(qgis_settings_path, "curve_number_generator_msg.html")
+# plugin files in the QGIS settings folder, see settingsFilePath
+cn_log_file = "curve_number_generator.log"
+cn_pickle_file = "curve_number_generator.p"
+cn_msg_file = "curve_number_generator_msg.html"
 cn_msg_cache_duration = 24 * 60 * 60  # 24 hours in seconds
+cn_msg_failed_file = "curve_number_generator_msg.failed"  # touched when a refresh fails
+cn_msg_retry_duration = 60 * 60  # 1 hour in seconds, no refresh is attempted after a failure meanwhile
+cn_version_file = "curve_number_generator_version.txt"  # latest version available in the plugin repository
+cn_version_cache_duration = 24 * 60 * 60  # 24 hours in seconds
+cn_download_cache_file = "curve_number_generator_cache"
+cn_telemetry_file = "curve_number_generator_telemetry.jsonl"  # spool of the runs to report, see telemetry
+cn_ssurgo_store_file = "curve_number_generator_ssurgo.sqlite"
+
+
+def settingsFilePath(file_name: str) -> str:
+    """Path of a plugin file in the QGIS settings folder. Resolved on use rather than on import,
+    plugin modules are imported before the settings folder is needed or even known."""
+    return os.path.join(QgsApplication.qgisSettingsDirPath().replace("\\", "/"), file_name)
+
+
+def getSetting(name: str):
+    """Value of a plugin setting, see config.SETTINGS. An environment variable with the same name takes precedence."""
+    default = SETTINGS[name][1]
+    value = os.environ.get(name, None)
+    if value is None:
+        try:
+            from processing.core.ProcessingConfig import ProcessingConfig
+
+            value = ProcessingConfig.getSetting(name)
+        except ImportError:
+            pass
+
+    if value is None or value == "":
+        return default
+    if isinstance(default, bool):
+        return str(value).lower() in ("1", "true", "yes")
+    try:
+        return type(default)(value)
+    except ValueError:
+        return default
+
+
+def performanceProfile() -> dict:
+    """GDAL tuning of the CNG_PERFORMANCE_PROFILE setting, see config.PERFORMANCE_PROFILES, with the
+    individual CNG_GDAL_* settings taking precedence"""
+    profile = dict(
+        PERFORMANCE_PROFILES.get(getSetting("CNG_PERFORMANCE_PROFILE").strip().lower(), PERFORMANCE_PROFILES["default"])
+    )
+    for key, name in (
+        ("threads", "CNG_GDAL_NUM_THREADS"),
+        ("cache_mb", "CNG_GDAL_CACHEMAX_MB"),
+        ("warp_memory_mb", "CNG_GDAL_WARP_MEMORY_MB"),
+        ("vsi_cache_mb", "CNG_GDAL_VSI_CACHE_MB"),
+    ):
+        if getSetting(name) > 0:
+            profile[key] = getSetting(name)
+    return profile
+
+
+def gdalConfigOptions(profile: dict = None) -> dict:
+    """GDAL configuration options of a performance profile, the current one by default"""
+    profile = profile or performanceProfile()
+    vsi_cache_bytes = str(profile["vsi_cache_mb"] * 1024 * 1024)
+    return {
+        "GDAL_NUM_THREADS": str(profile["threads"] or "ALL_CPUS"),
+        "GDAL_CACHEMAX": str(profile["cache_mb"]),  # MB
+        # cache of the blocks of remote files, so overlapping reads of a /vsicurl/ file are fetched once
+        "VSI_CACHE": "TRUE",
+        "VSI_CACHE_SIZE": vsi_cache_bytes,
+        "CPL_VSIL_CURL_CACHE_SIZE": vsi_cache_bytes,
+        # no directory listing of the remote folder before opening a file
+        "GDAL_DISABLE_READDIR_ON_OPEN": "EMPTY_DIR",
+        "GDAL_HTTP_MULTIPLEX": "YES",
+        "GDAL_HTTP_MERGE_CONSECUTIVE_RANGES": "YES",
+    }
+
+
+def gdalConfigArgs(profile: dict = None) -> str:
+    """GDAL configuration options of a performance profile as command line arguments, for the EXTRA
+    parameter of the GDAL Processing algorithms which run the GDAL utilities in a subprocess"""
+    return " ".join(f"--config {key} {value}" for key, value in gdalConfigOptions(profile).items())
+
+
+def gdalWarpArgs(profile: dict = None) -> str:
+    """Warp memory and warp threads of a performance profile as gdalwarp arguments"""
+    profile = profile or performanceProfile()
+    return f"-wm {profile['warp_memory_mb']} -wo NUM_THREADS={profile['threads'] or 'ALL_CPUS'}"
 
 
 def fetchMessage(url, timeout=2) -> str:
+    import requests
+
     response = requests.get(url, timeout=timeout)
     response.raise_for_status()
     return response.text
 
 
 def saveToCache(message):
-    with open(cn_msg_path, "w") as file:
+    cn_msg_path = settingsFilePath(cn_msg_file)
+
+    # replaced at once so that a help panel rendering meanwhile never reads half a message
+    with open(cn_msg_path + ".tmp", "w") as file:
         file.write(message)
+    os.replace(cn_msg_path + ".tmp", cn_msg_path)
 
 
 def isCacheValid():
+    cn_msg_path = settingsFilePath(cn_msg_file)
+
     if os.path.exists(cn_msg_path):
         file_timestamp = os.path.getmtime(cn_msg_path)
         if time.time() - file_timestamp < cn_msg_cache_duration:
@@ -53,25 +156,62 @@ def isCacheValid():
     return False
 
 
+def hasRefreshFailedRecently() -> bool:
+    cn_msg_failed_path = settingsFilePath(cn_msg_failed_file)
+
+    if os.path.exists(cn_msg_failed_path):
+        return time.time() - os.path.getmtime(cn_msg_failed_path) < cn_msg_retry_duration
+    return False
+
+
 def loadMessageFromCache():
-    if isCacheValid():
+    """Cached message, even if it is stale, or an empty string"""
+    cn_msg_path = settingsFilePath(cn_msg_file)
+
+    try:
         with open(cn_msg_path, "r") as file:
-            text = file.read()
-            return text
-    return ""
+            return file.read()
+    except OSError:
+        return ""
 
 
-def getAndUpdateMessage():
-    cached_message = loadMessageFromCache()
-    if cached_message:
-        return cached_message
+_message_refresh = None  # thread of the running refresh
+_message_refresh_lock = threading.Lock()
+
+
+def refreshMessage(url=MESSAGE_URL, timeout=10) -> None:
+    """Fetch the message and cache it, a failure is remembered for cn_msg_retry_duration"""
+    try:
+        saveToCache(fetchMessage(url, timeout))
+    except Exception:
+        with open(settingsFilePath(cn_msg_failed_file), "w"):
+            pass
+
 
-    fetched_message = fetchMessage(MESSAGE_URL)
-    saveToCache(fetched_message)
-    return fetched_message
+def refreshMessageInBackground() -> threading.Thread:
+    """Start refreshing the cached message in a daemon thread unless a refresh is running"""
+    global _message_refresh
+    with _message_refresh_lock:
+        if _message_refresh is None or not _message_refresh.is_alive():
+            _message_refresh = threading.Thread(target=refreshMessage, name="cng-message-refresh", daemon=True)
+            _message_refresh.start()
+        return _message_refresh
+
+
+def getAndUpdateMessage():
+    """Cached message, possibly stale, and never waiting on the network. A stale or missing message
+    is refreshed in the background for the next time, unless the last refresh failed recently."""
+    if not isCacheValid() and not hasRefreshFailedRecently():
+        refreshMessageInBackground()
+    return loadMessageFromCache()
 
 
 def incrementUsageCounter() -> int:
+    import pickle
+
+    cn_log_path = settingsFilePath(cn_log_file)
+    cn_pickle_path = settingsFilePath(cn_pickle_file)
+
     # log usage
 
     if os.path.exists(cn_log_path):  # old cn_log file exist # to be deleted in version 4.0.0
@@ -113,6 +253,10 @@ def incrementUsageCounter() -> int:
 
 
 def getRegistrationStatus() -> bool:
+    import pickle
+
+    cn_pickle_path = settingsFilePath(cn_pickle_file)
+
     with open(cn_pickle_path, "rb") as f:
         # Reading from json file
         profile_data = pickle.load(f)
@@ -120,6 +264,10 @@ def getRegistrationStatus() -> bool:
 
 
 def setRegistrationTrue() -> None:
+    import pickle
+
+    cn_pickle_path = settingsFilePath(cn_pickle_file)
+
     with open(cn_pickle_path, "rb") as f:
         # Reading from json file
         profile_data = pickle.load(f)
@@ -184,34 +332,89 @@ def displayUsageMessage(counter):
     displayMessageWidget(widget)
 
 
-def checkPluginUptodate(plugin_name: str):
-    # check if new version is available of the plugin
-    avail_version = checkAvailPluginVersion(plugin_name)
-    version_comp = zip(avail_version.split("."), PLUGIN_VERSION.split("."))
-    for level in version_comp:
+_version_check = None  # QgsTask of the running version check, referenced until it finishes
+
+
+def isNewerVersion(version: str, than: str = PLUGIN_VERSION) -> bool:
+    for level in zip(version.split("."), than.split(".")):
         if int(level[0]) > int(level[1]):
-            widget = getMessageWidget("Newer version of the plugin is available.", "Upgrade", installPlugin)
-            displayMessageWidget(widget)
-            return
+            return True
         elif int(level[0]) < int(level[1]):
-            break
+            return False
+    return False
+
+
+def notifyIfOutdated(avail_version: str) -> None:
+    from qgis.utils import iface
+
+    if avail_version and iface and isNewerVersion(avail_version):
+        widget = getMessageWidget("Newer version of the plugin is available.", "Upgrade", installPlugin)
+        displayMessageWidget(widget)
+
+
+def loadCachedPluginVersion():
+    """Available version cached less than a day ago, "" if the plugin was not listed, None if unknown"""
+    cn_version_path = settingsFilePath(cn_version_file)
+
+    try:
+        if time.time() - os.path.getmtime(cn_version_path) < cn_version_cache_duration:
+            with open(cn_version_path, "r") as file:
+                return file.read().strip()
+    except OSError:
+        pass
+    return None
+
 
+def checkPluginUptodate(plugin_name: str):
+    """Notify the user if a newer version of the plugin is available. The plugin repository is asked
+    at most once a day, in a background task, so this returns right away."""
+    global _version_check
+
+    avail_version = loadCachedPluginVersion()
+    if avail_version is not None:
+        notifyIfOutdated(avail_version)
+        return
+    if _version_check is not None:
+        return
+
+    def check(task):
+        version = checkAvailPluginVersion(plugin_name) or ""
+        with open(settingsFilePath(cn_version_file), "w") as file:
+            file.write(version)
+        return version
+
+    def finished(exception, version=None):
+        global _version_check
+        _version_check = None
+        if exception is None:
+            notifyIfOutdated(version)
+
+    _version_check = QgsTask.fromFunction("Check for Curve Number Generator updates", check, on_finished=finished)
+    QgsApplication.taskManager().addTask(_version_check)
+
+
+def checkAvailPluginVersion(plugin_name: str, timeout: int = 10) -> str:
+    """Latest non experimental version of plugin_name in the QGIS plugin repository, None if not listed.
+    The catalogue is parsed as it streams in and the download stops at the plugin."""
+    import xml.etree.ElementTree as ET
+
+    import requests
 
-def checkAvailPluginVersion(plugin_name: str) -> str:
     qgis_version = Qgis.QGIS_VERSION.replace("-", ".").split(".")
     qgis_version = qgis_version[0] + "." + qgis_version[1]
 
-    r = requests.get(f"https://plugins.qgis.org/plugins/plugins.xml?qgis={qgis_version}")
-
-    xml_str = r.text
-    root = ET.fromstring(xml_str)
+    with requests.get(
+        f"https://plugins.qgis.org/plugins/plugins.xml?qgis={qgis_version}", stream=True, timeout=timeout
+    ) as r:
+        r.raise_for_status()
+        r.raw.decode_content = True  # the catalogue is served gzipped
 
-    for plugin in root.findall("pyqgis_plugin"):
-        name = plugin.get("name")
-        if name == plugin_name:
-            experimental = plugin.find("experimental").text
-            if experimental == "False":
-                return plugin.find("version").text
+        for _, plugin in ET.iterparse(r.raw):
+            if plugin.tag != "pyqgis_plugin":
+                continue
+            if plugin.get("name") == plugin_name and plugin.findtext("experimental") == "False":
+                return plugin.findtext("version")
+            plugin.clear()  # keep memory flat over the whole catalogue
 
 
 def installPlugin():
@@ -222,6 +425,8 @@ def installPlugin():
 
 
 def getMessageWidget(message, button_text="", button_func=None):
+    from qgis.PyQt.QtWidgets import QPushButton
+    from qgis.utils import iface
 
     widget = iface.messageBar().createMessage("Curve Number Generator", message)
     if button_text and button_func:
@@ -234,6 +439,8 @@ def getMessageWidget(message, button_text="", button_func=None):
 
 
 def displayMessageWidget(widget, level: int = 0, duration: int = 10):
+    from qgis.utils import iface
+
     iface.messageBar().pushWidget(widget, level=level, duration=duration)
 
 
@@ -286,26 +493,210 @@ def createRequestBBOXDim(extent: tuple, cell_size: int) -> tuple:
     return BBOX_width_int, BBOX_height_int
 
 
-def downloadFile(request_URL, ping_URL="", error_message="", context=None, feedback=None):
+def snapExtentToGrid(extent: tuple, cell_size: float, origin: tuple = (0, 0)) -> tuple:
+    """Grow extent outward to the nearest cell edges of the grid defined by origin and cell_size"""
+    x0, y0 = origin
+    xmin = x0 + math.floor(round((extent[0] - x0) / cell_size, 6)) * cell_size
+    ymin = y0 + math.floor(round((extent[1] - y0) / cell_size, 6)) * cell_size
+    xmax = x0 + math.ceil(round((extent[2] - x0) / cell_size, 6)) * cell_size
+    ymax = y0 + math.ceil(round((extent[3] - y0) / cell_size, 6)) * cell_size
+    return xmin, ymin, xmax, ymax
+
+
+def splitExtent(extent: tuple, tile_size: float) -> list:
+    """Split extent into tiles of tile_size x tile_size, the last row and column of tiles are clipped to extent"""
+    columns = math.ceil(round((extent[2] - extent[0]) / tile_size, 6))
+    rows = math.ceil(round((extent[3] - extent[1]) / tile_size, 6))
+    tiles = []
+    for row in range(rows):
+        for column in range(columns):
+            tiles.append(
+                (
+                    extent[0] + column * tile_size,
+                    extent[1] + row * tile_size,
+                    min(extent[0] + (column + 1) * tile_size, extent[2]),
+                    min(extent[1] + (row + 1) * tile_size, extent[3]),
+                )
+            )
+    return tiles
+
+
+@instrumented(input_arg=None)
+def downloadFile(request_URL, ping_URL="", error_message="", context=None, feedback=None, file_name="download"):
     try:
-        if ping_URL:  # first make a low cost request to check if server is live
-            ping_URL = ping_URL
-            r = requests.head(ping_URL, verify=False)
-            r.raise_for_status()
+        feedback.pushInfo(f"Downloading {request_URL}")
+        return fetchFile(request_URL, ping_URL, error_message, feedback=feedback, file_name=file_name)
+    except QgsProcessingException as e:
+        feedback.reportError(str(e), True)
+
+
+@instrumented(input_arg=None)
+def fetchFile(request_URL, ping_URL="", error_message="", feedback=None, file_name="download.tif") -> str:
+    """Download request_URL to a temporary file. Unlike downloadFile this does not use the processing
+    framework so it is safe to call from a worker thread, see runConcurrently.
+    WCS coverages are served from the download cache when available."""
+    import requests
+
+    from curve_number_generator.processing.tools import downloader
+
+    cache = getDownloadCache(
+        getSetting("CNG_CACHE_FOLDER") or settingsFilePath(cn_download_cache_file), getSetting("CNG_CACHE_SIZE_MB")
+    )
+    if cache:
+        cached = cache.get(request_URL)
+        if cached:
+            if feedback:
+                feedback.pushInfo(f"Using cached download of {request_URL}")
+            return cached
 
-        alg_params = {"URL": request_URL, "OUTPUT": QgsProcessing.TEMPORARY_OUTPUT}
-        # QGIS native donwloader provide logs to feedback
-        return processing.run(
-            "native:filedownloader",
-            alg_params,
-            context=context,
-            feedback=feedback,
-            is_child_algorithm=True,
-        )["OUTPUT"]
-    except (QgsProcessingException, requests.exceptions.HTTPError) as e:
-        feedback.reportError(f"Error: {str(e)}\n\n{error_message}", True)
+    try:
+        # first make a low cost request to check if server is live, unless it just answered another request
+        if ping_URL and not downloader.isHealthy(ping_URL):
+            r = downloader.request("HEAD", ping_URL, timeout=downloader.CONNECT_TIMEOUT)
+            r.raise_for_status()
 
+        output = QgsProcessingUtils.generateTempFilename(file_name)
+        content_type = downloader.download("GET", request_URL, output, feedback)
+        if feedback and feedback.isCanceled():
+            return output
+        # WCS servers report errors as xml documents
+        cacheable = "xml" not in content_type
+    except requests.exceptions.RequestException as e:
+        raise QgsProcessingException(f"Error: {str(e)}\n\n{error_message}")
+
+    if cache and cacheable:
+        return cache.put(request_URL, output)
+    return output
+
+
+@instrumented(input_arg=None)
+def fetchCoverage(
+    url_template: str,
+    extent: tuple,
+    cell_size: float,
+    ping_URL="",
+    error_message="",
+    feedback=None,
+    max_size: int = WCS_MAX_SIZE,
+    **url_params,
+) -> str:
+    """Download a WCS coverage of extent, which must be aligned to the coverage grid of cell_size.
+    url_template is formatted with width, height, bbox and url_params.
+
+    Coverages larger than max_size pixels per side are split into grid aligned sub-requests that are
+    fetched in parallel, each one cached and retried on its own, and mosaicked into a VRT. Raises a
+    QgsProcessingException if feedback is canceled, as the coverage is then incomplete."""
+
+    def url(sub_extent):
+        width, height = createRequestBBOXDim(sub_extent, cell_size)
+        return url_template.format(
+            width=width, height=height, bbox=",".join([str(item) for item in sub_extent]), **url_params
+        )
 
+    width, height = createRequestBBOXDim(extent, cell_size)
+    if width <= max_size and height <= max_size:
+        output = fetchFile(url(extent), ping_URL, error_message, feedback=feedback)
+        if feedback and feedback.isCanceled():
+            raise QgsProcessingException("Coverage download canceled.")
+        return output
+
+    sub_extents = splitExtent(extent, max_size * cell_size)
+    if feedback:
+        feedback.pushInfo(f"Requesting the {width} x {height} pixels coverage in {len(sub_extents)} parts.")
+    if ping_URL:  # ping once for all the parts
+        fetch = partial(fetchFile, ping_URL=ping_URL, error_message=error_message, feedback=feedback)
+        sub_files = [fetch(url(sub_extents[0]))]
+        sub_extents = sub_extents[1:]
+    else:
+        sub_files = []
+    fetch = withReports(partial(fetchFile, error_message=error_message, feedback=feedback))
+    with ThreadPoolExecutor(max_workers=WCS_MAX_CONCURRENT_REQUESTS) as executor:
+        sub_files += list(executor.map(fetch, [url(sub_extent) for sub_extent in sub_extents]))
+    if feedback and feedback.isCanceled():
+        raise QgsProcessingException("Coverage download canceled.")
+
+    output = QgsProcessingUtils.generateTempFilename("coverage.vrt")
+    vrt = gdal.BuildVRT(output, sub_files)
+    if vrt is None:
+        raise QgsProcessingException(f"Error mosaicking the coverage parts: {gdal.GetLastErrorMsg()}\n\n{error_message}")
+    vrt = None  # flush to disk
+    return output
+
+
+def iterJsonArray(file_path: str, key: str, chunk_size: int = 1024 * 1024):
+    """Yield the items of the array under key of a JSON document like {"key": [item, ...]} without
+    loading the whole document in memory. A document without key must be an empty object."""
+    decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder("utf-8")()
+    buffer = ""
+    pos = 0
+    in_array = False
+    eof = False
+
+    with open(file_path, "rb") as f:
+        while True:
+            if not in_array:
+                start = buffer.find(f'"{key}"')
+                bracket = buffer.find("[", start) if start != -1 else -1
+                if bracket != -1:
+                    buffer = buffer[bracket + 1 :]
+                    in_array = True
+            if in_array:
+                while True:
+                    while pos < len(buffer) and buffer[pos] in " \t\r\n,":
+                        pos += 1
+                    if pos == len(buffer):
+                        break
+                    if buffer[pos] == "]":
+                        return
+                    try:
+                        item, end = decoder.raw_decode(buffer, pos)
+                    except json.JSONDecodeError:
+                        if eof:
+                            raise
+                        break  # item continues in the next chunk
+                    if end == len(buffer) and not eof:
+                        break  # a number may continue in the next chunk
+                    pos = end
+                    yield item
+                buffer = buffer[pos:]
+                pos = 0
+
+            if eof:
+                if in_array:
+                    raise ValueError(f"Unterminated {key} array in {file_path}")
+                if buffer.strip() != "{}":
+                    raise KeyError(key)
+                return
+            chunk = f.read(chunk_size)
+            eof = not chunk
+            buffer += text_decoder.decode(chunk, final=eof)
+
+
+def runConcurrently(tasks: dict, feedback=None) -> dict:
+    """Run the callables in tasks on a thread pool and wait until all of them finish or feedback is canceled.
+    Returns the futures by task name, calling result() on a future returns the value or raises the error of
+    its task. Stages recorded by the tasks go to the reports of the calling thread, see withReports. Tasks must
+    not use the processing context as it is not thread safe."""
+    if not tasks:
+        return {}
+
+    executor = ThreadPoolExecutor(max_workers=len(tasks))
+    futures = {name: executor.submit(withReports(task)) for name, task in tasks.items()}
+    pending = set(futures.values())
+    while pending:
+        _, pending = wait(pending, timeout=0.2, return_when=FIRST_COMPLETED)
+        if feedback:
+            feedback.setProgress(100 * (len(futures) - len(pending)) / len(futures))
+            if feedback.isCanceled():
+                break
+    # tasks check the feedback themselves, don't block on them if canceled
+    executor.shutdown(wait=not (feedback and feedback.isCanceled()))
+
+    return futures
+
+
+@instrumented()
 def fixGeometries(input, output=QgsProcessing.TEMPORARY_OUTPUT, context=None, feedback=None) -> str:
     alg_params = {"INPUT": input, "OUTPUT": output}
     return processing.run(
@@ -317,6 +708,7 @@ def fixGeometries(input, output=QgsProcessing.TEMPORARY_OUTPUT, context=None, fe
     )["OUTPUT"]
 
 
+@instrumented()
 def clip(input, overlay, output=QgsProcessing.TEMPORARY_OUTPUT, context=None, feedback=None) -> str:
     alg_params = {"INPUT": input, "OVERLAY": overlay, "OUTPUT": output}
     return processing.run(
@@ -328,6 +720,7 @@ def clip(input, overlay, output=QgsProcessing.TEMPORARY_OUTPUT, context=None, fe
     )["OUTPUT"]
 
 
+@instrumented()
 def reprojectLayer(
     input,
     target_crs,
@@ -350,6 +743,45 @@ def reprojectLayer(
     )["OUTPUT"]
 
 
+@instrumented()
+def splitByAoiFeatures(input, aoi, output=QgsProcessing.TEMPORARY_OUTPUT, context=None, feedback=None) -> str:
+    """Split the polygons of input by the features of aoi, each part getting an aoi_fid field with the
+    feature id of its AOI feature. Parts in several overlapping AOI features are repeated for each one."""
+    alg_params = {
+        "FIELD_LENGTH": 10,
+        "FIELD_NAME": "aoi_fid",
+        "FIELD_PRECISION": 0,
+        "FIELD_TYPE": 1,  # integer
+        "FORMULA": "$id",
+        "INPUT": aoi,
+        "NEW_FIELD": True,
+        "OUTPUT": QgsProcessing.TEMPORARY_OUTPUT,
+    }
+    aoi_fids = processing.run(
+        "qgis:fieldcalculator",
+        alg_params,
+        context=context,
+        feedback=feedback,
+        is_child_algorithm=True,
+    )["OUTPUT"]
+
+    alg_params = {
+        "INPUT": input,
+        "INPUT_FIELDS": [],
+        "OVERLAY": aoi_fids,
+        "OVERLAY_FIELDS": ["aoi_fid"],
+        "OVERLAY_FIELDS_PREFIX": "",
+        "OUTPUT": output,
+    }
+    return processing.run(
+        "native:intersection",
+        alg_params,
+        context=context,
+        feedback=feedback,
+        is_child_algorithm=True,
+    )["OUTPUT"]
+
+
 def checkAreaLimits(area_acres, soft_limit, hard_limit, unit="acres", feedback=None) -> None:
     if area_acres > hard_limit:
         raise QgsProcessingException(
@@ -373,6 +805,7 @@ def getExtentArea(layer: QgsVectorLayer, unit_type):
     return area
 
 
+@instrumented()
 def gdalWarp(
     input,
     target_crs,
@@ -384,13 +817,14 @@ def gdalWarp(
 ):
     # reproject to original crs
     # Warp (reproject)
+    profile = performanceProfile()
     alg_params = {
         "DATA_TYPE": 0,
-        "EXTRA": "",
+        "EXTRA": f"{gdalWarpArgs(profile)} {gdalConfigArgs(profile)}",
         "INPUT": input,
-        "MULTITHREADING": False,
+        "MULTITHREADING": profile["threads"] != 1,
         "NODATA": None,
-        "OPTIONS": "",
+        "OPTIONS": "|".join(TEMP_GTIFF_CREATION_OPTIONS),
         "RESAMPLING": 0,
         "SOURCE_CRS": None,
         "TARGET_CRS": target_crs,
@@ -408,24 +842,75 @@ def gdalWarp(
     )["OUTPUT"]
 
 
-def gdalPolygonize(
-    input,
-    field="value",
+@instrumented()
+def writeCog(input, output, context=None, feedback=None) -> str:
+    """Copy the raster input to output as a Cloud Optimized GeoTIFF, see config.COG_CREATION_OPTIONS.
+    Outputs in other formats are copied as is."""
+    source = input if isinstance(input, str) else input.source()
+    build_overviews = False
+    if os.path.splitext(output)[1].lower() not in (".tif", ".tiff"):
+        options = gdal.TranslateOptions(format=QgsRasterFileWriter.driverForExtension(os.path.splitext(output)[1]))
+    elif gdal.GetDriverByName("COG") is not None:
+        options = gdal.TranslateOptions(format="COG", creationOptions=COG_CREATION_OPTIONS)
+    else:  # GDAL older than 3.1, a tiled and compressed GeoTIFF with internal overviews is close enough
+        options = gdal.TranslateOptions(
+            format="GTiff",
+            creationOptions=["TILED=YES"]
+            + [option for option in COG_CREATION_OPTIONS if option.startswith(("COMPRESS=", "BIGTIFF="))],
+        )
+        # built into the output once it is written, the input is left untouched
+        build_overviews = True
+
+    if feedback:
+        feedback.pushInfo(f"Writing {output}")
+    # in this process, so the options are only set for this thread
+    config_options = gdalConfigOptions()
+    for key, value in config_options.items():
+        gdal.SetThreadLocalConfigOption(key, value)
+    try:
+        ds = gdal.Translate(output, source, options=options)
+        if ds is None:
+            raise QgsProcessingException(f"Error writing {output}: {gdal.GetLastErrorMsg()}")
+        ds = None  # flush to disk
+        if build_overviews:
+            ds = gdal.Open(output, gdal.GA_Update)
+            if ds is None:
+                raise QgsProcessingException(f"Error opening {output}: {gdal.GetLastErrorMsg()}")
+            levels = []
+            while max(ds.RasterXSize, ds.RasterYSize) // 2 ** (len(levels) + 1) >= 256:
+                levels.append(2 ** (len(levels) + 1))
+            if levels:
+                ds.BuildOverviews("NEAREST", levels)
+            ds = None
+    finally:
+        for key in config_options:
+            gdal.SetThreadLocalConfigOption(key, None)
+    return output
+
+
+@instrumented(input_arg="inputs")
+def gdalMerge(
+    inputs: list,
+    nodata=None,
+    data_type=0,
     output=QgsProcessing.TEMPORARY_OUTPUT,
     context=None,
     feedback=None,
 ):
-    # Polygonize (raster to vector)
+    # Merge rasters on the same grid, nodata pixels of an input do not overwrite the previous inputs
     alg_params = {
-        "BAND": 1,
-        "EIGHT_CONNECTEDNESS": False,
-        "EXTRA": "",
-        "FIELD": field,
-        "INPUT": input,
+        "DATA_TYPE": data_type,
+        "EXTRA": gdalConfigArgs(),
+        "INPUT": inputs,
+        "NODATA_INPUT": nodata,
+        "NODATA_OUTPUT": nodata,
+        "OPTIONS": "|".join(TEMP_GTIFF_CREATION_OPTIONS),
+        "PCT": False,
+        "SEPARATE": False,
         "OUTPUT": output,
     }
     return processing.run(
-        "gdal:polygonize",
+        "gdal:merge",
         alg_params,
         context=context,
         feedback=feedback,
@@ -433,41 +918,63 @@ def gdalPolygonize(
     )["OUTPUT"]
 
 
-def perform_raster_math(
-    exprs,
-    input_dict,
-    context,
-    feedback,
-    no_data,
-    out_data_type,
-    output=QgsProcessing.TEMPORARY_OUTPUT,
-    hide_no_data=False,
-) -> dict:
-    """Wrapper around QGIS GDAL Raster Calculator"""
+@instrumented(input_arg="layers")
+def mergeVectorLayers(layers: list, target_crs, output=QgsProcessing.TEMPORARY_OUTPUT, context=None, feedback=None):
+    alg_params = {"LAYERS": layers, "CRS": target_crs, "OUTPUT": QgsProcessing.TEMPORARY_OUTPUT}
+    merged = processing.run(
+        "native:mergevectorlayers",
+        alg_params,
+        context=context,
+        feedback=feedback,
+        is_child_algorithm=True,
+    )["OUTPUT"]
 
+    # drop the source layer fields added by the merge
+    alg_params = {"COLUMN": ["layer", "path"], "INPUT": merged, "OUTPUT": output}
+    return processing.run(
+        "qgis:deletecolumn",
+        alg_params,
+        context=context,
+        feedback=feedback,
+        is_child_algorithm=True,
+    )["OUTPUT"]
+
+
+@instrumented()
+def gdalRasterize(
+    input,
+    field,
+    extent,
+    width,
+    height,
+    units=0,
+    nodata=None,
+    init=None,
+    data_type=5,
+    output=QgsProcessing.TEMPORARY_OUTPUT,
+    context=None,
+    feedback=None,
+):
+    # Rasterize (vector to raster)
     alg_params = {
-        "BAND_A": input_dict.get("band_a", None),
-        "BAND_B": input_dict.get("band_b", None),
-        "BAND_C": input_dict.get("band_c", None),
-        "BAND_D": input_dict.get("band_d", None),
-        "BAND_E": input_dict.get("band_e", None),
-        "BAND_F": input_dict.get("band_f", None),
-        "EXTRA": f"--overwrite{' --hideNoData' if hide_no_data else ''}",
-        "FORMULA": exprs,
-        "INPUT_A": input_dict.get("input_a", None),
-        "INPUT_B": input_dict.get("input_b", None),
-        "INPUT_C": input_dict.get("input_c", None),
-        "INPUT_D": input_dict.get("input_d", None),
-        "INPUT_E": input_dict.get("input_e", None),
-        "INPUT_F": input_dict.get("input_f", None),
-        "NO_DATA": no_data,
-        "RTYPE": out_data_type,
-        "OPTIONS": "",
+        "BURN": 0,
+        "DATA_TYPE": data_type,
+        "EXTENT": extent,
+        "EXTRA": gdalConfigArgs(),
+        "FIELD": field,
+        "HEIGHT": height,
+        "INIT": init,
+        "INPUT": input,
+        "INVERT": False,
+        "NODATA": nodata,
+        "OPTIONS": "|".join(TEMP_GTIFF_CREATION_OPTIONS),
+        "UNITS": units,
+        "USE_Z": False,
+        "WIDTH": width,
         "OUTPUT": output,
     }
-
     return processing.run(
-        "gdal:rastercalculator",
+        "gdal:rasterize",
         alg_params,
         context=context,
         feedback=feedback,
@@ -475,22 +982,27 @@ def perform_raster_math(
     )["OUTPUT"]
 
 
-def generate_cn_exprs(lookup_layer, nodata=255) -> str:
-    """Generate  CN expression"""
-    cn_calc_expr = []
-    hsg_map = {
-        "A": 1,
-        "B": 2,
-        "C": 3,
-        "D": 4,
+@instrumented()
+def gdalPolygonize(
+    input,
+    field="value",
+    output=QgsProcessing.TEMPORARY_OUTPUT,
+    context=None,
+    feedback=None,
+):
+    # Polygonize (raster to vector)
+    alg_params = {
+        "BAND": 1,
+        "EIGHT_CONNECTEDNESS": False,
+        "EXTRA": gdalConfigArgs(),
+        "FIELD": field,
+        "INPUT": input,
+        "OUTPUT": output,
     }
-    for feat in lookup_layer.getFeatures():
-        grid_code = feat.attribute("grid_code")
-        cn = feat.attribute("cn")
-        lc, hsg = grid_code.split("_")
-        cn_calc_expr.append(f"logical_and(A=={lc},B=={hsg_map[hsg]})*{cn}")
-        if hsg == "D":
-            cn_calc_expr.append(f"logical_and(A=={lc},B=={nodata})*{cn}")
-
-    cn_expression = " + ".join(cn_calc_expr)
-    return cn_expression
+    return processing.run(
+        "gdal:polygonize",
+        alg_params,
+        context=context,
+        feedback=feedback,
+        is_child_algorithm=True,
+    )["OUTPUT"]
@@ -0,0 +1,90 @@
+# coding=utf-8
+"""Tests for the Curve Number lookup array kernel."""
+
+import os
+import tempfile
+import unittest
+
+import numpy
+from osgeo import gdal
+from qgis.core import QgsFeature, QgsVectorLayer
+
+from .utilities import get_qgis_app
+
+QGIS_APP = get_qgis_app()
+
+from curve_number_generator.processing.tools.cn_lookup import (  # noqa: E402
+    applyCnLookup,
+    buildCnLookupArray,
+)
+
+
+def create_lookup(rows):
+    layer = QgsVectorLayer("None?field=grid_code:string&field=cn:integer", "lookup", "memory")
+    features = []
+    for grid_code, cn in rows:
+        feat = QgsFeature(layer.fields())
+        feat.setAttributes([grid_code, cn])
+        features.append(feat)
+    layer.dataProvider().addFeatures(features)
+    return layer
+
+
+def create_raster(path, array, nodata=None):
+    ds = gdal.GetDriverByName("GTiff").Create(path, array.shape[1], array.shape[0], 1, gdal.GDT_Byte)
+    ds.SetGeoTransform((0, 30, 0, 0, 0, -30))
+    band = ds.GetRasterBand(1)
+    if nodata is not None:
+        band.SetNoDataValue(nodata)
+    band.WriteArray(array)
+    ds = None
+
+
+class CnLookupTest(unittest.TestCase):
+    """Test the lookup array and its application to rasters"""
+
+    def test_build_lookup_array(self):
+        lut = buildCnLookupArray(create_lookup([("11_A", 30), ("11_D", 80), ("21_", 84)]))
+        self.assertEqual(lut[11, 1], 30)
+        self.assertEqual(lut[11, 4], 80)
+        # HSG nodata is treated as D
+        self.assertEqual(lut[11, 255], 80)
+        # rows with an HSG missing from hsg_map are skipped
+        self.assertEqual(lut[21, 0], 0)
+
+    def test_build_lookup_array_overrides(self):
+        lut = buildCnLookupArray(
+            create_lookup([("11_", 100), ("21_", 84), ("21_B", 68)]),
+            hsg_map={"": 0, "A": 1, "B": 2, "C": 3, "D": 4},
+            nodata_hsg=None,
+            overrides={5: "11_"},
+        )
+        self.assertEqual(lut[21, 0], 84)
+        self.assertEqual(lut[21, 2], 68)
+        self.assertEqual(lut[21, 5], 100)
+        self.assertEqual(lut[21, 255], 0)
+
+    def test_build_lookup_array_invalid_rows(self):
+        lut = buildCnLookupArray(create_lookup([("11_A", None), ("11", 30), ("x_B", 40), ("21_B", 68)]))
+        # rows with a NULL cn or a malformed grid_code are left to fill_value
+        self.assertEqual(lut[11, 1], 0)
+        self.assertEqual(lut[21, 2], 68)
+        self.assertEqual(int((lut != 0).sum()), 1)
+
+    def test_apply_lookup(self):
+        lut = buildCnLookupArray(create_lookup([("11_A", 30), ("21_B", 68)]), nodata_hsg=None)
+        with tempfile.TemporaryDirectory() as tmp:
+            lc_path = os.path.join(tmp, "lc.tif")
+            hsg_path = os.path.join(tmp, "hsg.tif")
+            cn_path = os.path.join(tmp, "cn.tif")
+            create_raster(lc_path, numpy.array([[11, 21], [21, 11]], dtype=numpy.uint8))
+            create_raster(hsg_path, numpy.array([[1, 2], [255, 3]], dtype=numpy.uint8), nodata=255)
+
+            applyCnLookup(lc_path, hsg_path, lut, cn_path, nodata=255)
+
+            cn = gdal.Open(cn_path).GetRasterBand(1).ReadAsArray()
+            numpy.testing.assert_array_equal(cn, [[30, 68], [255, 0]])
+
+
+if __name__ == "__main__":
+    unittest.main()
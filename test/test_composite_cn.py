@@ -0,0 +1,88 @@
+# coding=utf-8
+"""Tests for the composite Curve Number per zone."""
+
+import os
+import tempfile
+import unittest
+
+import numpy
+from osgeo import gdal, osr
+from qgis.core import QgsFeature, QgsGeometry, QgsProcessingContext, QgsRectangle, QgsVectorLayer
+
+from .utilities import get_qgis_app
+
+QGIS_APP = get_qgis_app()
+
+from curve_number_generator.processing.tools.composite_cn import compositeCurveNumber  # noqa: E402
+
+
+def create_polygons(fields, rows):
+    layer = QgsVectorLayer(f"Polygon?crs=EPSG:5070&{fields}", "polygons", "memory")
+    features = []
+    for rect, attributes in rows:
+        feat = QgsFeature(layer.fields())
+        feat.setGeometry(QgsGeometry.fromRect(QgsRectangle(*rect)))
+        feat.setAttributes(attributes)
+        features.append(feat)
+    layer.dataProvider().addFeatures(features)
+    return layer
+
+
+def read_table(path):
+    layer = QgsVectorLayer(path, "table", "ogr")
+    return {feat["name"]: feat for feat in layer.getFeatures()}
+
+
+class CompositeCnTest(unittest.TestCase):
+    """Test the area-weighted composite Curve Number of raster and vector Curve Numbers"""
+
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.context = QgsProcessingContext()
+        # zones do not overlap, on a raster a pixel in overlapping zones only counts in the last one
+        self.zones = create_polygons(
+            "field=name:string", [((0, 0, 30, 60), ["west"]), ((30, 0, 90, 60), ["east"])]
+        )
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def test_from_raster(self):
+        cn_raster = os.path.join(self.folder.name, "cn.tif")
+        ds = gdal.GetDriverByName("GTiff").Create(cn_raster, 2, 2, 1, gdal.GDT_Byte)
+        ds.SetGeoTransform((0, 30, 0, 60, 0, -30))
+        srs = osr.SpatialReference()
+        srs.ImportFromEPSG(5070)
+        ds.SetProjection(srs.ExportToWkt())
+        band = ds.GetRasterBand(1)
+        band.SetNoDataValue(255)
+        band.WriteArray(numpy.array([[70, 90], [70, 255]], dtype=numpy.uint8))
+        ds = None
+
+        output = os.path.join(self.folder.name, "composite.gpkg")
+        rows = read_table(compositeCurveNumber(cn_raster, self.zones, output, context=self.context))
+
+        self.assertAlmostEqual(rows["west"]["composite_cn"], 70)
+        self.assertAlmostEqual(rows["west"]["area_m2"], 1800, delta=5)
+        self.assertAlmostEqual(rows["west"]["cn_90_m2"], 0)
+        # nodata pixels have no area
+        self.assertAlmostEqual(rows["east"]["composite_cn"], 90)
+        self.assertAlmostEqual(rows["east"]["area_m2"], 900, delta=5)
+
+    def test_from_vector(self):
+        cn_layer = create_polygons(
+            "field=cn:integer", [((0, 0, 30, 60), [70]), ((30, 0, 60, 60), [90]), ((60, 0, 90, 60), [None])]
+        )
+
+        output = os.path.join(self.folder.name, "composite.gpkg")
+        rows = read_table(compositeCurveNumber(cn_layer, self.zones, output, context=self.context))
+
+        self.assertAlmostEqual(rows["west"]["composite_cn"], 70)
+        self.assertAlmostEqual(rows["west"]["cn_70_m2"], 1800, delta=5)
+        # polygons without a cn have no area
+        self.assertAlmostEqual(rows["east"]["composite_cn"], 90)
+        self.assertAlmostEqual(rows["east"]["area_m2"], 1800, delta=5)
+
+
+if __name__ == "__main__":
+    unittest.main()
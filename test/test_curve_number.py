@@ -0,0 +1,64 @@
+# coding=utf-8
+"""Tests for the single pass Curve Number overlay."""
+
+import unittest
+
+from qgis.core import (
+    QgsFeature,
+    QgsGeometry,
+    QgsProcessingContext,
+    QgsProcessingFeedback,
+    QgsProcessingMultiStepFeedback,
+    QgsRectangle,
+    QgsVectorLayer,
+)
+
+from .utilities import get_qgis_app
+
+QGIS_APP = get_qgis_app()
+
+from curve_number_generator.processing.tools.curve_number import CurveNumber  # noqa: E402
+
+
+def create_layer(uri, rows, geometries=True):
+    layer = QgsVectorLayer(uri, "layer", "memory")
+    features = []
+    for rect, attributes in rows:
+        feat = QgsFeature(layer.fields())
+        if geometries:
+            feat.setGeometry(QgsGeometry.fromRect(QgsRectangle(*rect)))
+        feat.setAttributes(attributes)
+        features.append(feat)
+    layer.dataProvider().addFeatures(features)
+    return layer
+
+
+class CurveNumberFusedTest(unittest.TestCase):
+    """Test the fused soil and land cover overlay"""
+
+    def test_land_cover_in_another_crs(self):
+        # a 1 km soil square in EPSG:3857 inside a land cover polygon in EPSG:4326
+        soil = create_layer(
+            "Polygon?crs=EPSG:3857&field=hsg:string", [((1000000, 1000000, 1001000, 1001000), ["B"])]
+        )
+        land_cover = create_layer("Polygon?crs=EPSG:4326&field=land_cover:integer", [((8, 8, 10, 10), [21])])
+        lookup = create_layer(
+            "None?field=grid_code:string&field=cn:integer", [(None, ["21_B", 68])], geometries=False
+        )
+        context = QgsProcessingContext()
+        feedback = QgsProcessingMultiStepFeedback(4, QgsProcessingFeedback())
+
+        output, step = CurveNumber(land_cover, soil, lookup, context, feedback).generateCurveNumber(
+            ["hsg"], ["hsg"], "\"land_cover\" || '_' || \"hsg\"", start_step=1, fused=True
+        )
+
+        # the steps of the unfused overlay
+        self.assertEqual(step, 3)
+        features = list(QgsVectorLayer(output, "cn", "ogr").getFeatures())
+        self.assertEqual(len(features), 1)
+        self.assertEqual(features[0]["cn"], 68)
+        self.assertAlmostEqual(features[0].geometry().area(), 1000000, delta=1)
+
+
+if __name__ == "__main__":
+    unittest.main()
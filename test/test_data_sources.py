@@ -0,0 +1,53 @@
+# coding=utf-8
+"""Tests for the local data source backends."""
+
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy
+from osgeo import gdal, osr
+
+from .utilities import get_qgis_app
+
+QGIS_APP = get_qgis_app()
+
+from curve_number_generator.processing.tools.data_sources import (  # noqa: E402
+    LocalRasterSource,
+    WcsSource,
+    getDataSource,
+)
+
+
+def create_raster(path, array, origin, cell_size, epsg):
+    ds = gdal.GetDriverByName("GTiff").Create(path, array.shape[1], array.shape[0], 1, gdal.GDT_Byte)
+    ds.SetGeoTransform((origin[0], cell_size, 0, origin[1], 0, -cell_size))
+    srs = osr.SpatialReference()
+    srs.ImportFromEPSG(epsg)
+    ds.SetProjection(srs.ExportToWkt())
+    ds.GetRasterBand(1).WriteArray(array)
+    ds = None
+
+
+class DataSourceTest(unittest.TestCase):
+    """Test the selection of the local data folder and reading a window of a local raster"""
+
+    def test_local_raster_window(self):
+        remote = WcsSource("https://example.com/wcs?WIDTH={width}&HEIGHT={height}&BBOX={bbox}", 30)
+        with tempfile.TemporaryDirectory() as tmp:
+            with mock.patch.dict(os.environ, {"CNG_DATA_FOLDER": tmp}):
+                self.assertIs(getDataSource("NLCD_LC_2021", remote), remote)
+
+                array = numpy.arange(100, dtype=numpy.uint8).reshape(10, 10)
+                create_raster(os.path.join(tmp, "nlcd_2021_land_cover_l48.tif"), array, (0, 300), 30, 5070)
+                source = getDataSource("NLCD_LC_2021", remote)
+                self.assertIsInstance(source, LocalRasterSource)
+
+                window = gdal.Open(source.fetch((60, 150, 150, 270), "EPSG:5070"))
+                numpy.testing.assert_array_equal(window.ReadAsArray(), array[1:5, 2:5])
+                window = None
+
+
+if __name__ == "__main__":
+    unittest.main()
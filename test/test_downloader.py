@@ -0,0 +1,43 @@
+# coding=utf-8
+"""Tests for the host health registry of the downloader."""
+
+import unittest
+
+from .utilities import get_qgis_app
+
+QGIS_APP = get_qgis_app()
+
+from curve_number_generator.processing.tools import downloader  # noqa: E402
+
+
+class HostHealthTest(unittest.TestCase):
+    """Test the circuit breaker of a host"""
+
+    def test_circuit_breaker(self):
+        health = downloader.HostHealth("https://example.com")
+        self.assertFalse(health.isHealthy())
+
+        health.succeeded()
+        self.assertTrue(health.isHealthy())
+
+        for _ in range(downloader.FAILURE_THRESHOLD - 1):
+            health.failed()
+        self.assertFalse(health.isHealthy())
+        health.check()  # still closed
+
+        health.failed()
+        with self.assertRaises(downloader.HostUnavailableError):
+            health.check()
+
+        # a success, e.g. of a request sent before the circuit opened, closes it again
+        health.succeeded()
+        health.check()
+
+    def test_registry_is_per_host(self):
+        health = downloader.getHostHealth("https://www.mrlc.gov/geoserver/ows?SERVICE=WCS")
+        self.assertIs(health, downloader.getHostHealth("https://www.mrlc.gov/geoserver/mrlc_display/ows"))
+        self.assertIsNot(health, downloader.getHostHealth("https://webmap.ornl.gov/ogcbroker/wcs"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,60 @@
+# coding=utf-8
+"""Tests for the AOI pruned ESA WorldCover mosaic."""
+
+import os
+import re
+import tempfile
+import unittest
+
+from .utilities import get_qgis_app
+
+QGIS_APP = get_qgis_app()
+
+from curve_number_generator.processing.algorithms.global_esa_ornl.esa_worldcover import (  # noqa: E402
+    buildWorldCoverVrt,
+    tileGrid,
+    tileName,
+)
+
+TILE_INDEX = os.path.join(
+    os.path.dirname(os.path.dirname(__file__)),
+    "curve_number_generator",
+    "processing",
+    "algorithms",
+    "global_esa_ornl",
+    "esa_worldcover_2021_tiles.txt",
+)
+TILE_URL = "/vsicurl/https://example.com/ESA_WorldCover_10m_2021_v200_{}_Map.tif"
+
+
+class EsaWorldCoverTest(unittest.TestCase):
+    """Test the tile selection and the VRT written for an AOI"""
+
+    def test_tile_name(self):
+        self.assertEqual(tileName(168, -54), "S54E168")
+        self.assertEqual(tileName(-78, 39), "N39W078")
+
+    def test_tile_grid(self):
+        self.assertEqual(tileGrid((-75.2, 39.9, -71.5, 41.2)), (-78, 39, -69, 42))
+        # clamped to the WorldCover coverage
+        self.assertEqual(tileGrid((10, 85, 11, 86)), (9, 81, 12, 84))
+
+    def test_build_vrt(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            mirror = os.path.join(tmp, "mirror")
+            os.mkdir(mirror)
+            open(os.path.join(mirror, "ESA_WorldCover_10m_2021_v200_N39W075_Map.tif"), "w").close()
+            output = os.path.join(tmp, "esa.vrt")
+
+            tiles = buildWorldCoverVrt((-75.2, 39.9, -71.5, 41.2), TILE_INDEX, TILE_URL, output, mirror)
+
+            self.assertEqual(tiles, ["N39W078", "N39W075", "N39W072"])
+            with open(output) as f:
+                vrt = f.read()
+            self.assertIn('rasterXSize="108000" rasterYSize="36000"', vrt)
+            self.assertIn(os.path.join(mirror, "ESA_WorldCover_10m_2021_v200_N39W075_Map.tif"), vrt)
+            self.assertEqual(re.findall(r'DstRect xOff="(\d+)"', vrt), ["0", "36000", "72000"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,34 @@
+# coding=utf-8
+"""Tests for extent snapping and tiling helpers."""
+
+import unittest
+
+from .utilities import get_qgis_app
+
+QGIS_APP = get_qgis_app()
+
+from curve_number_generator.processing.tools.utils import (  # noqa: E402
+    snapExtentToGrid,
+    splitExtent,
+)
+
+
+class ExtentTilingTest(unittest.TestCase):
+    """Test grid snapping and splitting of extents"""
+
+    def test_snap_extent_to_grid(self):
+        extent = snapExtentToGrid((-2493040.0, 3309000.5, -2492000.0, 3309990.0), 30, (-2493045.0, 3310005.0))
+        self.assertEqual(extent, (-2493045.0, 3308985.0, -2491995.0, 3310005.0))
+
+    def test_snap_extent_already_on_grid(self):
+        self.assertEqual(snapExtentToGrid((0, 0, 90, 60), 30), (0, 0, 90, 60))
+
+    def test_split_extent(self):
+        tiles = splitExtent((0, 0, 250, 100), 100)
+        self.assertEqual(len(tiles), 3)
+        self.assertEqual(tiles[0], (0, 0, 100, 100))
+        self.assertEqual(tiles[-1], (200, 0, 250, 100))
+
+
+if __name__ == "__main__":
+    unittest.main()
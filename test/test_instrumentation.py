@@ -0,0 +1,76 @@
+# coding=utf-8
+"""Tests for the stage instrumentation of the child algorithm wrappers."""
+
+import json
+import threading
+import unittest
+
+from .utilities import get_qgis_app
+
+QGIS_APP = get_qgis_app()
+
+from curve_number_generator.processing.tools.instrumentation import (  # noqa: E402
+    StageReport,
+    addToStage,
+    instrumented,
+)
+from curve_number_generator.processing.tools.utils import runConcurrently  # noqa: E402
+
+
+@instrumented(input_arg=None)
+def fetch(size):
+    addToStage("bytes", size)
+    return "file"
+
+
+@instrumented(input_arg=None)
+def fetchTwice(size):
+    return [fetch(size), fetch(size)]
+
+
+class StageReportTest(unittest.TestCase):
+    """Test the recording of instrumented calls"""
+
+    def test_records_only_while_started(self):
+        fetch(10)
+        report = StageReport.start()
+        fetch(10)
+        fetchTwice(5)
+        data = json.loads(report.finish())
+        fetch(10)
+
+        self.assertEqual([stage["stage"] for stage in data["stages"]], ["fetch", "fetch", "fetch", "fetchTwice"])
+        # bytes go to the innermost stage only
+        self.assertEqual(data["totals"]["fetch"], {"calls": 3, "seconds": data["totals"]["fetch"]["seconds"], "bytes": 20})
+        self.assertEqual(data["totals"]["fetchTwice"]["bytes"], 0)
+        # memory is measured per stage, the process peak only for the whole report
+        self.assertIn("rss_mb", data["stages"][0])
+        self.assertNotIn("process_peak_rss_mb", data["stages"][0])
+        self.assertIn("process_peak_rss_mb", data)
+
+    def test_nested_report(self):
+        report = StageReport.start()
+        tile_report = StageReport.start()
+        fetch(1)
+        self.assertTrue(tile_report.nested)
+        self.assertEqual(len(json.loads(tile_report.finish())["stages"]), 1)
+        fetch(1)
+        self.assertEqual(len(json.loads(report.finish())["stages"]), 2)
+        self.assertFalse(report.nested)
+
+    def test_reports_of_other_threads(self):
+        report = StageReport.start()
+        # a run of another thread does not record in this report, tasks of this run do
+        other = threading.Thread(target=fetch, args=(1,))
+        other.start()
+        other.join()
+        futures = runConcurrently({"a": lambda: fetch(2), "b": lambda: fetch(3)})
+        data = json.loads(report.finish())
+
+        self.assertEqual([future.result() for future in futures.values()], ["file", "file"])
+        self.assertEqual(data["totals"]["fetch"]["calls"], 2)
+        self.assertEqual(data["totals"]["fetch"]["bytes"], 5)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,45 @@
+# coding=utf-8
+"""Tests for the incremental JSON array reader."""
+
+import json
+import os
+import tempfile
+import unittest
+
+from .utilities import get_qgis_app
+
+QGIS_APP = get_qgis_app()
+
+from curve_number_generator.processing.tools.utils import iterJsonArray  # noqa: E402
+
+
+class JsonStreamTest(unittest.TestCase):
+    """Test reading the rows of a Soil Data Access response in chunks"""
+
+    def write(self, folder, text):
+        path = os.path.join(folder, "response.json")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+        return path
+
+    def test_rows_across_chunks(self):
+        table = [["Alfisols", "Ü", None, "POLYGON ((1 2, 3 4, 5 6, 1 2))"], [1, 2.5], ["x]", "{"]]
+        with tempfile.TemporaryDirectory() as tmp:
+            path = self.write(tmp, json.dumps({"Table": table}, ensure_ascii=False))
+            for chunk_size in (1, 3, 1024):
+                self.assertEqual(list(iterJsonArray(path, "Table", chunk_size)), table)
+
+    def test_empty_response(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            self.assertEqual(list(iterJsonArray(self.write(tmp, "{}"), "Table")), [])
+
+    def test_invalid_response(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            with self.assertRaises(KeyError):
+                list(iterJsonArray(self.write(tmp, "<html></html>"), "Table"))
+            with self.assertRaises(ValueError):
+                list(iterJsonArray(self.write(tmp, '{"Table": [[1], [2'), "Table", 4))
+
+
+if __name__ == "__main__":
+    unittest.main()
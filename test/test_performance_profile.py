@@ -0,0 +1,40 @@
+# coding=utf-8
+"""Tests for the GDAL performance profile."""
+
+import os
+import unittest
+from unittest import mock
+
+from .utilities import get_qgis_app
+
+QGIS_APP = get_qgis_app()
+
+from curve_number_generator.processing.tools.utils import (  # noqa: E402
+    gdalConfigArgs,
+    gdalWarpArgs,
+    performanceProfile,
+)
+
+
+class PerformanceProfileTest(unittest.TestCase):
+    """Test the profile selection and its GDAL options"""
+
+    def test_profile_from_environment(self):
+        with mock.patch.dict(os.environ, {"CNG_PERFORMANCE_PROFILE": "Workstation", "CNG_GDAL_CACHEMAX_MB": "4096"}):
+            profile = performanceProfile()
+        self.assertIsNone(profile["threads"])
+        # individual settings take precedence over the profile
+        self.assertEqual(profile["cache_mb"], 4096)
+
+        args = gdalConfigArgs(profile)
+        self.assertIn("--config GDAL_NUM_THREADS ALL_CPUS", args)
+        self.assertIn("--config GDAL_CACHEMAX 4096", args)
+        self.assertEqual(gdalWarpArgs(profile), "-wm 1024 -wo NUM_THREADS=ALL_CPUS")
+
+    def test_unknown_profile_is_default(self):
+        with mock.patch.dict(os.environ, {"CNG_PERFORMANCE_PROFILE": "turbo"}):
+            self.assertEqual(performanceProfile()["threads"], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
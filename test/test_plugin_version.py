@@ -0,0 +1,25 @@
+# coding=utf-8
+"""Tests for the plugin version comparison of the update check."""
+
+import unittest
+
+from .utilities import get_qgis_app
+
+QGIS_APP = get_qgis_app()
+
+from curve_number_generator.processing.tools.utils import isNewerVersion  # noqa: E402
+
+
+class PluginVersionTest(unittest.TestCase):
+    """Test the comparison of dotted versions"""
+
+    def test_is_newer_version(self):
+        self.assertTrue(isNewerVersion("2.3.0", "2.2.2"))
+        self.assertTrue(isNewerVersion("2.10.0", "2.9.9"))
+        self.assertFalse(isNewerVersion("2.2.2", "2.2.2"))
+        self.assertFalse(isNewerVersion("2.1.9", "2.2.0"))
+        self.assertFalse(isNewerVersion("1.9", "2.0.0"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,35 @@
+# coding=utf-8
+"""Tests for the local SSURGO map unit store."""
+
+import os
+import tempfile
+import unittest
+
+from curve_number_generator.processing.algorithms.conus_nlcd_ssurgo.ssurgo_store import SsurgoStore
+
+
+class SsurgoStoreTest(unittest.TestCase):
+    """Test the incremental fetch bookkeeping of the store"""
+
+    def test_missing_and_rows(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            store = SsurgoStore(os.path.join(tmp, "ssurgo.sqlite"))
+            store.addAttributes([["Unit 1", "B", "101"], ["Unit 2", "C/D", "102"]])
+            store.addPolygons([["1", "101", "TX001", "abc", "POLYGON((0 0,1 0,1 1,0 0))"]])
+
+            self.assertEqual(store.missingMukeys(["101", "102", "103", "103"]), ["103"])
+            self.assertEqual(store.missingPolygonKeys(["1", "2"]), ["2"])
+
+            store.addPolygons([["2", "102", "TX001", "abd", "POLYGON((1 1,2 1,2 2,1 1))"]])
+            rows = sorted(store.rows(["2", "1", "1"]))
+            self.assertEqual(
+                rows,
+                [
+                    ["Unit 1", "B", "101", "1", "TX001", "abc", "POLYGON((0 0,1 0,1 1,0 0))"],
+                    ["Unit 2", "C/D", "102", "2", "TX001", "abd", "POLYGON((1 1,2 1,2 2,1 1))"],
+                ],
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
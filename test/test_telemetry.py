@@ -0,0 +1,49 @@
+# coding=utf-8
+"""Tests for the telemetry spool."""
+
+import os
+import tempfile
+import unittest
+
+from .utilities import get_qgis_app
+
+QGIS_APP = get_qgis_app()
+
+from curve_number_generator.processing.tools.telemetry import TelemetrySpool  # noqa: E402
+
+
+class TelemetrySpoolTest(unittest.TestCase):
+    """Test spooling and flushing of records"""
+
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.spool = TelemetrySpool(os.path.join(self.folder.name, "telemetry.jsonl"))
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def test_flush_posts_every_record_once(self):
+        self.spool.append([{"aoi": 1}, {"aoi": 2}])
+        self.spool.append([{"aoi": 3}])
+        posted = []
+
+        self.assertTrue(self.spool.flush(posted.append))
+        self.assertEqual(sorted(record["aoi"] for record in posted), [1, 2, 3])
+        self.assertTrue(self.spool.isEmpty())
+        self.assertEqual(os.listdir(self.folder.name), [])
+
+    def test_failed_records_are_spooled_again(self):
+        self.spool.append([{"aoi": 1}, {"aoi": 2}])
+
+        def post(record):
+            raise ConnectionError("offline")
+
+        self.assertFalse(self.spool.flush(post, max_workers=1))
+        self.assertTrue(self.spool.hasFailedRecently())
+        posted = []
+        self.spool.flush(posted.append)
+        self.assertEqual(sorted(record["aoi"] for record in posted), [1, 2])
+
+
+if __name__ == "__main__":
+    unittest.main()